@@ -0,0 +1,345 @@
+# analysis_pool.py
+#
+# Mode analisa multi-core: pekerjaan analyse_symbol_ipc dijalankan di
+# worker process (ProcessPoolExecutor) supaya pandas/numpy tidak terkunci
+# di 1 core event loop.
+#
+# - Tiap shard = 1 ProcessPoolExecutor(max_workers=1) → symbol selalu ke
+#   worker yang sama, jadi state indikator per symbol bisa disimpan di worker.
+# - Candle dikirim lewat multiprocessing.shared_memory (blok per shard dibuat
+#   sekali saat start), bukan DataFrame yang di-pickle.
+
+import asyncio
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from config import LIMIT_KLINES, ANALYSIS_SLOTS_PER_WORKER
+
+TIMEFRAMES = ("1h", "15m", "5m")
+N_COLS = 6  # open_time, open, high, low, close, volume (KLINE_ARRAY_COLS)
+
+
+def _slot_shape(rows: int) -> Tuple[int, int, int]:
+    return (len(TIMEFRAMES), rows, N_COLS)
+
+
+# ================== SISI WORKER ==================
+
+# Global per proses worker (di-set oleh _worker_init)
+_SHM: shared_memory.SharedMemory | None = None
+_BLOCK: np.ndarray | None = None
+_SHARD_STATE: Dict[str, Dict[str, Any]] = {}
+
+
+def _worker_init(shm_name: str, slots: int, rows: int) -> None:
+    """
+    Dipanggil sekali saat worker start: attach shared memory & import pandas
+    supaya request pertama tidak kena biaya import.
+    """
+    global _SHM, _BLOCK
+    import pandas  # noqa: F401  (ipc_logic import pandas secara lazy)
+    import ipc_logic  # noqa: F401
+
+    _SHM = shared_memory.SharedMemory(name=shm_name)
+    _BLOCK = np.ndarray((slots,) + _slot_shape(rows), dtype=np.float64, buffer=_SHM.buf)
+
+
+def _worker_ping() -> int:
+    return 1
+
+
+def _worker_retain(keys: List[str], suffix: str) -> int:
+    """
+    Buang state shard symbol market ini (suffix key) yang keluar universe.
+    Return jumlah symbol yang tersisa di worker.
+    """
+    keep = set(keys)
+    for key in [k for k in _SHARD_STATE if k not in keep and _key_suffix(k) == suffix]:
+        del _SHARD_STATE[key]
+    return len(_SHARD_STATE)
+
+
+def _key_suffix(key: str) -> str:
+    dot = key.find(".")
+    return key[dot:] if dot >= 0 else ""
+
+
+def _ema_last_cached(
+    state: Dict[str, Any],
+    key: str,
+    window_key: Tuple[float, float],
+    closes: np.ndarray,
+    periods: Tuple[int, ...],
+) -> Dict[int, float]:
+    """
+    EMA (adjust=False) candle terakhir dengan cache per symbol.
+
+    Nilai EMA sampai candle ke -2 disimpan selama jendela data sama
+    (open_time pertama & open_time candle -2 tidak berubah). Candle terakhir
+    (yang masih berjalan) cukup di-update 1 langkah: prev + a * (x - prev).
+    """
+    import pandas as pd
+
+    from ipc_logic import ema
+
+    if state.get(key + "_key") != window_key:
+        series = pd.Series(closes[:-1])
+        state[key + "_prev"] = {p: float(ema(series, p).iloc[-1]) for p in periods}
+        state[key + "_key"] = window_key
+
+    last = float(closes[-1])
+    prev = state[key + "_prev"]
+    return {p: prev[p] + (2.0 / (p + 1)) * (last - prev[p]) for p in periods}
+
+
+def _trend_1h_from_state(state: Dict[str, Any], arr_1h: np.ndarray) -> int:
+    from ipc_logic import trend_direction_from_emas
+
+    closes = arr_1h[:, 4]
+    if len(closes) < 200:
+        return 0
+    window_key = (arr_1h[0, 0], arr_1h[-2, 0])
+    e = _ema_last_cached(state, "ema_1h", window_key, closes, (20, 50, 200))
+    return trend_direction_from_emas(float(closes[-1]), e[20], e[50], e[200])
+
+
+def _struct_15m_from_state(state: Dict[str, Any], arr_15m: np.ndarray) -> int:
+    from ipc_logic import struct_direction_from_values
+    from swings import SwingTracker
+
+    closes = arr_15m[:, 4]
+    if len(closes) < 50:
+        return 0
+    window_key = (arr_15m[0, 0], arr_15m[-2, 0])
+    e = _ema_last_cached(state, "ema_15m", window_key, closes, (50,))
+    swings = state.setdefault("swing_15m", SwingTracker()).update(arr_15m[:, 0], arr_15m[:, 2], arr_15m[:, 3])
+    return struct_direction_from_values(float(closes[-1]), e[50], swings)
+
+
+def _worker_analyse(
+    symbol: str,
+    slot: int,
+    lengths: Tuple[int, int, int],
+    trend_1h: int | None = None,
+    struct_15m: int | None = None,
+):
+    """
+    Analisa 1 symbol dari slot shared memory.
+    Trend 1H & struktur 15m memakai state EMA / swing per symbol (cache
+    shard), kecuali sudah dihitung di parent (mis. oleh bar engine saat tf
+    close). Swing 5m selalu dari cache shard.
+    """
+    from ipc_logic import analyse_ipc_frames, array_to_frame
+    from swings import SwingTracker
+
+    assert _BLOCK is not None, "worker belum di-init"
+    view = _BLOCK[slot]
+    arrs = {tf: np.array(view[i, :lengths[i]]) for i, tf in enumerate(TIMEFRAMES)}
+
+    state = _SHARD_STATE.setdefault(symbol, {})
+    if trend_1h is None:
+        trend_1h = _trend_1h_from_state(state, arrs["1h"])
+    if struct_15m is None:
+        struct_15m = _struct_15m_from_state(state, arrs["15m"])
+
+    return analyse_ipc_frames(
+        symbol,
+        array_to_frame(arrs["1h"]),
+        array_to_frame(arrs["15m"]),
+        array_to_frame(arrs["5m"]),
+        trend_1h=trend_1h,
+        struct_15m=struct_15m,
+        swings_5m=state.setdefault("swing_5m", SwingTracker()),
+    )
+
+
+# ================== SISI PARENT ==================
+
+
+class _Shard:
+    def __init__(self, slots: int, rows: int):
+        self.rows = rows
+        nbytes = slots * int(np.prod(_slot_shape(rows))) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.block = np.ndarray((slots,) + _slot_shape(rows), dtype=np.float64, buffer=self.shm.buf)
+        self.executor = ProcessPoolExecutor(
+            max_workers=1,
+            initializer=_worker_init,
+            initargs=(self.shm.name, slots, rows),
+        )
+        self.free_slots: asyncio.Queue | None = None
+        self.slots = slots
+
+    def ensure_queue(self) -> asyncio.Queue:
+        # Queue dibuat lazily supaya terikat ke event loop yang sedang jalan
+        if self.free_slots is None:
+            self.free_slots = asyncio.Queue()
+            for i in range(self.slots):
+                self.free_slots.put_nowait(i)
+        return self.free_slots
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.block = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class AnalysisPool:
+    """
+    Pool worker analisa IPC.
+
+    Pemakaian:
+        pool = AnalysisPool(workers=4)
+        pool.warm_up()
+        conditions, levels = await pool.analyse(symbol, frames)
+        pool.shutdown()
+
+    frames = {"1h": ndarray, "15m": ndarray, "5m": ndarray} (lihat
+    ipc_logic.frame_to_array).
+    """
+
+    def __init__(self, workers: int, slots_per_worker: int = ANALYSIS_SLOTS_PER_WORKER, rows: int = LIMIT_KLINES):
+        if workers <= 0:
+            raise ValueError("workers harus > 0")
+        self.workers = workers
+        self.rows = rows
+        self._shards: List[_Shard] = [_Shard(slots_per_worker, rows) for _ in range(workers)]
+
+    def shard_of(self, symbol: str) -> int:
+        return zlib.crc32(symbol.upper().encode()) % self.workers
+
+    def start_workers(self) -> list:
+        """
+        Fork semua worker sekarang tanpa menunggu init (import pandas) di
+        worker selesai. Harus dipanggil sebelum ada thread yang sedang import
+        (fork saat lock import dipegang thread lain → worker deadlock).
+        """
+        return [s.executor.submit(_worker_ping) for s in self._shards]
+
+    def retain(self, keys: Iterable[str], suffix: str = "") -> None:
+        """
+        Setelah refresh pair: tiap worker membuang cache EMA / swing symbol
+        market ini (signal key ber-suffix sama) yang tidak ada di keys.
+        """
+        per_shard: List[List[str]] = [[] for _ in self._shards]
+        for key in keys:
+            per_shard[self.shard_of(key)].append(key.upper())
+        for shard, shard_keys in zip(self._shards, per_shard):
+            shard.executor.submit(_worker_retain, shard_keys, suffix)
+
+    def warm_up(self) -> None:
+        """
+        Spawn semua worker sekarang (bukan saat sinyal pertama).
+        """
+        for f in self.start_workers():
+            f.result()
+
+    async def analyse(
+        self,
+        symbol: str,
+        frames: Dict[str, np.ndarray],
+        trend_1h: int | None = None,
+        struct_15m: int | None = None,
+    ):
+        shard = self._shards[self.shard_of(symbol)]
+        free_slots = shard.ensure_queue()
+        slot = await free_slots.get()
+        try:
+            lengths = []
+            for i, tf in enumerate(TIMEFRAMES):
+                arr = frames[tf][-shard.rows:]
+                shard.block[slot, i, :len(arr)] = arr
+                lengths.append(len(arr))
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                shard.executor,
+                _worker_analyse,
+                symbol.upper(),
+                slot,
+                tuple(lengths),
+                trend_1h,
+                struct_15m,
+            )
+        finally:
+            free_slots.put_nowait(slot)
+
+    def shutdown(self) -> None:
+        for s in self._shards:
+            try:
+                s.close()
+            except Exception as e:
+                print("Error shutdown analysis shard:", e)
+
+
+# ================== BENCHMARK ==================
+
+
+def _synthetic_frames(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    frames = {}
+    for tf, step_ms in (("1h", 3_600_000), ("15m", 900_000), ("5m", 300_000)):
+        close = 100.0 + np.cumsum(rng.normal(0.05, 1.0, rows))
+        open_ = np.r_[close[0], close[:-1]]
+        spread = np.abs(rng.normal(0, 0.5, rows))
+        arr = np.empty((rows, N_COLS), dtype=np.float64)
+        arr[:, 0] = np.arange(rows) * step_ms
+        arr[:, 1] = open_
+        arr[:, 2] = np.maximum(open_, close) + spread
+        arr[:, 3] = np.minimum(open_, close) - spread
+        arr[:, 4] = close
+        arr[:, 5] = rng.uniform(100, 1000, rows)
+        frames[tf] = arr
+    return frames
+
+
+async def _bench_once(workers: int, universe: Dict[str, Dict[str, np.ndarray]], rounds: int) -> float:
+    pool = AnalysisPool(workers=workers)
+    pool.warm_up()
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(pool.analyse(sym, fr) for sym, fr in universe.items()))
+        return time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+
+def run_benchmark(max_workers: int, n_symbols: int = 500, rounds: int = 3) -> None:
+    """
+    Benchmark scaling 1..max_workers core untuk n_symbols per "bar".
+    """
+    from ipc_logic import analyse_ipc_frames, array_to_frame
+
+    rng = np.random.default_rng(42)
+    universe = {f"SYM{i}USDT": _synthetic_frames(rng, LIMIT_KLINES) for i in range(n_symbols)}
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for sym, fr in universe.items():
+            analyse_ipc_frames(sym, array_to_frame(fr["1h"]), array_to_frame(fr["15m"]), array_to_frame(fr["5m"]))
+    inline = time.perf_counter() - start
+    print(f"inline   : {inline / rounds * 1000:8.1f} ms/bar ({n_symbols} symbol)")
+
+    for w in range(1, max_workers + 1):
+        elapsed = asyncio.run(_bench_once(w, universe, rounds))
+        print(
+            f"workers={w:<2}: {elapsed / rounds * 1000:8.1f} ms/bar "
+            f"(speedup vs inline x{inline / elapsed:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Benchmark AnalysisPool")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.workers, args.symbols, args.rounds)
@@ -0,0 +1,446 @@
+# bar_engine.py
+#
+# Bar engine multi-timeframe:
+# - Input: stream @kline_5m (default), @kline_1m, atau @aggTrade
+# - Output: candle 5m/15m/1h/4h yang dibangun lokal, align persis dengan
+#   open_time Binance (open_time % durasi_tf == 0, UTC)
+# - Event "timeframe close" → callback subscriber (detector)
+#
+# REST hanya dipakai sekali untuk backfill awal per symbol.
+#
+# Memori: candle closed per (symbol, tf) disimpan di CandleRing (array
+# float64 prealokasi, kapasitas tetap) → memori per symbol konstan, symbol
+# yang keluar universe dibuang di retain(). Cek kapasitas:
+#   python bar_engine.py --symbols 2000
+
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from config import LIMIT_KLINES, MAX_USDT_PAIRS
+
+TF_MS: Dict[str, int] = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+}
+
+# Sumber stream → timeframe dasar engine
+SOURCE_BASE_TF = {
+    "kline_5m": "5m",
+    "kline_1m": "1m",
+    "aggTrade": "1m",
+}
+
+# bar = [open_time, open, high, low, close, volume] (sama dengan KLINE_ARRAY_COLS)
+Bar = List[float]
+CloseCallback = Callable[[str, str, Bar], None]
+
+
+# baris cadangan ring: append ditulis di ekor tanpa menggeser data; saat
+# penuh, max_bars candle terakhir disalin ke array baru
+RING_SPARE = 64
+N_COLS = 6
+
+
+def tf_bucket(ts_ms: int, tf: str) -> int:
+    """
+    open_time bar timeframe tf yang memuat timestamp ts_ms.
+    """
+    step = TF_MS[tf]
+    return int(ts_ms) - int(ts_ms) % step
+
+
+class CandleRing:
+    """
+    Candle closed 1 (symbol, tf): array (N_COLS, max_bars + RING_SPARE)
+    kolom-mayor, jadi tiap kolom view() kontigu. Append hanya menulis di
+    belakang view yang sudah dibagikan dan pindah ke array baru saat penuh,
+    jadi view lama tidak pernah berubah (aman dipakai thread / task lain).
+    """
+
+    __slots__ = ("max_bars", "buf", "start", "end")
+
+    def __init__(self, max_bars: int, rows: np.ndarray | None = None):
+        self.max_bars = max_bars
+        self.buf = np.empty((N_COLS, max_bars + RING_SPARE), dtype=np.float64)
+        self.start = self.end = 0
+        if rows is not None and len(rows):
+            rows = rows[-max_bars:]
+            self.buf[:, :len(rows)] = rows.T
+            self.end = len(rows)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def nbytes(self) -> int:
+        return self.buf.nbytes
+
+    def last_open(self) -> float:
+        return float(self.buf[0, self.end - 1])
+
+    def append(self, bar: Bar) -> None:
+        if self.end == self.buf.shape[1]:
+            keep = self.max_bars - 1
+            buf = np.empty_like(self.buf)
+            buf[:, :keep] = self.buf[:, self.end - keep:self.end]
+            self.buf, self.start, self.end = buf, 0, keep
+        self.buf[:, self.end] = bar
+        self.end += 1
+        if self.end - self.start > self.max_bars:
+            self.start += 1
+
+    def view(self) -> np.ndarray:
+        """
+        (n, N_COLS) read-only tanpa copy.
+        """
+        rows = self.buf[:, self.start:self.end].T
+        rows.flags.writeable = False
+        return rows
+
+
+class BarEngine:
+    """
+    Menyimpan candle closed + candle yang sedang terbentuk per (symbol, tf).
+
+    Urutan event saat bar dasar close: timeframe terbesar dulu, lalu yang
+    lebih kecil, terakhir timeframe dasar. Jadi saat detector 5m jalan,
+    hasil detector 15m/1h untuk candle yang sama sudah ter-update.
+    """
+
+    def __init__(
+        self,
+        base_tf: str = "5m",
+        timeframes: Iterable[str] = ("5m", "15m", "1h", "4h"),
+        max_bars: int = LIMIT_KLINES,
+    ):
+        if base_tf not in TF_MS:
+            raise ValueError(f"Timeframe dasar tidak dikenal: {base_tf}")
+        self.base_tf = base_tf
+        self.max_bars = max_bars
+        self.higher_tfs: List[str] = sorted(
+            (tf for tf in timeframes if TF_MS[tf] > TF_MS[base_tf]),
+            key=lambda tf: TF_MS[tf],
+            reverse=True,
+        )
+        self.timeframes: List[str] = self.higher_tfs + [base_tf]
+
+        self._closed: Dict[Tuple[str, str], CandleRing] = {}
+        self._forming: Dict[Tuple[str, str], Bar] = {}
+        self._subscribers: Dict[str, List[CloseCallback]] = {tf: [] for tf in self.timeframes}
+
+        # symbol yang datanya bolong (gap) → perlu backfill ulang
+        self.needs_backfill: set = set()
+
+    # ---------- subscribe ----------
+
+    def subscribe(self, tf: str, callback: CloseCallback) -> None:
+        if tf not in self._subscribers:
+            raise ValueError(f"Timeframe {tf} tidak dibangun oleh engine ini")
+        self._subscribers[tf].append(callback)
+
+    def _emit(self, symbol: str, tf: str, bar: Bar) -> None:
+        for cb in self._subscribers[tf]:
+            try:
+                cb(symbol, tf, bar)
+            except Exception as e:
+                print(f"[{symbol}] Error subscriber {tf}:", e)
+
+    # ---------- storage ----------
+
+    def _series(self, symbol: str, tf: str) -> CandleRing:
+        key = (symbol, tf)
+        ring = self._closed.get(key)
+        if ring is None:
+            ring = self._closed[key] = CandleRing(self.max_bars)
+        return ring
+
+    def symbols(self) -> List[str]:
+        return sorted({sym for sym, _ in self._closed})
+
+    def has_history(self, symbol: str) -> bool:
+        return (symbol, self.base_tf) in self._closed
+
+    def retain(self, symbols: Iterable[str]) -> None:
+        """
+        Buang data symbol yang tidak ada lagi di universe.
+        """
+        keep = {s.upper() for s in symbols}
+        for key in [k for k in self._closed if k[0] not in keep]:
+            del self._closed[key]
+        for key in [k for k in self._forming if k[0] not in keep]:
+            del self._forming[key]
+        self.needs_backfill &= keep
+
+    def bytes_per_symbol(self) -> int:
+        return len(self.timeframes) * N_COLS * (self.max_bars + RING_SPARE) * 8
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Memori buffer candle (prealokasi): total & per symbol.
+        """
+        return {
+            "symbols": len(self.symbols()),
+            "bytes": sum(ring.nbytes for ring in self._closed.values()),
+            "per_symbol": self.bytes_per_symbol(),
+        }
+
+    def summary(self) -> str:
+        """
+        Ringkasan memori untuk /status (+ estimasi di MAX_USDT_PAIRS symbol).
+        """
+        usage = self.memory_usage()
+        return (
+            f"{usage['symbols']} symbol, {usage['bytes'] / 2**20:.1f} MB "
+            f"({usage['per_symbol'] / 1024:.0f} KB/symbol, "
+            f"{MAX_USDT_PAIRS} symbol ≈ {usage['per_symbol'] * MAX_USDT_PAIRS / 2**20:.0f} MB)"
+        )
+
+    def bars(self, symbol: str, tf: str, include_forming: bool = False) -> np.ndarray:
+        """
+        Candle (n, 6) float64 untuk detector: view read-only tanpa copy.
+        include_forming=True menambahkan candle timeframe tinggi yang belum
+        close di baris terakhir (hasil copy).
+        """
+        ring = self._closed.get((symbol, tf))
+        rows = ring.view() if ring is not None else np.empty((0, N_COLS), dtype=np.float64)
+        if include_forming:
+            forming = self._forming.get((symbol, tf))
+            if forming is not None:
+                rows = np.vstack([rows, [forming]])[-self.max_bars:]
+        return rows
+
+    # ---------- backfill ----------
+
+    def seed(self, symbol: str, base_rows: np.ndarray, higher_rows: Dict[str, np.ndarray], now_ms: int) -> None:
+        """
+        Isi history dari REST (sekali saat start / setelah gap).
+        - base_rows / higher_rows: array (n, 6) (lihat ipc_logic.frame_to_array)
+        - Baris yang belum close (open_time + durasi > now_ms) dibuang.
+        - Bar timeframe tinggi yang sedang terbentuk direkonstruksi dari bar
+          dasar yang sudah close, supaya tidak dobel hitung saat stream masuk.
+        - Ring baru per (symbol, tf): view lama tetap utuh.
+        """
+        symbol = symbol.upper()
+        base_ms = TF_MS[self.base_tf]
+
+        base_rows = np.asarray(base_rows, dtype=np.float64).reshape(-1, N_COLS)
+        base_closed = base_rows[base_rows[:, 0] + base_ms <= now_ms]
+        self._closed[(symbol, self.base_tf)] = CandleRing(self.max_bars, base_closed)
+
+        for tf in self.higher_tfs:
+            step = TF_MS[tf]
+            rows = higher_rows.get(tf)
+            if rows is not None:
+                rows = np.asarray(rows, dtype=np.float64).reshape(-1, N_COLS)
+                rows = rows[rows[:, 0] + step <= now_ms]
+            self._closed[(symbol, tf)] = CandleRing(self.max_bars, rows)
+            self._forming.pop((symbol, tf), None)
+
+            if not len(base_closed):
+                continue
+            bucket = tf_bucket(int(base_closed[-1, 0]), tf)
+            if rows is not None and len(rows) and rows[-1, 0] >= bucket:
+                # REST sudah memuat bar bucket ini (seed tepat setelah close
+                # tf tinggi) → jangan dibangun & di-append ulang
+                continue
+            for b in base_closed[base_closed[:, 0] >= bucket].tolist():
+                self._merge_forming(symbol, tf, bucket, b)
+            # bar terakhir dasar bisa jadi menutup bar tf ini
+            self._maybe_close_higher(symbol, tf, base_closed[-1].tolist(), emit=False)
+
+        self.needs_backfill.discard(symbol)
+
+    # ---------- agregasi ----------
+
+    def _merge_forming(self, symbol: str, tf: str, bucket: int, bar: Bar) -> None:
+        key = (symbol, tf)
+        cur = self._forming.get(key)
+        if cur is None or cur[0] != bucket:
+            self._forming[key] = [float(bucket), bar[1], bar[2], bar[3], bar[4], bar[5]]
+            return
+        cur[2] = max(cur[2], bar[2])
+        cur[3] = min(cur[3], bar[3])
+        cur[4] = bar[4]
+        cur[5] += bar[5]
+
+    def _maybe_close_higher(self, symbol: str, tf: str, base_bar: Bar, emit: bool = True) -> None:
+        key = (symbol, tf)
+        cur = self._forming.get(key)
+        if cur is None:
+            return
+        if base_bar[0] + TF_MS[self.base_tf] == cur[0] + TF_MS[tf]:
+            self._series(symbol, tf).append(cur)
+            del self._forming[key]
+            if emit:
+                self._emit(symbol, tf, cur)
+
+    def on_base_close(self, symbol: str, bar: Bar) -> None:
+        """
+        Bar dasar close → simpan, agregasi ke timeframe tinggi, emit event.
+        """
+        symbol = symbol.upper()
+        base = self._series(symbol, self.base_tf)
+        base_ms = TF_MS[self.base_tf]
+
+        if len(base):
+            last_open = base.last_open()
+            if bar[0] <= last_open:
+                return  # duplikat / bar lama
+            if bar[0] > last_open + base_ms:
+                # ada bar yang hilang (reconnect) → bar tf tinggi tidak valid lagi
+                self.needs_backfill.add(symbol)
+
+        base.append(bar)
+        for tf in self.higher_tfs:
+            self._merge_forming(symbol, tf, tf_bucket(int(bar[0]), tf), bar)
+            self._maybe_close_higher(symbol, tf, bar)
+        self._emit(symbol, self.base_tf, bar)
+
+    # ---------- input stream ----------
+
+    def on_kline(self, kline: Dict) -> bool:
+        """
+        Payload "k" dari @kline_<base_tf>. Return True kalau bar close.
+        """
+        if not kline.get("x", False):
+            return False
+        symbol = kline.get("s", "").upper()
+        if not symbol:
+            return False
+        bar = [
+            float(kline["t"]),
+            float(kline["o"]),
+            float(kline["h"]),
+            float(kline["l"]),
+            float(kline["c"]),
+            float(kline["v"]),
+        ]
+        self.on_base_close(symbol, bar)
+        return True
+
+    def on_agg_trade(self, symbol: str, price: float, qty: float, ts_ms: int) -> None:
+        """
+        Bangun bar dasar dari trade (@aggTrade). Bar close saat trade pertama
+        di bucket berikutnya masuk, atau saat flush_due() dipanggil.
+        """
+        symbol = symbol.upper()
+        bucket = tf_bucket(ts_ms, self.base_tf)
+        key = (symbol, "_trade")
+        cur = self._forming.get(key)
+        if cur is not None and cur[0] != bucket:
+            del self._forming[key]
+            self.on_base_close(symbol, cur)
+            cur = None
+        if cur is None:
+            self._forming[key] = [float(bucket), price, price, price, price, qty]
+            return
+        cur[2] = max(cur[2], price)
+        cur[3] = min(cur[3], price)
+        cur[4] = price
+        cur[5] += qty
+
+    def flush_due(self, now_ms: int) -> None:
+        """
+        Tutup bar trade yang periodenya sudah lewat (symbol sepi transaksi).
+        """
+        base_ms = TF_MS[self.base_tf]
+        for key in [k for k in self._forming if k[1] == "_trade"]:
+            cur = self._forming[key]
+            if cur[0] + base_ms <= now_ms:
+                del self._forming[key]
+                self.on_base_close(key[0], cur)
+
+
+# ================== CEK & KAPASITAS ==================
+
+
+def run_check() -> None:
+    """
+    Regresi seed(): backfill tepat setelah batas 15m / 1h / 4h (bar tf tinggi
+    yang baru close sudah ada di REST) tidak boleh menggandakan bar terakhir,
+    dan bar tf tinggi hasil agregasi stream harus sama dengan versi REST.
+    """
+    base_ms = TF_MS["5m"]
+    boundary = 1_700_000_000_000 - 1_700_000_000_000 % TF_MS["4h"]
+    failures = 0
+    for offset in (0, base_ms, 2 * base_ms, 3 * base_ms):
+        engine = BarEngine()
+        now_ms = boundary + offset
+        n = 300
+        times = now_ms - base_ms * np.arange(n, 0, -1, dtype=np.float64)
+        base = np.column_stack([times, np.full(n, 1.0), np.full(n, 2.0), np.full(n, 0.5), np.full(n, 1.5), np.ones(n)])
+        higher = {}
+        for tf in engine.higher_tfs:
+            step = TF_MS[tf]
+            # REST: bar closed + bar yang sedang jalan (dibuang seed)
+            ht = tf_bucket(now_ms, tf) - step * np.arange(engine.max_bars - 1, -1, -1, dtype=np.float64)
+            higher[tf] = np.column_stack([ht, np.full(len(ht), 1.0), np.full(len(ht), 2.0), np.full(len(ht), 0.5),
+                                          np.full(len(ht), 1.5), np.full(len(ht), step / base_ms)])
+        engine.seed("TESTUSDT", base, higher, now_ms + 1000)
+        for tf in engine.higher_tfs:
+            opens = engine.bars("TESTUSDT", tf)[:, 0]
+            step = TF_MS[tf]
+            ok = len(opens) and opens[-1] == tf_bucket(now_ms, tf) - step and bool(np.all(np.diff(opens) == step))
+            if not ok:
+                failures += 1
+                print(f"GAGAL offset {offset // 1000}s tf {tf}: ekor open_time {opens[-3:].tolist()}")
+    print(f"seed di batas timeframe: {'OK' if not failures else f'{failures} gagal'}")
+
+
+# ================== KAPASITAS & BENCHMARK ==================
+
+
+def run_benchmark(n_symbols: int = 2000, rounds: int = 2000) -> None:
+    """
+    Memori buffer candle untuk n_symbols + biaya bars() per analisa.
+    """
+    import time
+
+    engine = BarEngine()
+    base_ms = TF_MS[engine.base_tf]
+    now_ms = 1_700_000_000_000 - 1_700_000_000_000 % TF_MS["4h"]
+    n = engine.max_bars * TF_MS["4h"] // base_ms
+    times = now_ms - base_ms * np.arange(n, 0, -1, dtype=np.float64)
+    base = np.column_stack([times] + [np.full(n, 100.0)] * 4 + [np.ones(n)])
+    higher = {}
+    for tf in engine.higher_tfs:
+        ht = now_ms - TF_MS[tf] * np.arange(engine.max_bars, 0, -1, dtype=np.float64)
+        higher[tf] = np.column_stack([ht] + [np.full(len(ht), 100.0)] * 4 + [np.ones(len(ht))])
+
+    start = time.perf_counter()
+    for i in range(n_symbols):
+        engine.seed(f"SYM{i}USDT", base, higher, now_ms)
+    t_seed = time.perf_counter() - start
+    usage = engine.memory_usage()
+    print(f"{usage['symbols']} symbol x {len(engine.timeframes)} tf x {engine.max_bars}(+{RING_SPARE}) candle:")
+    print(f"memori candle : {usage['bytes'] / 2**20:8.1f} MB ({usage['per_symbol'] / 1024:.1f} KB/symbol)")
+    print(f"seed          : {t_seed * 1000:8.1f} ms total")
+
+    bar = [now_ms, 100.0, 101.0, 99.0, 100.5, 1.0]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        bar[0] += base_ms
+        engine.on_base_close("SYM0USDT", list(bar))
+        for tf in ("1h", "15m", "5m"):
+            engine.bars("SYM0USDT", tf)
+    print(f"close + bars(): {(time.perf_counter() - start) / rounds * 1e6:8.1f} us / candle (3 tf)")
+
+    engine.retain([])
+    print(f"setelah retain([]): {engine.memory_usage()['bytes']} byte")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Kapasitas memori & benchmark BarEngine")
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--check", action="store_true", help="hanya cek regresi seed()")
+    args = parser.parse_args()
+    run_check()
+    if not args.check:
+        run_benchmark(args.symbols, args.rounds)
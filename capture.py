@@ -0,0 +1,297 @@
+# capture.py
+#
+# Rekam & replay market data (tes performa deterministik):
+# - CaptureWriter : frame WS mentah + response REST (JSON) per market ditulis
+#   append-only ke file gzip JSON-lines. Tiap flush = 1 member gzip baru di
+#   akhir file → file tetap terbaca walau proses mati di tengah jalan.
+# - CaptureReplay : putar ulang capture 1x / Nx / secepatnya (speed 0).
+#   WS diganti ReplaySocket (recv() dari capture), REST dilayani dari response
+#   terekam → analisa & broadcast bisa diprofil dengan input yang persis sama.
+#   Speed 0: sebelum frame bar berikutnya, replay menunggu pipeline (analisa
+#   & dispatch) bar sebelumnya selesai (settle) → hasil sama di mesin cepat /
+#   lambat; jendela batch real-time tidak menggabungkan bar yang berbeda.
+#
+# Record: {"t": epoch detik, "k": "ws" | "rest", "m": market, ...}
+#   ws  : "d" = frame mentah (string)
+#   rest: "p" = path, "q" = params, "r" = body JSON
+#
+# Contoh:
+#   CAPTURE_MODE=record python main.py                  (sesi live)
+#   python loadtest.py --replay data/capture.jsonl.gz --speed 0
+#   python capture.py data/capture.jsonl.gz             (ringkasan isi capture)
+
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Tuple
+
+import websockets
+
+# flush buffer rekaman ke file tiap X detik / X record
+FLUSH_SEC = 1.0
+FLUSH_RECORDS = 5000
+
+# response REST boleh dipakai sampai X detik (waktu rekaman) sebelum jam replay:
+# request dikirim setelah frame pemicunya, jadi response tercatat sedikit lebih baru
+REST_SLACK_SEC = 30.0
+
+# frame per market yang boleh antre di depan scan_loop
+REPLAY_QUEUE_FRAMES = 1000
+
+# speed 0: jeda waktu rekaman setelah candle close terakhir → bar dianggap
+# selesai, tunggu settle sebelum lanjut
+SETTLE_GAP_SEC = 2.0
+
+
+def _is_close_frame(frame: str) -> bool:
+    return '"x":true' in frame or '"x": true' in frame
+
+
+def _rest_key(market: str, path: str, params: Dict[str, Any] | None) -> Tuple[str, str, str]:
+    return market, path, json.dumps(params or {}, sort_keys=True)
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Record capture berurutan. Member gzip terakhir yang terpotong (proses
+    mati saat menulis) dilewati.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        print(f"Capture {path} terpotong di akhir ({e}), sisa record dilewati.")
+
+
+# ================== REKAM ==================
+
+
+class CaptureWriter:
+    replaying = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buf: List[str] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+        self.n_ws = 0
+        self.n_rest = 0
+
+    def _add(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._buf.append(line)
+            due = len(self._buf) >= FLUSH_RECORDS or record["t"] - self._last_flush >= FLUSH_SEC
+        if due:
+            self.flush()
+
+    def record_ws(self, market: str, frame: str) -> None:
+        self.n_ws += 1
+        self._add({"t": time.time(), "k": "ws", "m": market, "d": frame})
+
+    def record_rest(self, market: str, path: str, params: Dict[str, Any] | None, body: Any) -> None:
+        # dipanggil dari thread (asyncio.to_thread / pool on-demand)
+        self.n_rest += 1
+        self._add({"t": time.time(), "k": "rest", "m": market, "p": path, "q": params or {}, "r": body})
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buf = self._buf, []
+            self._last_flush = time.time()
+            if not lines:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), compresslevel=5))
+
+    def close(self) -> None:
+        self.flush()
+        print(f"Capture tersimpan: {self.n_ws} frame WS, {self.n_rest} response REST → {self.path}")
+
+
+# ================== REPLAY ==================
+
+
+class ReplaySocket:
+    """
+    Pengganti koneksi websockets untuk scan_loop: recv() / close().
+    Posisi frame disimpan di CaptureReplay, jadi reconnect / hot swap lanjut
+    dari frame berikutnya.
+    """
+
+    def __init__(self, replay: "CaptureReplay", market: str):
+        self.replay = replay
+        self.market = market
+        self.closed = False
+
+    async def recv(self) -> str:
+        if self.closed:
+            raise websockets.ConnectionClosed(None, None)
+        frame = await self.replay.queues[self.market].get()
+        if frame is None:
+            # capture habis: diam sampai shutdown (on_done yang memicu stop)
+            self.replay.queues[self.market].put_nowait(None)
+            await asyncio.Future()
+        return frame
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class CaptureReplay:
+    replaying = True
+
+    def __init__(
+        self,
+        path: str,
+        markets: List[str],
+        speed: float = 1.0,
+        on_done: Callable[[], None] | None = None,
+        settle: Callable[[], Awaitable[None]] | None = None,
+    ):
+        self.path = path
+        self.markets = list(markets)
+        # 1 = real-time, N = N kali lebih cepat, <= 0 = secepatnya
+        self.speed = speed
+        self.on_done = on_done
+        # speed 0: coroutine "tunggu analisa & dispatch selesai" dari main
+        self.settle = settle
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self._pump: asyncio.Task | None = None
+
+        # REST di-index penuh di depan (backfill terjadi sebelum frame pertama);
+        # frame WS dibaca bertahap saat replay
+        self._rest: Dict[Tuple[str, str, str], List[Tuple[float, Any]]] = {}
+        self._rest_pos: Dict[Tuple[str, str, str], int] = {}
+        self.t_start = None
+        for rec in iter_records(path):
+            if self.t_start is None:
+                self.t_start = rec["t"]
+            if rec["k"] == "rest":
+                self._rest.setdefault(_rest_key(rec["m"], rec["p"], rec["q"]), []).append((rec["t"], rec["r"]))
+        if self.t_start is None:
+            raise ValueError(f"Capture kosong / tidak terbaca: {path}")
+        # jam replay = waktu rekaman frame terakhir yang sudah dikirim
+        self.clock = self.t_start
+        self.n_ws = 0
+        self.n_rest = 0
+
+    # ---------- REST ----------
+
+    def rest(self, market: str, path: str, params: Dict[str, Any] | None) -> Any:
+        """
+        Response terekam untuk request yang sama: urut sesuai rekaman, tapi
+        lompat maju ke response terbaru <= jam replay kalau versi kode ini
+        request lebih jarang dari sesi rekaman.
+        """
+        key = _rest_key(market, path, params)
+        entries = self._rest.get(key)
+        if not entries:
+            raise RuntimeError(f"Response REST tidak ada di capture: {market} {path} {params}")
+        limit = self.clock + REST_SLACK_SEC
+        pos = self._rest_pos.get(key, 0)
+        while pos + 1 < len(entries) and entries[pos + 1][0] <= limit:
+            pos += 1
+        idx = min(pos, len(entries) - 1)
+        self._rest_pos[key] = idx + 1
+        self.n_rest += 1
+        return entries[idx][1]
+
+    # ---------- WS ----------
+
+    def connect(self, market: str) -> ReplaySocket:
+        if market not in self.markets:
+            raise ValueError(f"Market {market} tidak ada di replay ({', '.join(self.markets)})")
+        if not self.queues:
+            self.queues = {m: asyncio.Queue(maxsize=REPLAY_QUEUE_FRAMES) for m in self.markets}
+        if self._pump is None:
+            self._pump = asyncio.create_task(self._run())
+        return ReplaySocket(self, market)
+
+    async def _settle(self) -> None:
+        # frame yang sudah antre harus diproses scan_loop dulu
+        while any(q.qsize() for q in self.queues.values()):
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        if self.settle is not None:
+            await self.settle()
+
+    async def _run(self) -> None:
+        real_start = time.monotonic()
+        rec_start = None
+        last_close = None
+        for rec in iter_records(self.path):
+            if rec["k"] != "ws" or rec["m"] not in self.queues:
+                continue
+            t = rec["t"]
+            if rec_start is None:
+                rec_start = t
+            if self.speed > 0:
+                delay = real_start + (t - rec_start) / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif last_close is not None and t - last_close >= SETTLE_GAP_SEC:
+                await self._settle()
+                last_close = None
+            self.clock = t
+            await self.queues[rec["m"]].put(rec["d"])
+            self.n_ws += 1
+            if self.speed <= 0:
+                if _is_close_frame(rec["d"]):
+                    last_close = t
+                if self.n_ws % 100 == 0:
+                    await asyncio.sleep(0)
+
+        if self.speed <= 0:
+            await self._settle()
+        for q in self.queues.values():
+            await q.put(None)
+        elapsed = time.monotonic() - real_start
+        span = self.clock - (rec_start if rec_start is not None else self.clock)
+        print(
+            f"Replay selesai: {self.n_ws} frame WS ({self.n_ws / max(elapsed, 1e-9):,.0f}/s), "
+            f"{self.n_rest} response REST, rekaman {span:.0f} s diputar dalam {elapsed:.1f} s "
+            f"(x{span / max(elapsed, 1e-9):.1f})."
+        )
+        if self.on_done is not None:
+            self.on_done()
+
+    def close(self) -> None:
+        if self._pump is not None and not self._pump.done():
+            self._pump.cancel()
+
+
+def summarize(path: str) -> Dict[str, Any]:
+    """
+    Ringkasan isi capture per market: jumlah frame, candle close, REST, durasi.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    t_first = t_last = None
+    for rec in iter_records(path):
+        t_first = rec["t"] if t_first is None else t_first
+        t_last = rec["t"]
+        m = out.setdefault(rec["m"], {"ws": 0, "closes": 0, "rest": 0})
+        if rec["k"] == "ws":
+            m["ws"] += 1
+            if _is_close_frame(rec["d"]):
+                m["closes"] += 1
+        else:
+            m["rest"] += 1
+    return {"markets": out, "duration_sec": (t_last - t_first) if t_first is not None else 0.0}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ringkasan file capture market data")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    info = summarize(args.path)
+    print(f"durasi rekaman: {info['duration_sec']:.0f} s")
+    for market, m in info["markets"].items():
+        print(f"[{market}] frame WS {m['ws']}, candle close {m['closes']}, response REST {m['rest']}")
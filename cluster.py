@@ -0,0 +1,520 @@
+# cluster.py
+#
+# Deployment multi-proses (DEPLOY_ROLE), 1 host atau lintas host:
+# - coordinator: pemilik universe (get_usdt_pairs_with_volume), subscriber,
+#   cooldown / dedupe, dispatcher & delivery Telegram. Universe tiap market
+#   dibagi jadi shard ke N proses scanner (round-robin urut volume → pair
+#   ramai tersebar rata), dibagi ulang saat scanner masuk / keluar / mati.
+# - scanner: scan_loop biasa (WS, bar engine, analisa, intrabar) untuk
+#   shard-nya saja; hasil analisa mentah dikirim ke coordinator → scoring,
+#   cooldown & dedupe terpusat, tidak peduli scanner mana yang menemukan.
+#
+# Kanal: Unix socket (1 host) atau TCP (lintas host), 1 pesan JSON per baris.
+#   scanner → coordinator: hello, result, early, cancel, hold / release
+#                          (batch bar → seleksi per bar lintas scanner),
+#                          notify (alert watchdog → admin), kline / price (harga
+#                          sinyal terbuka untuk outcome tracker), beat
+#   coordinator → scanner: assign (shard per market), scan (status scan),
+#                          cool (salinan cooldown, skip analisa), track (key
+#                          sinyal terbuka), restart (soft restart WS)
+#
+# Contoh 1 host (MARKETS & setting scan sama di semua proses):
+#   DEPLOY_ROLE=coordinator python main.py
+#   DEPLOY_ROLE=scanner SCANNER_NAME=s1 python main.py
+#   DEPLOY_ROLE=scanner SCANNER_NAME=s2 python main.py
+
+import asyncio
+import hmac
+import json
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from config import (
+    COORDINATOR_ADDRESS,
+    COORDINATOR_TOKEN,
+    SCANNER_NAME,
+    SCANNER_TIMEOUT_SEC,
+    REFRESH_PAIR_INTERVAL_HOURS,
+    TELEGRAM_ADMIN_ID,
+)
+
+# 1 baris JSON maksimal (assign 1000+ symbol, kline sinyal terbuka)
+LINE_LIMIT = 4 * 1024 * 1024
+BEAT_SEC = 5.0
+SYNC_SEC = 1.0
+RECONNECT_SEC = 2.0
+# refresh universe gagal → coba lagi setelah X detik
+UNIVERSE_RETRY_SEC = 10.0
+
+
+def parse_address(address: str) -> Tuple:
+    """
+    "unix:<path>" → ("unix", path); "tcp:<host>:<port>" → ("tcp", host, port).
+    """
+    kind, _, rest = address.partition(":")
+    if kind == "unix" and rest:
+        return "unix", rest
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        if host and port.isdigit():
+            return "tcp", host, int(port)
+    raise ValueError(f"COORDINATOR_ADDRESS tidak valid: {address} (unix:<path> / tcp:<host>:<port>)")
+
+
+def _jsonable(obj):
+    # numpy scalar (bool_, float64) dari detector
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Tidak bisa di-encode: {type(obj).__name__}")
+
+
+def encode(msg: Dict[str, Any]) -> bytes:
+    return (json.dumps(msg, separators=(",", ":"), default=_jsonable) + "\n").encode("utf-8")
+
+
+def assign_shards(symbols: List[str], workers: List[str]) -> Dict[str, List[str]]:
+    """
+    symbols sudah urut volume terbesar → round-robin supaya tiap scanner dapat
+    campuran pair ramai & sepi. Scanner diurut nama (pembagian stabil).
+    """
+    names = sorted(workers)
+    return {name: symbols[i::len(names)] for i, name in enumerate(names)}
+
+
+# ================== COORDINATOR ==================
+
+
+class WorkerConn:
+    def __init__(self, name: str, writer: asyncio.StreamWriter):
+        self.name = name
+        self.writer = writer
+        # batch bar scanner ini yang sedang menahan dispatcher
+        self.holds = 0
+        self.last_seen = time.time()
+        self.shards: Dict[str, List[str]] = {}
+        self.results = 0
+        self.info: Dict[str, Any] = {}
+
+    def send(self, msg: Dict[str, Any]) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(encode(msg))
+
+
+class Coordinator:
+    """
+    Jalan di proses bot utama menggantikan scan_loop. Hasil scanner masuk
+    lewat callback yang sama dengan mode single (process_ipc_result dkk).
+    """
+
+    def __init__(
+        self,
+        state,
+        adapters,
+        refresh_universe: Callable,
+        on_result: Callable[[str, dict | None, dict | None], None],
+        on_early: Callable[[str, dict, dict], Any],
+        on_cancel: Callable[[str], None],
+        address: str = COORDINATOR_ADDRESS,
+        token: str = COORDINATOR_TOKEN,
+    ):
+        self.state = state
+        self.adapters = list(adapters)
+        self.refresh_universe = refresh_universe
+        self.on_result = on_result
+        self.on_early = on_early
+        self.on_cancel = on_cancel
+        self.address = address
+        self.token = token
+        self.refresh_interval = REFRESH_PAIR_INTERVAL_HOURS * 3600
+
+        self.workers: Dict[str, WorkerConn] = {}
+        self._version = 0
+        self._retry_at: Dict[str, float] = {}
+        # terakhir disebar ke scanner (kirim ulang hanya kalau berubah)
+        self._sent_scan = None
+        self._sent_cool = None
+        self._sent_track = None
+
+    # ---------- server ----------
+
+    async def _start_server(self):
+        addr = parse_address(self.address)
+        if addr[0] == "unix":
+            path = addr[1]
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path):
+                os.unlink(path)  # socket sisa proses sebelumnya
+            return await asyncio.start_unix_server(self._serve, path=path, limit=LINE_LIMIT)
+        if not self.token:
+            # peer tanpa token bisa kirim notify / harga palsu → jangan listen
+            raise ValueError("Coordinator TCP wajib COORDINATOR_TOKEN (shared secret scanner).")
+        return await asyncio.start_server(self._serve, addr[1], addr[2], limit=LINE_LIMIT)
+
+    async def run(self) -> None:
+        server = await self._start_server()
+        print(f"Coordinator listen di {self.address}, menunggu scanner...")
+        try:
+            while True:
+                await self._refresh_universe_due()
+                self._sync()
+                await asyncio.sleep(SYNC_SEC)
+        finally:
+            server.close()
+            for conn in list(self.workers.values()):
+                conn.writer.close()
+            addr = parse_address(self.address)
+            if addr[0] == "unix" and os.path.exists(addr[1]):
+                os.unlink(addr[1])
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = None
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), timeout=10) or b"{}")
+            token = str(hello.get("token", "")).encode("utf-8")
+            if hello.get("t") != "hello" or not hmac.compare_digest(token, self.token.encode("utf-8")):
+                print("Scanner ditolak (handshake / token salah).")
+                return
+            name = str(hello.get("name") or f"scanner-{id(writer)}")
+            old = self.workers.get(name)
+            if old is not None:
+                old.writer.close()
+            conn = self.workers[name] = WorkerConn(name, writer)
+            print(f"Scanner {name} bergabung ({len(self.workers)} aktif).")
+            self._welcome(conn)
+            self._rebalance()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self._handle(conn, json.loads(line))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    # 1 pesan rusak tidak memutus scanner
+                    print(f"Pesan scanner {conn.name} tidak valid, dilewati: {e!r}")
+        except (asyncio.TimeoutError, ConnectionError, ValueError, AttributeError) as e:
+            print(f"Koneksi scanner {conn.name if conn else '?'} error:", e)
+        finally:
+            writer.close()
+            if conn is not None:
+                # batch bar scanner ini yang belum selesai tidak boleh menahan dispatcher
+                for _ in range(conn.holds):
+                    self.state.dispatcher.release()
+                conn.holds = 0
+                if self.workers.get(conn.name) is conn:
+                    del self.workers[conn.name]
+                    print(f"Scanner {conn.name} keluar ({len(self.workers)} aktif), shard dibagi ulang.")
+                    self._rebalance()
+
+    def _handle(self, conn: WorkerConn, msg: Dict[str, Any]) -> None:
+        state = self.state
+        t = msg.get("t")
+        conn.last_seen = time.time()
+        if t == "result":
+            conn.results += 1
+            self.on_result(msg["key"], msg.get("c"), msg.get("l"))
+        elif t == "hold":
+            conn.holds += 1
+            state.dispatcher.hold()
+        elif t == "release":
+            # release setelah reconnect (tahanan lama sudah dilepas) diabaikan
+            if conn.holds > 0:
+                conn.holds -= 1
+                state.dispatcher.release()
+        elif t == "early":
+            self.on_early(msg["key"], msg["c"], msg["l"])
+        elif t == "cancel":
+            self.on_cancel(msg["key"])
+        elif t == "kline":
+            if state.outcomes is not None:
+                state.outcomes.on_kline(msg["key"], msg["k"])
+        elif t == "price":
+            if state.outcomes is not None:
+                state.outcomes.on_price(msg["key"], float(msg["p"]))
+        elif t == "notify":
+            # hanya ke admin: chat tujuan tidak pernah diambil dari scanner
+            if TELEGRAM_ADMIN_ID:
+                state.delivery.enqueue(TELEGRAM_ADMIN_ID, f"🛰 Scanner *{conn.name}*\n{msg['text']}")
+        elif t == "beat":
+            conn.info = msg.get("info") or {}
+
+    # ---------- shard & sinkronisasi ----------
+
+    def _rebalance(self, force: bool = False) -> None:
+        """
+        Bagi universe tiap market ke scanner aktif; scanner hanya dikirimi
+        shard yang berubah (force: semua, mis. hard restart).
+        """
+        if not self.workers:
+            return
+        for adapter in self.adapters:
+            market = adapter.name
+            symbols = self.state.universe.get(market, {}).get("symbols", [])
+            for name, shard in assign_shards(symbols, list(self.workers)).items():
+                conn = self.workers[name]
+                if force or conn.shards.get(market) != shard:
+                    self._version += 1
+                    conn.shards[market] = shard
+                    conn.send({"t": "assign", "market": market, "symbols": shard, "v": self._version})
+
+    def _scan_state(self) -> Dict[str, bool]:
+        return {"enabled": self.state.scanning_enabled, "paused": self.state.paused}
+
+    def _tracked(self) -> List[str]:
+        return sorted(self.state.outcomes.open_symbols()) if self.state.outcomes is not None else []
+
+    def _welcome(self, conn: WorkerConn) -> None:
+        conn.send({"t": "scan", **self._scan_state()})
+        conn.send({"t": "cool", "items": self.state.cooldowns.expiries()})
+        conn.send({"t": "track", "keys": self._tracked()})
+
+    def _broadcast(self, msg: Dict[str, Any]) -> None:
+        for conn in list(self.workers.values()):
+            conn.send(msg)
+
+    def _sync(self) -> None:
+        state = self.state
+        scan = self._scan_state()
+        if scan != self._sent_scan:
+            self._broadcast({"t": "scan", **scan})
+            self._sent_scan = scan
+        cool = state.cooldowns.expiries()
+        if cool != self._sent_cool:
+            self._broadcast({"t": "cool", "items": cool})
+            self._sent_cool = cool
+        track = self._tracked()
+        if track != self._sent_track:
+            self._broadcast({"t": "track", "keys": track})
+            self._sent_track = track
+        if state.request_soft_restart:
+            state.request_soft_restart = False
+            self._broadcast({"t": "restart"})
+            print(f"Soft restart diteruskan ke {len(self.workers)} scanner.")
+
+        now = time.time()
+        for conn in list(self.workers.values()):
+            if now - conn.last_seen > SCANNER_TIMEOUT_SEC:
+                print(f"Scanner {conn.name} tanpa heartbeat {now - conn.last_seen:.0f} s → diputus.")
+                conn.writer.close()
+
+    async def _refresh_universe_due(self) -> None:
+        state = self.state
+        hard = state.request_hard_restart
+        now = time.time()
+        for adapter in self.adapters:
+            market = adapter.name
+            uni = state.universe.setdefault(market, {"symbols": [], "refreshed": 0.0})
+            due = not uni["symbols"] or now - uni["refreshed"] > self.refresh_interval
+            # hard restart: tiap market cukup 1x berhasil refresh
+            forced = hard and market not in state.hard_restart_done
+            if not (due or forced) or now < self._retry_at.get(market, 0.0):
+                continue
+            print(f"[{market}] Refresh daftar pair USDT berdasarkan volume...")
+            try:
+                symbols = await asyncio.to_thread(self.refresh_universe, adapter)
+            except Exception as e:
+                print("Gagal refresh pair:", e)
+                self._retry_at[market] = now + UNIVERSE_RETRY_SEC
+                continue
+            uni["symbols"] = list(symbols)
+            uni["refreshed"] = time.time()
+            if hard:
+                state.hard_restart_done.add(market)
+            print(f"[{market}] {len(symbols)} pair dibagi ke {len(self.workers)} scanner.")
+            if TELEGRAM_ADMIN_ID:
+                state.delivery.enqueue(
+                    TELEGRAM_ADMIN_ID,
+                    f"🔄 Pair list *{market}* diperbarui.\nTotal pair: *{len(symbols)}*, "
+                    f"dibagi ke *{len(self.workers)}* scanner.",
+                )
+            self._rebalance()
+        # flag dilepas hanya kalau semua market berhasil refresh (sama seperti
+        # scan_loop); market yang gagal dicoba lagi setelah UNIVERSE_RETRY_SEC
+        if hard and state.hard_restart_done >= {a.name for a in self.adapters}:
+            state.request_hard_restart = False
+            state.hard_restart_done.clear()
+            # versi shard naik walau isinya sama → scanner reconnect & backfill ulang
+            self._rebalance(force=True)
+
+    # ---------- status ----------
+
+    def summary(self) -> str:
+        if not self.workers:
+            return "0 scanner terhubung"
+        parts = []
+        for conn in sorted(self.workers.values(), key=lambda c: c.name):
+            shards = ", ".join(f"{m} {len(s)}" for m, s in conn.shards.items())
+            parts.append(f"{conn.name} ({shards}; hasil {conn.results})")
+        return f"{len(self.workers)} scanner: " + "; ".join(parts)
+
+
+# ================== SCANNER ==================
+
+
+class CoordinatorLink:
+    """
+    Sisi scanner. Di state scanner objek ini menggantikan komponen milik
+    coordinator:
+    - dispatcher : hold / release (batch bar), pending, flush
+    - delivery   : enqueue (alert watchdog → admin lewat coordinator), start / join / stop
+    - outcomes   : has_open / on_kline / on_price → harga key sinyal terbuka diteruskan
+    Hasil analisa dikirim lewat result / early / cancel (process_ipc_result dkk).
+    """
+
+    def __init__(self, state, address: str = COORDINATOR_ADDRESS, token: str = COORDINATOR_TOKEN, name: str = SCANNER_NAME):
+        self.state = state
+        self.address = address
+        self.token = token
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        # market → (versi, symbols) shard dari coordinator
+        self.shards: Dict[str, Tuple[int, List[str]]] = {}
+        self.tracked: set = set()
+        self.sent = 0
+        self.dropped = 0
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+
+    def shard(self, market: str) -> Tuple[int, List[str]]:
+        return self.shards.get(market, (0, []))
+
+    # ---------- kirim ----------
+
+    def _send(self, msg: Dict[str, Any]) -> None:
+        w = self._writer
+        if w is None or w.is_closing():
+            # coordinator putus: hasil dibuang (cooldown / seleksi ada di sana)
+            self.dropped += 1
+            return
+        w.write(encode(msg))
+        self.sent += 1
+
+    def result(self, key: str, conditions, levels) -> None:
+        self._send({"t": "result", "key": key, "c": conditions, "l": levels})
+
+    def early(self, key: str, conditions, levels) -> None:
+        self._send({"t": "early", "key": key, "c": conditions, "l": levels})
+
+    def cancel(self, key: str) -> None:
+        self._send({"t": "cancel", "key": key})
+
+    # ---------- pengganti dispatcher ----------
+
+    def hold(self) -> None:
+        self._send({"t": "hold"})
+
+    def release(self) -> None:
+        self._send({"t": "release"})
+
+    def pending(self) -> int:
+        w = self._writer
+        return w.transport.get_write_buffer_size() if w is not None and not w.is_closing() else 0
+
+    def flush(self) -> int:
+        return 0
+
+    # ---------- pengganti delivery ----------
+
+    def enqueue(self, chat_id: int, payload) -> None:
+        # coordinator selalu meneruskan ke admin (chat_id tidak dikirim)
+        self._send({"t": "notify", "text": str(payload)})
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def join(self) -> None:
+        w = self._writer
+        if w is not None and not w.is_closing():
+            await w.drain()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------- pengganti outcome tracker ----------
+
+    @property
+    def has_open(self) -> bool:
+        return bool(self.tracked)
+
+    def on_kline(self, key: str, kline: Dict) -> None:
+        if key in self.tracked:
+            self._send({"t": "kline", "key": key, "k": kline})
+
+    def on_price(self, key: str, price: float) -> None:
+        if key in self.tracked:
+            self._send({"t": "price", "key": key, "p": price})
+
+    # ---------- koneksi ----------
+
+    async def _connect(self):
+        addr = parse_address(self.address)
+        if addr[0] == "unix":
+            return await asyncio.open_unix_connection(addr[1], limit=LINE_LIMIT)
+        return await asyncio.open_connection(addr[1], addr[2], limit=LINE_LIMIT)
+
+    async def _run(self) -> None:
+        warned = False
+        while True:
+            try:
+                reader, writer = await self._connect()
+            except OSError as e:
+                if not warned:
+                    print(f"Coordinator {self.address} belum bisa dihubungi ({e}), mencoba terus...")
+                    warned = True
+                await asyncio.sleep(RECONNECT_SEC)
+                continue
+            warned = False
+            writer.write(encode({"t": "hello", "name": self.name, "token": self.token}))
+            self._writer = writer
+            print(f"Terhubung ke coordinator {self.address} sebagai {self.name}.")
+            beat = asyncio.create_task(self._beat())
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._handle(json.loads(line))
+            except (ConnectionError, ValueError) as e:
+                print("Koneksi coordinator error:", e)
+            finally:
+                beat.cancel()
+                self._writer = None
+                writer.close()
+            print("Koneksi coordinator putus, reconnect...")
+            await asyncio.sleep(RECONNECT_SEC)
+
+    def _handle(self, msg: Dict[str, Any]) -> None:
+        state = self.state
+        t = msg.get("t")
+        if t == "assign":
+            self.shards[msg["market"]] = (int(msg["v"]), list(msg["symbols"]))
+            print(f"[{msg['market']}] Shard dari coordinator: {len(msg['symbols'])} pair.")
+        elif t == "scan":
+            state.scanning_enabled = bool(msg["enabled"])
+            state.paused = bool(msg["paused"])
+        elif t == "cool":
+            state.cooldowns.mirror({k: float(v) for k, v in msg["items"].items()})
+        elif t == "track":
+            self.tracked = set(msg["keys"])
+        elif t == "restart":
+            state.request_soft_restart = True
+
+    async def _beat(self) -> None:
+        while True:
+            state = self.state
+            analysis = len(state.analysis_tasks) + sum(
+                len(s.in_flight()) for s in state.stream_scanners.values() if s is not None
+            )
+            self._send({
+                "t": "beat",
+                "info": {
+                    "symbols": sum(len(s) for _, s in self.shards.values()),
+                    "analysis": analysis,
+                    "dropped": self.dropped,
+                },
+            })
+            await asyncio.sleep(BEAT_SEC)
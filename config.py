@@ -18,9 +18,40 @@ except ValueError:
 # Username admin (untuk info upgrade VIP ke user)
 TELEGRAM_ADMIN_USERNAME = os.getenv("TELEGRAM_ADMIN_USERNAME", "")
 
+# Base URL Bot API (bisa diarahkan ke fake_telegram.py untuk load test)
+TELEGRAM_API_URL_DEFAULT = "https://api.telegram.org"
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", TELEGRAM_API_URL_DEFAULT).rstrip("/")
+
 # === BINANCE ===
-BINANCE_REST_URL = "https://api.binance.com"
-BINANCE_STREAM_URL = "wss://stream.binance.com:9443/stream"
+BINANCE_REST_URL = os.getenv("BINANCE_REST_URL", "https://api.binance.com")
+BINANCE_STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://stream.binance.com:9443/stream")
+
+# USDT-M perpetual futures
+BINANCE_FUTURES_REST_URL = os.getenv("BINANCE_FUTURES_REST_URL", "https://fapi.binance.com")
+BINANCE_FUTURES_STREAM_URL = os.getenv("BINANCE_FUTURES_STREAM_URL", "wss://fstream.binance.com/stream")
+
+# Market yang discan (boleh lebih dari 1, contoh: "spot,futures")
+MARKETS = [m.strip().lower() for m in os.getenv("MARKETS", "spot").split(",") if m.strip()]
+
+# Sumber data candle untuk analisa:
+# - "rest"   : REST 1h/15m/5m per candle 5m close (mode lama)
+# - "stream" : bar engine lokal dari stream WS (REST hanya untuk backfill)
+MARKET_DATA_MODE = os.getenv("MARKET_DATA_MODE", "rest")
+
+# Stream dasar untuk bar engine: "kline_5m", "kline_1m" atau "aggTrade"
+STREAM_SOURCE = os.getenv("STREAM_SOURCE", "kline_5m")
+
+# Timeframe yang dibangun bar engine (5m, 15m, 1h wajib untuk IPC)
+BAR_TIMEFRAMES = [tf.strip() for tf in os.getenv("BAR_TIMEFRAMES", "5m,15m,1h,4h").split(",") if tf.strip()]
+
+# Early-signal intrabar dari update kline parsial (butuh MARKET_DATA_MODE=stream)
+INTRABAR_ENABLED = os.getenv("INTRABAR_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Debounce evaluasi intrabar per symbol (detik)
+INTRABAR_MIN_INTERVAL_SEC = float(os.getenv("INTRABAR_MIN_INTERVAL_SEC", "5"))
+
+# Maksimal request backfill REST paralel
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "5"))
 
 # === FILTER PAIR & SCAN ===
 
@@ -33,11 +64,25 @@ MAX_USDT_PAIRS = int(os.getenv("MAX_USDT_PAIRS", "500"))
 # Interval refresh daftar pair (jam)
 REFRESH_PAIR_INTERVAL_HOURS = float(os.getenv("REFRESH_PAIR_INTERVAL_HOURS", "24"))
 
+# Swing high / low (pivot fractal, swings.py): jumlah candle kiri & kanan
+# pivot, dan jumlah swing terakhir per sisi yang disimpan per (symbol, tf)
+SWING_PIVOT_BARS = int(os.getenv("SWING_PIVOT_BARS", "2"))
+SWING_KEEP = int(os.getenv("SWING_KEEP", "32"))
+
+# Kernel statistik 5m (kernels.py): 1 = JIT numba kalau terpasang,
+# 0 = selalu NumPy
+KERNEL_JIT = os.getenv("KERNEL_JIT", "1") == "1"
+
 # === TIER & COOLDOWN ===
 
 # Tier minimum untuk kirim sinyal: "A+", "A", "B"
 MIN_TIER_TO_SEND = os.getenv("MIN_TIER_TO_SEND", "A")
 
+# Arah sinyal yang dideteksi: "long", "short" atau "long,short"
+SIGNAL_DIRECTIONS = tuple(
+    d.strip().lower() for d in os.getenv("SIGNAL_DIRECTIONS", "long").split(",") if d.strip()
+)
+
 # Cooldown default antar sinyal per pair (detik)
 SIGNAL_COOLDOWN_SECONDS = int(os.getenv("SIGNAL_COOLDOWN_SECONDS", "900"))  # 15 menit
 
@@ -45,3 +90,169 @@ SIGNAL_COOLDOWN_SECONDS = int(os.getenv("SIGNAL_COOLDOWN_SECONDS", "900"))  # 15
 
 # Digunakan oleh ipc_logic.py: berapa candle terakhir yang diambil dari REST
 LIMIT_KLINES = int(os.getenv("LIMIT_KLINES", "300"))
+
+# === ANALISA MULTI-CORE ===
+
+# Jumlah worker process untuk analisa IPC (0 = analisa inline di event loop)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0"))
+
+# Slot shared memory per worker (= maksimal analisa in-flight per worker)
+ANALYSIS_SLOTS_PER_WORKER = int(os.getenv("ANALYSIS_SLOTS_PER_WORKER", "8"))
+
+# === PENGIRIMAN SINYAL ===
+
+# Batas tunggu pengumpulan sinyal dari 1 candle close sebelum dispatch (detik);
+# dispatch lebih cepat begitu semua analisa bar itu selesai
+DISPATCH_BATCH_WINDOW_SEC = float(os.getenv("DISPATCH_BATCH_WINDOW_SEC", "0.5"))
+
+# Mode stream: tunggu close pair lain dari bar yang sama sebelum analisa
+# 1 batch (detik); langsung jalan kalau semua pair sudah close
+BAR_COLLECT_SEC = float(os.getenv("BAR_COLLECT_SEC", "0.15"))
+
+# Worker pengirim Telegram paralel & batas pesan per detik
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "4"))
+DELIVERY_RATE_PER_SEC = float(os.getenv("DELIVERY_RATE_PER_SEC", "25"))
+
+# Template sinyal opsional per bahasa / tier (signal_<lang>[_<tier>].txt)
+SIGNAL_TEMPLATE_DIR = os.getenv("SIGNAL_TEMPLATE_DIR", "templates")
+DEFAULT_LANG = os.getenv("DEFAULT_LANG", "id")
+
+# Preferensi user (/tier, /watch, /mute, /quiet): quiet hours dibaca di zona
+# waktu ini (jam offset dari UTC, default WIB) & batas jumlah symbol per list
+PREF_TZ_OFFSET_HOURS = float(os.getenv("PREF_TZ_OFFSET_HOURS", "7"))
+PREF_MAX_SYMBOLS = int(os.getenv("PREF_MAX_SYMBOLS", "50"))
+
+# === OUTCOME TRACKER ===
+
+# Lacak sinyal terkirim sampai entry / TP / SL dari harga stream (tanpa REST)
+OUTCOME_TRACKING = os.getenv("OUTCOME_TRACKING", "true").lower() in ("1", "true", "yes")
+
+# Event yang dikirim follow-up ke penerima sinyal: entry, tp1, tp2, tp3, sl, expired
+OUTCOME_NOTIFY_EVENTS = tuple(
+    e.strip().lower() for e in os.getenv("OUTCOME_NOTIFY_EVENTS", "tp1,tp2,tp3,sl").split(",") if e.strip()
+)
+
+# Sinyal kadaluarsa kalau entry tidak tersentuh dalam X jam
+OUTCOME_ENTRY_EXPIRY_HOURS = float(os.getenv("OUTCOME_ENTRY_EXPIRY_HOURS", "6"))
+
+# Posisi yang masih terbuka ditutup paksa (hasil dicatat apa adanya) setelah X jam
+OUTCOME_MAX_HOURS = float(os.getenv("OUTCOME_MAX_HOURS", "48"))
+
+# === SNAPSHOT (WARM RESTART) ===
+
+# File snapshot state scan (cooldown, universe, cache indikator, candle)
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "data/scan_state.npz")
+
+# Interval simpan snapshot periodik (detik), 0 = hanya saat shutdown
+SNAPSHOT_INTERVAL_SEC = float(os.getenv("SNAPSHOT_INTERVAL_SEC", "300"))
+
+# Interval tulis perubahan subscriber (kuota terpakai dispatcher) & memori
+# sinyal (cooldown / dedupe) ke file (detik), di thread; sisanya saat shutdown
+STORAGE_FLUSH_SEC = float(os.getenv("STORAGE_FLUSH_SEC", "30"))
+
+# Snapshot lebih tua dari ini diabaikan (start dingin)
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "6"))
+
+# === SHUTDOWN ===
+
+# Batas waktu drain analisa & antrian Telegram saat SIGTERM / SIGINT (detik)
+SHUTDOWN_TIMEOUT_SEC = float(os.getenv("SHUTDOWN_TIMEOUT_SEC", "20"))
+
+# === DEDUPE SINYAL ===
+
+# Sinyal baru dianggap duplikat kalau entry-nya dalam X (fraksi) dari entry terakhir
+DEDUPE_ENTRY_PCT = float(os.getenv("DEDUPE_ENTRY_PCT", "0.001"))
+
+# Entry terakhir per pair diingat selama X jam (tahan restart)
+DEDUPE_TTL_HOURS = float(os.getenv("DEDUPE_TTL_HOURS", "24"))
+
+# Batas jumlah pair yang diingat (yang paling lama dibuang duluan)
+DEDUPE_MAX_ENTRIES = int(os.getenv("DEDUPE_MAX_ENTRIES", "5000"))
+
+# === SCAN ON-DEMAND (ADMIN /scan, /scanall) ===
+
+# Worker thread paralel untuk /scanall (terpisah dari jalur scan live)
+SCANALL_CONCURRENCY = int(os.getenv("SCANALL_CONCURRENCY", "8"))
+
+# Jumlah pair teratas di ringkasan /scanall
+SCANALL_TOP = int(os.getenv("SCANALL_TOP", "15"))
+
+# === WATCHDOG (SUPERVISOR) ===
+
+# Interval cek supervisor (detik)
+WATCHDOG_INTERVAL_SEC = float(os.getenv("WATCHDOG_INTERVAL_SEC", "5"))
+
+# Lag event loop di atas ini (detik) → alert admin
+WATCHDOG_LAG_WARN_SEC = float(os.getenv("WATCHDOG_LAG_WARN_SEC", "1.0"))
+
+# Tidak ada frame WS selama X detik → alert + koneksi di-recycle
+WATCHDOG_STALL_SEC = float(os.getenv("WATCHDOG_STALL_SEC", "120"))
+
+# Symbol dianggap macet kalau tidak ada candle close selama X bar
+WATCHDOG_CANDLE_STALE_BARS = int(os.getenv("WATCHDOG_CANDLE_STALE_BARS", "3"))
+
+# Antrian (analisa + dispatch + Telegram) di atas ini → alert admin
+WATCHDOG_QUEUE_WARN = int(os.getenv("WATCHDOG_QUEUE_WARN", "500"))
+
+# Jarak minimal alert yang sama ke admin (detik)
+WATCHDOG_ALERT_COOLDOWN_SEC = float(os.getenv("WATCHDOG_ALERT_COOLDOWN_SEC", "600"))
+
+# === CAPTURE / REPLAY MARKET DATA ===
+
+# record = rekam frame WS & response REST ke CAPTURE_FILE; replay = putar ulang
+# capture tanpa Binance (scan langsung aktif, snapshot tidak dipulihkan)
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "").strip().lower()
+CAPTURE_FILE = os.getenv("CAPTURE_FILE", "data/capture.jsonl.gz")
+
+# Kecepatan replay: 1 = real-time, N = N kali lebih cepat, 0 = secepatnya
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))
+
+# Replay menolak jalan kalau TELEGRAM_API_URL masih Telegram asli (sinyal
+# rekaman terkirim ke user sungguhan), kecuali diizinkan eksplisit di sini
+REPLAY_LIVE_TELEGRAM = os.getenv("REPLAY_LIVE_TELEGRAM", "false").lower() in ("1", "true", "yes")
+
+# === RATE LIMIT BINANCE (WEIGHT) ===
+
+# Budget weight REST per menit per IP (spot 6000, futures USDT-M 2400)
+BINANCE_WEIGHT_LIMIT_1M = int(os.getenv("BINANCE_WEIGHT_LIMIT_1M", "6000"))
+BINANCE_FUTURES_WEIGHT_LIMIT_1M = int(os.getenv("BINANCE_FUTURES_WEIGHT_LIMIT_1M", "2400"))
+
+# Tunggu maksimal slot weight per prioritas sebelum request dibuang (detik)
+WEIGHT_MAX_WAIT_BACKFILL_SEC = float(os.getenv("WEIGHT_MAX_WAIT_BACKFILL_SEC", "180"))
+WEIGHT_MAX_WAIT_ANALYSIS_SEC = float(os.getenv("WEIGHT_MAX_WAIT_ANALYSIS_SEC", "5"))
+WEIGHT_MAX_WAIT_UNIVERSE_SEC = float(os.getenv("WEIGHT_MAX_WAIT_UNIVERSE_SEC", "90"))
+
+# === DEPLOYMENT MULTI-PROSES (cluster.py) ===
+
+# single = 1 proses (default); coordinator = universe, subscriber, cooldown &
+# Telegram, scan dibagi ke worker; scanner = worker scan shard dari coordinator
+DEPLOY_ROLE = os.getenv("DEPLOY_ROLE", "single").strip().lower()
+
+# Alamat coordinator: unix:<path socket> (1 host) atau tcp:<host>:<port> (lintas host)
+COORDINATOR_ADDRESS = os.getenv("COORDINATOR_ADDRESS", "unix:data/coordinator.sock")
+
+# Shared secret handshake scanner → coordinator (wajib untuk tcp: tanpa
+# token coordinator menolak start)
+COORDINATOR_TOKEN = os.getenv("COORDINATOR_TOKEN", "")
+
+# Nama worker scanner (default <hostname>-<pid>); shard dibagi urut nama
+SCANNER_NAME = os.getenv("SCANNER_NAME", "")
+
+# Scanner tanpa heartbeat selama X detik dianggap mati → shard-nya dibagi ulang
+SCANNER_TIMEOUT_SEC = float(os.getenv("SCANNER_TIMEOUT_SEC", "30"))
+
+# === HTTP (POOL KEEP-ALIVE) ===
+
+# Koneksi keep-alive per host Binance (backfill, /scanall, refresh pair)
+HTTP_BINANCE_POOL_SIZE = int(os.getenv("HTTP_BINANCE_POOL_SIZE", str(max(BACKFILL_CONCURRENCY, SCANALL_CONCURRENCY) + 4)))
+
+# Koneksi keep-alive ke Telegram (worker delivery + getUpdates + kirim langsung)
+HTTP_TELEGRAM_POOL_SIZE = int(os.getenv("HTTP_TELEGRAM_POOL_SIZE", str(DELIVERY_WORKERS + 2)))
+
+# Timeout connect & baca default (detik); pemanggil boleh override timeout baca
+HTTP_CONNECT_TIMEOUT_SEC = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", "5"))
+HTTP_READ_TIMEOUT_SEC = float(os.getenv("HTTP_READ_TIMEOUT_SEC", "10"))
+
+# Retry GET (error koneksi / timeout / 5xx), backoff eksponensial + jitter (detik)
+HTTP_GET_RETRIES = int(os.getenv("HTTP_GET_RETRIES", "2"))
+HTTP_RETRY_BACKOFF_SEC = float(os.getenv("HTTP_RETRY_BACKOFF_SEC", "0.5"))
@@ -0,0 +1,291 @@
+# cooldown.py
+#
+# Cooldown & dedupe sinyal di memory:
+# - Config cooldown.json di-load sekali, reload otomatis saat admin mengubah
+#   (storage.on_cooldown_change), tidak dibaca ulang per candle
+# - Durasi: override per symbol > override per tier sinyal terakhir > default
+# - Entry kadaluarsa lewat timing wheel (hapus O(1) per entry, tanpa scan dict)
+# - Dedupe entry (jarak < DEDUPE_ENTRY_PCT) + cooldown aktif disimpan ke
+#   data/signal_memory.json → tahan restart; record() hanya menandai dirty,
+#   file ditulis periodik di thread (lifecycle.storage_flush_loop) & saat shutdown
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Tuple
+
+from config import DEDUPE_ENTRY_PCT, DEDUPE_TTL_HOURS, DEDUPE_MAX_ENTRIES
+from storage import (
+    load_cooldown_config,
+    on_cooldown_change,
+    off_cooldown_change,
+    load_signal_memory,
+    save_signal_memory,
+)
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel: key dijadwalkan di slot (tick_expiry % n_slots).
+    advance(now) hanya mengunjungi slot antara tick terakhir & tick sekarang;
+    entry yang belum jatuh tempo (putaran berikutnya) dibiarkan.
+    """
+
+    def __init__(self, resolution_sec: float = 1.0, n_slots: int = 512, now: float | None = None):
+        self.resolution = resolution_sec
+        self.n_slots = n_slots
+        self.slots: List[Dict[Hashable, float]] = [{} for _ in range(n_slots)]
+        self._slot_of: Dict[Hashable, int] = {}
+        self._tick = self._to_tick(now if now is not None else time.time())
+
+    def _to_tick(self, ts: float) -> int:
+        return int(ts // self.resolution)
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._slot_of
+
+    def schedule(self, key: Hashable, expiry: float) -> None:
+        self.cancel(key)
+        slot = self._to_tick(expiry) % self.n_slots
+        self.slots[slot][key] = expiry
+        self._slot_of[key] = slot
+
+    def cancel(self, key: Hashable) -> None:
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self.slots[slot].pop(key, None)
+
+    def expiry(self, key: Hashable) -> float | None:
+        slot = self._slot_of.get(key)
+        return None if slot is None else self.slots[slot].get(key)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """
+        Keluarkan key yang expiry <= now. Return daftar key yang expired.
+        """
+        target = self._to_tick(now)
+        if target < self._tick:
+            return []
+        steps = min(target - self._tick + 1, self.n_slots)
+        expired = []
+        for i in range(steps):
+            slot = self.slots[(self._tick + i) % self.n_slots]
+            if not slot:
+                continue
+            due = [k for k, exp in slot.items() if exp <= now]
+            for k in due:
+                del slot[k]
+                del self._slot_of[k]
+            expired.extend(due)
+        self._tick = target
+        return expired
+
+
+class CooldownEngine:
+    def __init__(
+        self,
+        dedupe_pct: float = DEDUPE_ENTRY_PCT,
+        dedupe_ttl_hours: float = DEDUPE_TTL_HOURS,
+        max_entries: int = DEDUPE_MAX_ENTRIES,
+        persist: bool = True,
+    ):
+        self.dedupe_pct = dedupe_pct
+        self.dedupe_ttl = dedupe_ttl_hours * 3600
+        self.max_entries = max(1, max_entries)
+        self.persist = persist
+        # sumber waktu default (replay: jam rekaman, lihat use_clock)
+        self.clock: Callable[[], float] = time.time
+        # key salinan dari coordinator (mirror, DEPLOY_ROLE=scanner)
+        self._mirrored: set = set()
+        # ada perubahan yang belum ditulis ke signal_memory.json; salinan
+        # lama dari thread tidak boleh menimpa salinan yang lebih baru
+        self.dirty = False
+        self._save_lock = threading.Lock()
+        self._save_seq = 0
+        self._saved_seq = 0
+
+        self.config = load_cooldown_config()
+        on_cooldown_change(self.reload)
+
+        # cooldown aktif: key → (waktu sinyal, tier)
+        self._active: Dict[str, Tuple[float, str]] = {}
+        self._cool_wheel = TimingWheel(resolution_sec=1.0)
+        # dedupe: key → (entry, waktu sinyal), urut dari yang paling lama
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._dedupe_wheel = TimingWheel(resolution_sec=60.0)
+
+        if persist:
+            self._restore()
+
+    def use_clock(self, clock: Callable[[], float]) -> None:
+        """
+        Ganti sumber waktu (replay capture: jam rekaman, supaya cooldown
+        berjalan seperti sesi aslinya walau diputar lebih cepat). Cooldown &
+        dedupe yang sudah ada dibuang karena dicatat dengan jam lama.
+        """
+        self.clock = clock
+        now = clock()
+        self._active.clear()
+        self._entries.clear()
+        self._cool_wheel = TimingWheel(resolution_sec=1.0, now=now)
+        self._dedupe_wheel = TimingWheel(resolution_sec=60.0, now=now)
+
+    # ---------- config ----------
+
+    def reload(self, config: dict | None = None) -> None:
+        """
+        Dipanggil saat cooldown.json berubah; cooldown aktif dijadwal ulang
+        dengan durasi baru (sama seperti dulu: durasi dibaca saat dicek).
+        """
+        self.config = config if config is not None else load_cooldown_config()
+        for key, (ts, tier) in self._active.items():
+            self._cool_wheel.schedule(key, ts + self.duration(key, tier))
+        print(f"Cooldown di-reload: default {self.config['cooldown_seconds']} detik.")
+
+    def duration(self, key: str, tier: str = "") -> int:
+        symbols = self.config.get("symbols", {})
+        sym = key.upper()
+        if sym in symbols:
+            return symbols[sym]
+        # key futures "BTCUSDT.P" ikut override symbol dasarnya
+        base = sym.split(".", 1)[0]
+        if base in symbols:
+            return symbols[base]
+        tiers = self.config.get("tiers", {})
+        if tier in tiers:
+            return tiers[tier]
+        return self.config["cooldown_seconds"]
+
+    # ---------- cek ----------
+
+    def _advance(self, now: float) -> None:
+        for key in self._cool_wheel.advance(now):
+            self._active.pop(key, None)
+        for key in self._dedupe_wheel.advance(now):
+            self._entries.pop(key, None)
+
+    def in_cooldown(self, key: str, now: float | None = None) -> bool:
+        now = now if now is not None else self.clock()
+        self._advance(now)
+        exp = self._cool_wheel.expiry(key)
+        return exp is not None and now < exp
+
+    def remaining(self, key: str, now: float | None = None) -> float:
+        now = now if now is not None else self.clock()
+        exp = self._cool_wheel.expiry(key)
+        return max(0.0, exp - now) if exp is not None else 0.0
+
+    def is_duplicate(self, key: str, entry: float, now: float | None = None) -> bool:
+        """
+        Entry terlalu dekat (< dedupe_pct) dengan entry sinyal terakhir pair ini.
+        """
+        self._advance(now if now is not None else self.clock())
+        prev = self._entries.get(key)
+        if prev is None:
+            return False
+        prev_entry = prev[0]
+        return abs(entry - prev_entry) / max(prev_entry, 1e-9) < self.dedupe_pct
+
+    # ---------- catat ----------
+
+    def record(self, key: str, tier: str, entry: float, now: float | None = None) -> None:
+        now = now if now is not None else self.clock()
+        self._active[key] = (now, tier)
+        self._cool_wheel.schedule(key, now + self.duration(key, tier))
+
+        self._entries[key] = (float(entry), now)
+        self._entries.move_to_end(key)
+        self._dedupe_wheel.schedule(key, now + self.dedupe_ttl)
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            self._dedupe_wheel.cancel(old)
+        self.dirty = self.persist
+
+    def clear(self, key: str) -> None:
+        self._active.pop(key, None)
+        self._cool_wheel.cancel(key)
+
+    # ---------- multi-proses (cluster.py) ----------
+
+    def expiries(self) -> Dict[str, float]:
+        """
+        Waktu habis cooldown aktif per key (disebar coordinator ke scanner).
+        """
+        return {key: ts + self.duration(key, tier) for key, (ts, tier) in self._active.items()}
+
+    def mirror(self, expiries: Dict[str, float]) -> None:
+        """
+        Ganti cooldown dengan salinan dari coordinator. Hanya untuk skip
+        analisa di scanner; keputusan kirim tetap dicek ulang di coordinator.
+        """
+        for key in self._mirrored - expiries.keys():
+            self._cool_wheel.cancel(key)
+        for key, until in expiries.items():
+            self._cool_wheel.schedule(key, until)
+        self._mirrored = set(expiries)
+
+    # ---------- persist ----------
+
+    def export(self) -> dict:
+        return {
+            "cooldowns": {k: [ts, tier] for k, (ts, tier) in self._active.items()},
+            "entries": {k: [entry, ts] for k, (entry, ts) in self._entries.items()},
+        }
+
+    def _copy(self) -> tuple:
+        self._save_seq += 1
+        self.dirty = False
+        return self.export(), self._save_seq
+
+    def _write(self, data: dict, seq: int) -> None:
+        with self._save_lock:
+            if seq < self._saved_seq:
+                return
+            save_signal_memory(data)
+            self._saved_seq = seq
+
+    def flush(self) -> bool:
+        """
+        Tulis ke file hanya kalau ada perubahan. Return True kalau ditulis.
+        """
+        if not self.dirty:
+            return False
+        self._write(*self._copy())
+        return True
+
+    async def flush_async(self) -> bool:
+        """
+        flush() dengan tulis file di thread (salinan dibuat di event loop).
+        """
+        if not self.dirty:
+            return False
+        data, seq = self._copy()
+        try:
+            await asyncio.to_thread(self._write, data, seq)
+        except BaseException:
+            self.dirty = True
+            raise
+        return True
+
+    def close(self) -> None:
+        """
+        Lepas listener cooldown.json (engine tidak dipakai lagi).
+        """
+        off_cooldown_change(self.reload)
+
+    def _restore(self) -> None:
+        data = load_signal_memory()
+        now = time.time()
+        for key, (ts, tier) in (data.get("cooldowns") or {}).items():
+            if now < ts + self.duration(key, tier):
+                self._active[key] = (ts, tier)
+                self._cool_wheel.schedule(key, ts + self.duration(key, tier))
+        entries = sorted((data.get("entries") or {}).items(), key=lambda kv: kv[1][1])
+        for key, (entry, ts) in entries[-self.max_entries:]:
+            if now < ts + self.dedupe_ttl:
+                self._entries[key] = (float(entry), ts)
+                self._dedupe_wheel.schedule(key, ts + self.dedupe_ttl)
@@ -0,0 +1,73 @@
+# delivery.py
+#
+# Antrian pengiriman Telegram:
+# - scan_loop / dispatcher cukup enqueue (chat_id, text), tidak menunggu HTTP
+# - N worker mengirim lewat send_message di thread (tidak blok event loop)
+# - Rate limit global sederhana (Telegram ~30 pesan/detik per bot)
+# - Payload boleh teks biasa atau PreparedMessage (JSON sudah di-encode)
+
+import asyncio
+import time
+from typing import List, Tuple, Union
+
+from config import DELIVERY_WORKERS, DELIVERY_RATE_PER_SEC
+from telegram_bot import PreparedMessage, send_message, send_prepared
+
+Payload = Union[str, PreparedMessage]
+
+
+class DeliveryQueue:
+    def __init__(self, workers: int = DELIVERY_WORKERS, rate_per_sec: float = DELIVERY_RATE_PER_SEC):
+        self.workers = max(1, workers)
+        self.min_interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.sent = 0
+        self._next_slot = 0.0
+        self._tasks: List[asyncio.Task] = []
+
+    def enqueue(self, chat_id: int, payload: Payload) -> None:
+        self.queue.put_nowait((chat_id, payload))
+
+    def enqueue_many(self, items: List[Tuple[int, Payload]]) -> None:
+        for item in items:
+            self.queue.put_nowait(item)
+
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    async def _wait_rate_slot(self) -> None:
+        if self.min_interval <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id, payload = await self.queue.get()
+            try:
+                await self._wait_rate_slot()
+                if isinstance(payload, PreparedMessage):
+                    await asyncio.to_thread(send_prepared, chat_id, payload)
+                else:
+                    await asyncio.to_thread(send_message, chat_id, payload)
+                self.sent += 1
+            except Exception as e:
+                print("Error delivery:", e)
+            finally:
+                self.queue.task_done()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def join(self) -> None:
+        await self.queue.join()
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,208 @@
+# dispatcher.py
+#
+# Dispatch sinyal per batch:
+# - Semua sinyal dari 1 candle close dikumpulkan dulu: dispatch begitu
+#   batch analisa bar selesai (hold/release), maks DISPATCH_BATCH_WINDOW_SEC
+# - Eligibility user = mask vektor dari SubscriberTable (tanpa baca file);
+#   kuota terpakai hanya menandai tabel dirty, subscribers.json ditulis
+#   periodik di luar event loop (lifecycle.storage_flush_loop) & saat shutdown
+# - Ranking per bar (tier, score, volume): kuota FREE_SIGNALS_PER_DAY dipakai
+#   untuk sinyal teratas yang lolos preferensi user, VIP menerima semua
+# - Preferensi user (min tier, watchlist, mute, quiet hours) lewat index
+#   terbalik SubscriberTable.accept_mask, bukan cek per user
+# - Pesan masuk ke DeliveryQueue (tidak menunggu HTTP); teks di-render &
+#   JSON di-encode 1x per (sinyal, template), dipakai ulang untuk semua user
+# - Sinyal yang terkirim (beserta penerimanya) diteruskan ke OutcomeTracker
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from config import TELEGRAM_ADMIN_ID, DISPATCH_BATCH_WINDOW_SEC, DEFAULT_LANG
+from ipc_scoring import TIER_ORDER
+from signal_builder import render_signal, resolve_template_key
+from telegram_bot import PreparedMessage, prepare_message
+from storage import bump_stats_many
+from subscribers import SubscriberTable
+
+
+@dataclass
+class PendingSignal:
+    symbol: str
+    text: str
+    score: int
+    tier: str
+    levels: Dict[str, float] = field(default_factory=dict)
+    # nilai template (signal_builder.signal_values) untuk render per bahasa
+    values: Dict[str, Any] = field(default_factory=dict)
+    # volume quote candle trigger (USDT), tie-break ranking per bar
+    volume: float = 0.0
+    # chat_id penerima (diisi saat dispatch, dipakai follow-up TP/SL)
+    recipients: List[int] = field(default_factory=list)
+    # disubmit saat ada batch bar yang ditahan (lihat SignalDispatcher.hold)
+    held: bool = False
+    _prepared: Dict[Tuple[str, str], PreparedMessage] = field(default_factory=dict, repr=False)
+
+    def payload(self, lang: str = DEFAULT_LANG) -> PreparedMessage:
+        """
+        Payload siap kirim untuk bahasa lang (cache per key template).
+        """
+        key = resolve_template_key(lang, self.tier) if self.values else (DEFAULT_LANG, "*")
+        msg = self._prepared.get(key)
+        if msg is None:
+            text = render_signal(self.values, lang=key[0]) if self.values else self.text
+            msg = prepare_message(text)
+            self._prepared[key] = msg
+        return msg
+
+
+def rank_batch(batch: List[PendingSignal]) -> List[PendingSignal]:
+    """
+    Urutkan sinyal: tier tertinggi dulu, lalu score, lalu volume candle trigger.
+    """
+    return sorted(batch, key=lambda s: (TIER_ORDER.get(s.tier, 0), s.score, s.volume), reverse=True)
+
+
+class SignalDispatcher:
+    def __init__(
+        self,
+        delivery,
+        window_sec: float = DISPATCH_BATCH_WINDOW_SEC,
+        tracker=None,
+        subscribers: SubscriberTable | None = None,
+        persist: bool = True,
+    ):
+        self.delivery = delivery
+        # False (replay capture) → stats.json tidak ditulis
+        self.persist = persist
+        self.window_sec = window_sec
+        self.tracker = tracker
+        self.subscribers = subscribers if subscribers is not None else SubscriberTable.load()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # batch yang sedang menunggu jendela (supaya tidak hilang saat shutdown)
+        self._batch: List[PendingSignal] = []
+        # batch analisa bar yang masih jalan (StreamScanner / pool REST)
+        self._holds = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._last_wait_ms = 0.0
+
+    def submit(self, signal: PendingSignal) -> None:
+        signal.held = self._holds > 0
+        self.queue.put_nowait(signal)
+
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    # ---------- tahanan seleksi per bar ----------
+
+    def hold(self) -> None:
+        """
+        Analisa 1 batch bar dimulai: dispatch ditahan sampai release().
+        """
+        self._holds += 1
+        self._idle.clear()
+
+    def release(self) -> None:
+        self._holds = max(0, self._holds - 1)
+        if self._holds == 0:
+            self._idle.set()
+
+    async def _wait_selection(self, first: PendingSignal) -> None:
+        """
+        Sinyal dari batch bar → tunggu semua batch yang sedang jalan selesai
+        (maks window_sec). Sinyal tanpa tahanan (mode REST inline) → jendela penuh.
+        """
+        if not (first.held or self._holds):
+            await asyncio.sleep(self.window_sec)
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.window_sec)
+        except asyncio.TimeoutError:
+            print(f"Seleksi bar melewati batas {self.window_sec:.2f} detik, dispatch kandidat yang ada.")
+
+    async def run(self) -> None:
+        while True:
+            first = await self.queue.get()
+            batch = self._batch = [first]
+            started = time.monotonic()
+            # tunggu sinyal lain dari candle close yang sama
+            await self._wait_selection(first)
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self._batch = []
+            self._last_wait_ms = (time.monotonic() - started) * 1000
+            try:
+                self.dispatch_batch(batch)
+            except Exception as e:
+                print("Error dispatch batch:", e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self) -> int:
+        """
+        Dispatch semua sinyal tersisa tanpa menunggu jendela (dipanggil saat
+        shutdown, setelah task run() dibatalkan). Return jumlah sinyal.
+        """
+        batch, self._batch = self._batch, []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            self.dispatch_batch(batch)
+        return len(batch)
+
+    def dispatch_batch(self, batch: List[PendingSignal]) -> None:
+        ranked = rank_batch(batch)
+        if self.persist:
+            bump_stats_many([s.symbol for s in ranked])
+
+        # KIRIM KE ADMIN (semua sinyal)
+        if TELEGRAM_ADMIN_ID:
+            self.delivery.enqueue_many([(TELEGRAM_ADMIN_ID, s.payload()) for s in ranked])
+            for sig in ranked:
+                sig.recipients.append(TELEGRAM_ADMIN_ID)
+
+        # KIRIM KE USER: kuota per user untuk seluruh batch (vektor); sinyal
+        # dikirim ke user yang menerimanya (preferensi) & belum habis kuota
+        table = self.subscribers
+        quota = table.quota(len(ranked))
+        # skip admin agar tidak dobel
+        if TELEGRAM_ADMIN_ID and TELEGRAM_ADMIN_ID in table:
+            quota[table.index[TELEGRAM_ADMIN_ID]] = 0
+        rows = np.flatnonzero(quota)
+        codes = table.lang[rows]
+        groups = [
+            (table.lang_name(code) or DEFAULT_LANG, rows[codes == code])
+            for code in np.unique(codes).tolist()
+        ]
+
+        messages = []
+        now = time.time()
+        received = np.zeros_like(quota)
+        for sig in ranked:
+            accept = table.accept_mask(sig.symbol, sig.tier, now)
+            for lang, lang_rows in groups:
+                send = lang_rows[(quota[lang_rows] > received[lang_rows]) & accept[lang_rows]]
+                received[send] += 1
+                ids = table.chat_id[send].tolist()
+                payload = sig.payload(lang)
+                messages.extend((chat_id, payload) for chat_id in ids)
+                sig.recipients.extend(ids)
+
+        sent_rows = np.flatnonzero(received)
+        if len(sent_rows):
+            table.mark_sent(sent_rows, received[sent_rows])
+        self.delivery.enqueue_many(messages)
+
+        for sig in ranked:
+            if self.tracker is not None:
+                self.tracker.open_from_pending(sig)
+            print(f"[{sig.symbol}] Sinyal dikirim: Score {sig.score}, Tier {sig.tier}")
+        print(
+            f"Batch dispatch: {len(ranked)} sinyal → {len(messages)} pesan user "
+            f"(seleksi {self._last_wait_ms:.0f} ms)."
+        )
@@ -0,0 +1,229 @@
+# exchange.py
+#
+# Adapter exchange (pluggable):
+# - list_universe   : daftar pair USDT + filter volume 24 jam
+# - get_klines      : backfill candle via REST
+# - stream_url      : URL combined stream kline / aggTrade
+# - weight accounting: baca header X-MBX-USED-WEIGHT-1M dari tiap response;
+#   request lewat governor weight per market (rate_limit.py)
+# - capture (opsional): response REST direkam / dilayani dari replay (capture.py)
+# - HTTP lewat pool keep-alive bersama (http_client.py)
+#
+# Implementasi: SpotAdapter (api.binance.com) & FuturesAdapter (USDT-M perpetual).
+# URL bisa diarahkan ke fake server lokal (fake_exchange.py) untuk test offline.
+
+import time
+from typing import Any, Dict, List
+
+import requests
+
+from config import (
+    BINANCE_REST_URL,
+    BINANCE_STREAM_URL,
+    BINANCE_FUTURES_REST_URL,
+    BINANCE_FUTURES_STREAM_URL,
+    LIMIT_KLINES,
+)
+from rate_limit import (
+    PRIORITY_ANALYSIS,
+    PRIORITY_UNIVERSE,
+    governed_get,
+    governor_for,
+)
+
+
+class ExchangeAdapter:
+    """
+    Base adapter. Subclass cukup isi path endpoint & filter symbol.
+    """
+
+    name = "base"
+    exchange_info_path = ""
+    ticker_path = ""
+    klines_path = ""
+    exchange_info_weight = 20
+    ticker_weight = 80
+    default_rest_url = ""
+    default_stream_url = ""
+    # suffix key sinyal supaya pair yang sama di market lain tidak bentrok
+    key_suffix = ""
+
+    def __init__(self, rest_url: str | None = None, stream_url: str | None = None):
+        self.rest_url = (rest_url or self.default_rest_url).rstrip("/")
+        self.stream_base = stream_url or self.default_stream_url
+
+        # rate-limit accounting
+        self.used_weight_1m = 0
+        self.used_weight_ts = 0.0
+        self.requests_total = 0
+        self.weight_sent = 0
+
+        # CaptureWriter / CaptureReplay (capture.py), None = REST biasa
+        self.capture = None
+        # budget weight per menit, dipakai bersama semua pemanggil REST market ini
+        self.governor = governor_for(self.name)
+
+    # ---------- HTTP ----------
+
+    def _get(
+        self,
+        path: str,
+        params: Dict[str, Any] | None = None,
+        weight: int = 1,
+        timeout: float | None = None,
+        priority: int = PRIORITY_ANALYSIS,
+    ):
+        capture = self.capture
+        if capture is not None and capture.replaying:
+            return capture.rest(self.name, path, params)
+        r = governed_get(self.governor, f"{self.rest_url}{path}", params, weight, priority, timeout)
+        self._account(r, weight)
+        r.raise_for_status()
+        data = r.json()
+        if capture is not None:
+            capture.record_rest(self.name, path, params, data)
+        return data
+
+    def _account(self, r: requests.Response, weight: int) -> None:
+        self.requests_total += 1
+        self.weight_sent += weight
+        used = r.headers.get("X-MBX-USED-WEIGHT-1M") or r.headers.get("x-mbx-used-weight-1m")
+        if used is not None:
+            try:
+                self.used_weight_1m = int(used)
+                self.used_weight_ts = time.time()
+            except ValueError:
+                pass
+
+    def weight_stats(self) -> Dict[str, Any]:
+        return {
+            "market": self.name,
+            "used_weight_1m": self.used_weight_1m,
+            "requests_total": self.requests_total,
+            "weight_sent": self.weight_sent,
+        }
+
+    # ---------- universe ----------
+
+    def is_tradable(self, info: Dict[str, Any]) -> bool:
+        return info.get("status") == "TRADING" and info.get("quoteAsset") == "USDT"
+
+    def list_universe(self, min_volume: float, max_pairs: int) -> List[str]:
+        """
+        Pair USDT yang bisa ditrade, quoteVolume 24 jam >= min_volume,
+        urut volume terbesar, dibatasi max_pairs (0 = tanpa batas).
+        Return lowercase: ['btcusdt', 'ethusdt', ...]
+        """
+        info = self._get(self.exchange_info_path, weight=self.exchange_info_weight, priority=PRIORITY_UNIVERSE)
+        tradable = [s["symbol"] for s in info["symbols"] if self.is_tradable(s)]
+        tradable_set = set(tradable)
+
+        tickers = self._get(self.ticker_path, weight=self.ticker_weight, priority=PRIORITY_UNIVERSE)
+        vol_map: Dict[str, float] = {}
+        for t in tickers:
+            sym = t.get("symbol")
+            if sym in tradable_set:
+                try:
+                    vol_map[sym] = float(t.get("quoteVolume", "0"))  # dalam USDT
+                except ValueError:
+                    vol_map[sym] = 0.0
+
+        filtered = [s for s in tradable if vol_map.get(s, 0.0) >= min_volume]
+        filtered.sort(key=lambda s: vol_map.get(s, 0.0), reverse=True)
+        if max_pairs > 0:
+            filtered = filtered[:max_pairs]
+        return [s.lower() for s in filtered]
+
+    # ---------- klines ----------
+
+    @staticmethod
+    def kline_weight(limit: int) -> int:
+        """
+        Weight /klines per limit (tabel resmi Binance, tiap market beda).
+        """
+        raise NotImplementedError
+
+    def get_klines_raw(
+        self, symbol: str, interval: str, limit: int = LIMIT_KLINES, priority: int = PRIORITY_ANALYSIS
+    ) -> list:
+        params = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
+        return self._get(self.klines_path, params=params, weight=self.kline_weight(limit), priority=priority)
+
+    def get_klines(self, symbol: str, interval: str, limit: int = LIMIT_KLINES, priority: int = PRIORITY_ANALYSIS):
+        from ipc_logic import klines_to_frame
+
+        return klines_to_frame(self.get_klines_raw(symbol, interval, limit, priority))
+
+    # ---------- stream ----------
+
+    def stream_url(self, symbols: List[str], stream_name: str) -> str:
+        streams = "/".join(f"{s.lower()}@{stream_name}" for s in symbols)
+        return f"{self.stream_base}?streams={streams}"
+
+    def signal_key(self, symbol: str) -> str:
+        """
+        Key unik symbol lintas market (cooldown, pool worker, pesan).
+        """
+        return symbol.upper() + self.key_suffix
+
+
+class SpotAdapter(ExchangeAdapter):
+    name = "spot"
+    exchange_info_path = "/api/v3/exchangeInfo"
+    ticker_path = "/api/v3/ticker/24hr"
+    klines_path = "/api/v3/klines"
+    default_rest_url = BINANCE_REST_URL
+    default_stream_url = BINANCE_STREAM_URL
+
+    @staticmethod
+    def kline_weight(limit: int) -> int:
+        # /api/v3/klines: flat, tidak tergantung limit
+        return 2
+
+
+class FuturesAdapter(ExchangeAdapter):
+    """
+    USDT-M perpetual (fapi). Hanya kontrak PERPETUAL margin USDT.
+    """
+
+    name = "futures"
+    exchange_info_path = "/fapi/v1/exchangeInfo"
+    ticker_path = "/fapi/v1/ticker/24hr"
+    klines_path = "/fapi/v1/klines"
+    exchange_info_weight = 1
+    ticker_weight = 40
+    default_rest_url = BINANCE_FUTURES_REST_URL
+    default_stream_url = BINANCE_FUTURES_STREAM_URL
+    key_suffix = ".P"
+
+    @staticmethod
+    def kline_weight(limit: int) -> int:
+        # /fapi/v1/klines: naik per limit
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+
+    def is_tradable(self, info: Dict[str, Any]) -> bool:
+        return (
+            info.get("status") == "TRADING"
+            and info.get("quoteAsset") == "USDT"
+            and info.get("contractType") == "PERPETUAL"
+        )
+
+
+ADAPTERS = {
+    "spot": SpotAdapter,
+    "futures": FuturesAdapter,
+}
+
+
+def make_adapter(market: str, rest_url: str | None = None, stream_url: str | None = None) -> ExchangeAdapter:
+    try:
+        cls = ADAPTERS[market.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Market tidak dikenal: {market} (pilihan: {', '.join(ADAPTERS)})")
+    return cls(rest_url=rest_url, stream_url=stream_url)
@@ -0,0 +1,382 @@
+# fake_exchange.py
+#
+# Fake server Binance lokal (test double) untuk test adapter secara offline.
+# - REST : exchangeInfo, ticker/24hr, klines (spot: /api/v3, futures: /fapi/v1)
+#          + header X-MBX-USED-WEIGHT-1M; weight_limit > 0 → 429 + Retry-After
+#          saat budget window habis, request lagi sebelum Retry-After → 418 (ban)
+# - WS   : combined stream /stream?streams=<sym>@kline_<tf> (update parsial +
+#          close), data sintetis deterministik per symbol
+# - trend_ratio: fraksi symbol trending yang benar-benar memicu sinyal IPC
+# - close_log  : open_time bar → waktu frame close pertama dikirim (latency
+#                end-to-end di loadtest.py)
+#
+# Contoh:
+#   srv = FakeExchangeServer(market="futures", symbols=["BTCUSDT"]).start()
+#   adapter = FuturesAdapter(rest_url=srv.rest_url, stream_url=srv.stream_url)
+#   ...
+#   srv.stop()
+#
+# bar_period_sec < 300 mempercepat jam market; jam fake jadi tidak sinkron
+# dengan time.time(), jadi BarEngine.seed() bisa menandai gap (wajar di test).
+
+import asyncio
+import json
+import math
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from bar_engine import TF_MS
+from exchange import ADAPTERS
+
+_PATHS = {
+    "spot": "/api/v3",
+    "futures": "/fapi/v1",
+}
+
+
+class SyntheticMarket:
+    """
+    Harga sintetis deterministik: random walk per (symbol, bar open_time),
+    jadi REST & WS konsisten satu sama lain.
+
+    trend_ratio = fraksi symbol "trending": harga naik stabil + gelombang
+    1 jam (fungsi kontinu waktu, konsisten antar timeframe) → lolos filter
+    IPC di fase naik gelombang, jadi bot benar-benar mengirim sinyal (load test).
+    """
+
+    def __init__(
+        self,
+        symbols: List[str],
+        bar_period_sec: float = 300.0,
+        start_ms: int | None = None,
+        trend_ratio: float = 0.0,
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.trending = {s for s in self.symbols if self._rand(s, "trend") < trend_ratio}
+        # percepatan waktu: 1 bar 5m berlangsung bar_period_sec detik nyata
+        self.speed = 300.0 / bar_period_sec
+        self.t0_real = time.time()
+        now_ms = int(self.t0_real * 1000) if start_ms is None else start_ms
+        self.t0_market = now_ms - now_ms % TF_MS["5m"]
+
+    def now_ms(self) -> int:
+        return int(self.t0_market + (time.time() - self.t0_real) * 1000 * self.speed)
+
+    @staticmethod
+    def _rand(*key) -> float:
+        # pseudo-random [0, 1) stabil dari key
+        return (zlib.crc32(repr(key).encode()) % 1_000_003) / 1_000_003
+
+    def trend_price(self, symbol: str, ts_ms: float) -> float:
+        """
+        Harga symbol trending: naik 0.05%/jam + gelombang periode 1 jam
+        (amplitudo = 2 jam kenaikan).
+        """
+        base = 100.0 + (zlib.crc32(symbol.encode()) % 1000)
+        hours = (ts_ms - self.t0_market) / 3_600_000
+        slope = base * 0.0005
+        phase = self._rand(symbol, "phase") * 2 * math.pi
+        return base + slope * hours + 2.0 * slope * math.sin(2 * math.pi * hours + phase)
+
+    def bar(self, symbol: str, tf: str, open_time: int, progress: float = 1.0) -> List:
+        """
+        Bar [open_time, o, h, l, c, v, close_time, ...] format REST Binance.
+        progress < 1 → bar parsial.
+        """
+        base = 100.0 + (zlib.crc32(symbol.encode()) % 1000)
+        step = TF_MS[tf]
+        idx = open_time // step
+        if symbol in self.trending:
+            pts = [self.trend_price(symbol, open_time + step * progress * i / 4) for i in range(5)]
+            o, c = pts[0], pts[-1]
+            h, l = max(pts), min(pts)
+        else:
+            drift = (self._rand(symbol, tf, "d") - 0.5) * 0.002
+            o = base * (1.0 + drift * (idx % 500)) + (self._rand(symbol, tf, idx, "o") - 0.5)
+            c = o + (self._rand(symbol, tf, idx, "c") - 0.5) * 2.0 * progress
+            h = max(o, c) + self._rand(symbol, tf, idx, "h") * progress
+            l = min(o, c) - self._rand(symbol, tf, idx, "l") * progress
+        v = (10.0 + self._rand(symbol, tf, idx, "v") * 100.0) * progress
+        return [
+            open_time, f"{o:.6f}", f"{h:.6f}", f"{l:.6f}", f"{c:.6f}", f"{v:.4f}",
+            open_time + step - 1, "0", 0, "0", "0", "0",
+        ]
+
+    def klines(self, symbol: str, tf: str, limit: int) -> List[List]:
+        step = TF_MS[tf]
+        now = self.now_ms()
+        cur_open = now - now % step
+        rows = []
+        for i in range(limit - 1, -1, -1):
+            ot = cur_open - i * step
+            progress = 1.0 if i > 0 else (now - cur_open) / step
+            rows.append(self.bar(symbol, tf, ot, progress))
+        return rows
+
+
+class FakeExchangeServer:
+    def __init__(
+        self,
+        market: str = "spot",
+        symbols: List[str] | None = None,
+        host: str = "127.0.0.1",
+        bar_period_sec: float = 300.0,
+        updates_per_bar: int = 10,
+        volumes: Dict[str, float] | None = None,
+        trend_ratio: float = 0.0,
+        weight_limit: int = 0,
+        weight_window_sec: float = 60.0,
+    ):
+        if market not in _PATHS:
+            raise ValueError(f"Market tidak dikenal: {market}")
+        self.market = market
+        self.host = host
+        self.data = SyntheticMarket(symbols or ["BTCUSDT", "ETHUSDT"], bar_period_sec, trend_ratio=trend_ratio)
+        self.updates_per_bar = max(1, updates_per_bar)
+        self.volumes = volumes or {}
+
+        # weight per window menit (UTC, seperti Binance); 0 = tanpa batas
+        self.weight_limit = weight_limit
+        self.weight_window_sec = weight_window_sec
+        # awal hitungan window (0 = menit UTC); reset_weight_window() untuk test
+        self.weight_window_origin = 0.0
+        self._weight_lock = threading.Lock()
+        self._weight_window = -1
+        self.used_weight = 0
+        self.retry_after_until = 0.0
+        self.banned_until = 0.0
+        # response berikutnya dipaksa 429 dengan Retry-After X detik (test)
+        self.force_retry_after = 0
+        self.n_429 = 0
+        self.n_418 = 0
+        self.request_log: List[str] = []
+        # open_time bar → waktu nyata frame close pertama dikirim (latency load test)
+        self.close_log: Dict[int, float] = {}
+
+        self._http: ThreadingHTTPServer | None = None
+        self._ws_loop: asyncio.AbstractEventLoop | None = None
+        self._ws_server = None
+        self._ws_port = 0
+        self._threads: List[threading.Thread] = []
+
+    # ---------- URL ----------
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.host}:{self._http.server_address[1]}"
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://{self.host}:{self._ws_port}/stream"
+
+    # ---------- REST ----------
+
+    def reset_weight_window(self, origin: float | None = None) -> float:
+        """
+        Window weight baru mulai di origin (default: sekarang): weight
+        terpakai 0, Retry-After / ban dihapus. Test jadi tidak bergantung
+        pada posisi jam terhadap batas window.
+        """
+        with self._weight_lock:
+            self.weight_window_origin = time.time() if origin is None else origin
+            self._weight_window = -1
+            self.used_weight = 0
+            self.retry_after_until = 0.0
+            self.banned_until = 0.0
+            return self.weight_window_origin
+
+    def _admit(self, weight: int) -> tuple:
+        """
+        Return (used_weight, status penolakan atau None, Retry-After detik).
+        """
+        with self._weight_lock:
+            now = time.time()
+            window = int((now - self.weight_window_origin) // self.weight_window_sec)
+            if window != self._weight_window:
+                self._weight_window = window
+                self.used_weight = 0
+            if now < self.banned_until:
+                self.n_418 += 1
+                return self.used_weight, 418, math.ceil(self.banned_until - now)
+            if now < self.retry_after_until:
+                # tetap request padahal sudah diberi Retry-After → IP di-ban
+                self.banned_until = now + 2 * self.weight_window_sec
+                self.n_418 += 1
+                return self.used_weight, 418, math.ceil(self.banned_until - now)
+            window_end = self.weight_window_origin + (window + 1) * self.weight_window_sec
+            if self.force_retry_after:
+                self.retry_after_until = now + self.force_retry_after
+                self.force_retry_after = 0
+                self.n_429 += 1
+                return self.used_weight, 429, math.ceil(self.retry_after_until - now)
+            if self.weight_limit and self.used_weight + weight > self.weight_limit:
+                self.retry_after_until = window_end
+                self.n_429 += 1
+                return self.used_weight, 429, math.ceil(window_end - now)
+            self.used_weight += weight
+            return self.used_weight, None, 0
+
+    def handle_rest(self, path: str, query: Dict[str, List[str]]):
+        """
+        Return (status, body_obj, weight).
+        """
+        prefix = _PATHS[self.market]
+        self.request_log.append(path)
+        if path == f"{prefix}/exchangeInfo":
+            symbols = []
+            for s in self.data.symbols:
+                info = {"symbol": s, "status": "TRADING", "quoteAsset": "USDT", "baseAsset": s[:-4]}
+                if self.market == "futures":
+                    info["contractType"] = "PERPETUAL"
+                symbols.append(info)
+            return 200, {"symbols": symbols}, 20 if self.market == "spot" else 1
+        if path == f"{prefix}/ticker/24hr":
+            body = [
+                {"symbol": s, "quoteVolume": f"{self.volumes.get(s, 10_000_000.0):.2f}"}
+                for s in self.data.symbols
+            ]
+            return 200, body, 80 if self.market == "spot" else 40
+        if path == f"{prefix}/klines":
+            symbol = (query.get("symbol") or [""])[0].upper()
+            interval = (query.get("interval") or ["5m"])[0]
+            limit = int((query.get("limit") or ["500"])[0])
+            if symbol not in self.data.symbols or interval not in TF_MS:
+                return 400, {"code": -1121, "msg": "Invalid symbol."}, 1
+            return 200, self.data.klines(symbol, interval, limit), ADAPTERS[self.market].kline_weight(limit)
+        return 404, {"code": -1, "msg": "not found"}, 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive (seperti server asli); Content-Length selalu dikirim
+            protocol_version = "HTTP/1.1"
+            # header & body ditulis terpisah: tanpa TCP_NODELAY keep-alive kena
+            # jeda delayed-ACK ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                status, body, weight = server.handle_rest(u.path, parse_qs(u.query))
+                used, rejected, retry_after = server._admit(weight)
+                if rejected is not None:
+                    status = rejected
+                    body = {"code": -1003, "msg": "Too many requests; IP banned." if rejected == 418 else "Too many requests."}
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.send_header("X-MBX-USED-WEIGHT-1M", str(used))
+                if rejected is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    # ---------- WS ----------
+
+    def kline_event(self, symbol: str, tf: str, open_time: int, progress: float) -> Dict:
+        b = self.data.bar(symbol, tf, open_time, progress)
+        return {
+            "stream": f"{symbol.lower()}@kline_{tf}",
+            "data": {
+                "e": "kline",
+                "E": self.data.now_ms(),
+                "s": symbol,
+                "k": {
+                    "t": b[0], "T": b[6], "s": symbol, "i": tf,
+                    "o": b[1], "h": b[2], "l": b[3], "c": b[4], "v": b[5],
+                    "x": progress >= 1.0,
+                },
+            },
+        }
+
+    async def _ws_handler(self, conn) -> None:
+        query = parse_qs(urlparse(conn.request.path).query)
+        streams = (query.get("streams") or [""])[0].split("/")
+        subs = []
+        for st in streams:
+            if "@kline_" in st:
+                sym, tf = st.split("@kline_")
+                if sym.upper() in self.data.symbols and tf in TF_MS:
+                    subs.append((sym.upper(), tf))
+        if not subs:
+            await conn.close()
+            return
+
+        tf = subs[0][1]
+        step = TF_MS[tf]
+        tick_ms = step / self.updates_per_bar
+        last_open = None
+        try:
+            while True:
+                now = self.data.now_ms()
+                cur_open = now - now % step
+                if last_open is not None and cur_open != last_open:
+                    # bar sebelumnya close
+                    self.close_log.setdefault(last_open, time.time())
+                    for sym, _ in subs:
+                        await conn.send(json.dumps(self.kline_event(sym, tf, last_open, 1.0)))
+                progress = (now - cur_open) / step
+                for sym, _ in subs:
+                    await conn.send(json.dumps(self.kline_event(sym, tf, cur_open, progress)))
+                last_open = cur_open
+                await asyncio.sleep(tick_ms / 1000.0 / self.data.speed)
+        except Exception:
+            return
+
+    def _run_ws(self, ready: threading.Event) -> None:
+        import websockets.http11
+        from websockets.asyncio.server import serve
+
+        # URL combined stream 500+ symbol > 8 KB (batas default request line
+        # websockets); server Binance asli menerima sampai 1024 stream
+        websockets.http11.MAX_LINE_LENGTH = max(websockets.http11.MAX_LINE_LENGTH, 64 * 1024)
+
+        loop = asyncio.new_event_loop()
+        self._ws_loop = loop
+        asyncio.set_event_loop(loop)
+
+        async def start():
+            self._ws_server = await serve(self._ws_handler, self.host, 0)
+            self._ws_port = self._ws_server.sockets[0].getsockname()[1]
+            ready.set()
+
+        loop.run_until_complete(start())
+        loop.run_forever()
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> "FakeExchangeServer":
+        self._http = ThreadingHTTPServer((self.host, 0), self._make_handler())
+        t = threading.Thread(target=self._http.serve_forever, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+        ready = threading.Event()
+        t2 = threading.Thread(target=self._run_ws, args=(ready,), daemon=True)
+        t2.start()
+        self._threads.append(t2)
+        ready.wait(5)
+        return self
+
+    def stop(self) -> None:
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+        if self._ws_loop is not None:
+            loop = self._ws_loop
+
+            async def close():
+                self._ws_server.close()
+
+            asyncio.run_coroutine_threadsafe(close(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,185 @@
+# fake_telegram.py
+#
+# Fake Telegram Bot API lokal (test double) untuk load test tanpa Telegram asli.
+# - POST /bot<token>/sendMessage : dicatat (waktu terima, chat_id, teks);
+#   bisa dipaksa balas 429 (fail_next / fail_ratio) seperti flood limit asli
+# - GET  /bot<token>/getUpdates  : antrian update dari push_update(), dukung
+#   offset & long polling (timeout)
+#
+# Contoh:
+#   tg = FakeTelegramServer(token="TEST").start()
+#   env TELEGRAM_API_URL=tg.api_url, TELEGRAM_TOKEN=TEST → main.py tanpa diubah
+#   tg.push_update(chat_id=1, text="/startscan")
+#   ...
+#   tg.stop()
+
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeTelegramServer:
+    def __init__(self, token: str = "TEST", host: str = "127.0.0.1", fail_ratio: float = 0.0, retry_after: int = 1):
+        self.token = token
+        self.host = host
+        self.fail_ratio = fail_ratio
+        self.retry_after = retry_after
+
+        # (waktu terima, chat_id, teks)
+        self.sent: List[Tuple[float, int, str]] = []
+        self.rejected = 0
+        self.get_updates_calls = 0
+        self._fail_next = 0
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._n_requests = 0
+        self._cond = threading.Condition()
+        self._http: ThreadingHTTPServer | None = None
+
+    # ---------- URL ----------
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self._http.server_address[1]}"
+
+    # ---------- kontrol test ----------
+
+    def fail_next(self, n: int, retry_after: int | None = None) -> None:
+        """
+        n sendMessage berikutnya dibalas 429 Too Many Requests.
+        """
+        with self._cond:
+            self._fail_next += n
+            if retry_after is not None:
+                self.retry_after = retry_after
+
+    def push_update(self, chat_id: int, text: str, language_code: str = "id") -> None:
+        with self._cond:
+            self._updates.append({
+                "update_id": self._next_update_id,
+                "message": {
+                    "message_id": self._next_update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "language_code": language_code},
+                    "text": text,
+                },
+            })
+            self._next_update_id += 1
+            self._cond.notify_all()
+
+    def messages_to(self, chat_id: int) -> List[str]:
+        return [text for _, cid, text in self.sent if cid == chat_id]
+
+    # ---------- API ----------
+
+    def _should_fail(self) -> bool:
+        self._n_requests += 1
+        if self._fail_next > 0:
+            self._fail_next -= 1
+            return True
+        if self.fail_ratio <= 0:
+            return False
+        # deterministik per nomor request
+        return (zlib.crc32(str(self._n_requests).encode()) % 10_000) / 10_000 < self.fail_ratio
+
+    def send_message(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        now = time.time()
+        with self._cond:
+            if self._should_fail():
+                self.rejected += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            chat_id = int(body.get("chat_id", 0))
+            self.sent.append((now, chat_id, str(body.get("text", ""))))
+            n = len(self.sent)
+        return 200, {"ok": True, "result": {"message_id": n, "chat": {"id": chat_id}, "date": int(now)}}
+
+    def get_updates(self, query: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        offset = int((query.get("offset") or ["0"])[0])
+        timeout = min(float((query.get("timeout") or ["0"])[0]), 30.0)
+        deadline = time.time() + timeout
+        with self._cond:
+            self.get_updates_calls += 1
+            # offset = konfirmasi update sebelumnya (seperti API asli)
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.time() < deadline:
+                self._cond.wait(deadline - time.time())
+            return 200, {"ok": True, "result": list(self._updates)}
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: Dict[str, Any]):
+        prefix = f"/bot{self.token}/"
+        if not path.startswith(prefix):
+            return 401, {"ok": False, "error_code": 401, "description": "Unauthorized"}
+        name = path[len(prefix):]
+        if name == "sendMessage":
+            return self.send_message(body)
+        if name == "getUpdates":
+            query = {**query, **{k: [str(v)] for k, v in body.items()}}
+            return self.get_updates(query)
+        if name == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "username": "fake_bot"}}
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive (seperti server asli); Content-Length selalu dikirim
+            protocol_version = "HTTP/1.1"
+            # header & body ditulis terpisah: tanpa TCP_NODELAY keep-alive kena
+            # jeda delayed-ACK ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def _reply(self, status: int, obj: Dict[str, Any]) -> None:
+                raw = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _body(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if not raw:
+                    return {}
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    return json.loads(raw)
+                return {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                self._reply(*server.handle("GET", u.path, parse_qs(u.query), {}))
+
+            def do_POST(self):
+                u = urlparse(self.path)
+                self._reply(*server.handle("POST", u.path, parse_qs(u.query), self._body()))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> "FakeTelegramServer":
+        self._http = ThreadingHTTPServer((self.host, 0), self._make_handler())
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._http is not None:
+            with self._cond:
+                self._cond.notify_all()
+            self._http.shutdown()
+            self._http.server_close()
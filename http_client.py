@@ -0,0 +1,237 @@
+# http_client.py
+#
+# Lapisan HTTP bersama untuk semua pemanggil REST (Binance & Telegram):
+# - 1 requests.Session per host (keep-alive): koneksi TCP/TLS dipakai ulang,
+#   bukan handshake baru per request (>1.500 per bar sebelumnya)
+# - ukuran pool per host diatur dari config (Binance / Telegram terpisah)
+# - GET (idempotent) di-retry otomatis saat error koneksi / timeout / 5xx,
+#   backoff eksponensial + jitter; POST tidak pernah di-retry
+# - statistik per host: request, koneksi dibuka, retry, error, latency
+#
+# Contoh:
+#   r = http_client.get(f"{BINANCE_REST_URL}/api/v3/klines", params=params)
+#   print(http_client.summary())
+#
+# Benchmark (fake exchange lokal, koneksi baru vs pool):
+#   python http_client.py --requests 500
+
+import random
+import threading
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    TELEGRAM_API_URL,
+    HTTP_BINANCE_POOL_SIZE,
+    HTTP_TELEGRAM_POOL_SIZE,
+    HTTP_CONNECT_TIMEOUT_SEC,
+    HTTP_READ_TIMEOUT_SEC,
+    HTTP_GET_RETRIES,
+    HTTP_RETRY_BACKOFF_SEC,
+)
+
+
+class HostPool:
+    """
+    Session keep-alive 1 host + statistik. Aman dipakai dari banyak thread
+    (asyncio.to_thread, pool /scanall).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        pool_size: int,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SEC,
+        read_timeout: float = HTTP_READ_TIMEOUT_SEC,
+        retries: int = HTTP_GET_RETRIES,
+        backoff_sec: float = HTTP_RETRY_BACKOFF_SEC,
+    ):
+        self.host = host
+        self.pool_size = max(1, pool_size)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(0, retries)
+        self.backoff_sec = backoff_sec
+
+        # retry diatur sendiri (hanya GET, dengan jitter), bukan oleh urllib3
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        self.n_requests = 0
+        self.n_retries = 0
+        self.n_errors = 0
+        self.latency_sec = 0.0
+
+    def _count(self, start: float, error: bool) -> None:
+        with self._lock:
+            self.n_requests += 1
+            self.latency_sec += time.perf_counter() - start
+            if error:
+                self.n_errors += 1
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: acak 0 .. base * 2^attempt → retry banyak thread tidak serempak
+        return random.uniform(0, self.backoff_sec * (2 ** attempt))
+
+    def request(self, method: str, url: str, timeout: float | None = None, retries: int | None = None, **kwargs):
+        """
+        Kirim request lewat session host ini. retries hanya berlaku untuk GET.
+        Exception koneksi dilempar setelah retry habis; response 5xx terakhir
+        dikembalikan apa adanya (caller yang raise_for_status).
+        """
+        timeout = (self.connect_timeout, timeout if timeout is not None else self.read_timeout)
+        retries = (self.retries if retries is None else retries) if method == "GET" else 0
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                r = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._count(start, error=True)
+                if attempt >= retries:
+                    raise
+            else:
+                self._count(start, error=r.status_code >= 500)
+                if r.status_code < 500 or attempt >= retries:
+                    return r
+                r.close()
+            with self._lock:
+                self.n_retries += 1
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def connections_opened(self) -> int:
+        """
+        Koneksi TCP yang pernah dibuka (dari pool urllib3); jauh di bawah
+        n_requests kalau keep-alive jalan.
+        """
+        pools = self.adapter.poolmanager.pools
+        try:
+            return sum(pools[key].num_connections for key in list(pools.keys()))
+        except Exception:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.n_requests
+            return {
+                "host": self.host,
+                "pool_size": self.pool_size,
+                "requests": n,
+                "connections": self.connections_opened(),
+                "retries": self.n_retries,
+                "errors": self.n_errors,
+                "avg_ms": self.latency_sec / n * 1000 if n else 0.0,
+            }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# ================== REGISTRY PER HOST ==================
+
+_pools: Dict[str, HostPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _host_of(url: str) -> str:
+    u = urlsplit(url)
+    return f"{u.scheme}://{u.netloc}"
+
+
+def pool_size_for(host: str) -> int:
+    return HTTP_TELEGRAM_POOL_SIZE if host == _host_of(TELEGRAM_API_URL) else HTTP_BINANCE_POOL_SIZE
+
+
+def pool_for(url: str) -> HostPool:
+    host = _host_of(url)
+    pool = _pools.get(host)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(host)
+            if pool is None:
+                pool = _pools[host] = HostPool(host, pool_size_for(host))
+    return pool
+
+
+def get(url: str, params: Dict[str, Any] | None = None, timeout: float | None = None, **kwargs) -> requests.Response:
+    return pool_for(url).request("GET", url, params=params, timeout=timeout, **kwargs)
+
+
+def post(url: str, timeout: float | None = None, **kwargs) -> requests.Response:
+    return pool_for(url).request("POST", url, timeout=timeout, **kwargs)
+
+
+def stats() -> List[Dict[str, Any]]:
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+def summary() -> str:
+    """
+    1 baris per host untuk status admin.
+    """
+    parts = []
+    for s in stats():
+        host = s["host"].split("://", 1)[-1]
+        parts.append(
+            f"{host} {s['requests']} req / {s['connections']} koneksi, "
+            f"retry {s['retries']}, error {s['errors']}, {s['avg_ms']:.0f} ms"
+        )
+    return "; ".join(parts) or "belum ada request"
+
+
+def close_all() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# ================== BENCHMARK ==================
+
+
+def run_benchmark(n_requests: int = 500, threads: int = 8) -> None:
+    """
+    /klines ke fake exchange lokal: requests.get (koneksi baru per call) vs
+    HostPool (keep-alive). Lokal tanpa TLS → selisih nyata ke Binance lebih besar.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fake_exchange import FakeExchangeServer
+
+    srv = FakeExchangeServer(market="spot", symbols=["BTCUSDT"]).start()
+    url = f"{srv.rest_url}/api/v3/klines"
+    params = {"symbol": "BTCUSDT", "interval": "5m", "limit": 50}
+    pool = HostPool(_host_of(url), pool_size=threads)
+    try:
+        for name, fn in (
+            ("requests.get (tanpa pool)", lambda: requests.get(url, params=params, timeout=10).json()),
+            ("http_client (keep-alive)", lambda: pool.request("GET", url, params=params).json()),
+        ):
+            with ThreadPoolExecutor(threads) as ex:
+                start = time.perf_counter()
+                list(ex.map(lambda _: fn(), range(n_requests)))
+                elapsed = time.perf_counter() - start
+            print(f"{name:26s}: {elapsed * 1000:7.0f} ms ({n_requests / elapsed:,.0f} req/s, {threads} thread)")
+        s = pool.stats()
+        print(f"pool: {s['requests']} request lewat {s['connections']} koneksi")
+    finally:
+        pool.close()
+        srv.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark HTTP keep-alive pool")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    run_benchmark(args.requests, args.threads)
@@ -0,0 +1,214 @@
+# intrabar.py
+#
+# Mode early-signal intrabar (opsional, butuh MARKET_DATA_MODE=stream):
+# - Re-evaluasi kondisi 5m dari update kline parsial (x == false)
+# - Hanya symbol yang sudah lolos filter 1h/15m (cache StreamScanner)
+# - Statistik candle closed dihitung sekali per 5m close (IntrabarState),
+#   tiap update parsial cukup O(1)
+# - Debounce: maksimal 1x evaluasi per INTRABAR_MIN_INTERVAL_SEC per symbol
+# - Hasil = sinyal PROVISIONAL; saat candle close diputuskan oleh analisa
+#   close StreamScanner yang sebenarnya (on_result → process_ipc_result:
+#   sinyal terkirim = konfirmasi, ditolak = batal). Symbol yang tidak ikut
+#   batch analisa close langsung dibatalkan di sini.
+
+import time
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from config import INTRABAR_MIN_INTERVAL_SEC
+from ipc_logic import LONG, Features5m, conditions_5m, direction_conditions, levels_from_range
+from kernels import wick_ratios
+from swings import SwingTracker
+
+# Minimal candle closed (analyse_ipc_frames butuh >= 60 termasuk candle terakhir)
+MIN_CLOSED_BARS = 59
+
+
+class IntrabarState:
+    """
+    Statistik window dari candle 5m closed. Candle parsial diperlakukan
+    sebagai candle index -1 (sama seperti detector di ipc_logic), jadi hasil
+    evaluate() identik dengan analyse_ipc_frames(closed + [parsial]).
+    """
+
+    __slots__ = (
+        "open_time_next",
+        "prev_open", "prev_close",
+        "impulse_avg_body",
+        "pullback_high", "pullback_low",
+        "anti_fake_avg_range",
+        "cont_prev_high", "cont_prev_low", "cont_avg_body",
+        "vol_avg",
+        "levels_high", "levels_low",
+    )
+
+    def __init__(self, closed: np.ndarray, base_ms: int, swings: SwingTracker | None = None):
+        """
+        swings = tracker 5m symbol ini khusus intrabar (semua candle closed
+        boleh mengonfirmasi pivot, beda dengan tracker analisa bar).
+        """
+        opens = closed[:, 1]
+        highs = closed[:, 2]
+        lows = closed[:, 3]
+        closes = closed[:, 4]
+        vols = closed[:, 5]
+        bodies = np.abs(closes - opens)
+
+        self.open_time_next = float(closed[-1, 0]) + base_ms
+
+        # impulse (lookback 20): rata-rata body candle [-22:-2] → closed[-21:-1]
+        self.impulse_avg_body = float(bodies[-21:-1].mean())
+        self.prev_open = float(opens[-1])
+        self.prev_close = float(closes[-1])
+
+        # pullback (window 40): high/low 39 candle closed terakhir
+        self.pullback_high = float(highs[-39:].max())
+        self.pullback_low = float(lows[-39:].min())
+
+        # anti fake (lookback 30): rata-rata range candle [-33:-1] → closed[-32:]
+        self.anti_fake_avg_range = float((highs[-32:] - lows[-32:]).mean())
+
+        # continuation (lookback 15): candle [-17:-2] → closed[-16:-1]
+        self.cont_prev_high = float(highs[-16:-1].max())
+        self.cont_prev_low = float(lows[-16:-1].min())
+        self.cont_avg_body = float(bodies[-16:-1].mean())
+
+        # volume (lookback 30): candle [-32:-2] → closed[-31:-1]
+        self.vol_avg = float(vols[-31:-1].mean())
+
+        # level (window 30, swing): candle parsial = trigger, semua closed final
+        swings = swings if swings is not None else SwingTracker()
+        times = closed[:, 0]
+        swings.update(times, highs, lows, confirm_last=True)
+        self.levels_high, self.levels_low = swings.range(times, highs, lows, window=30, pending_last=True)
+
+    def features(self, o: float, h: float, l: float, c: float, v: float) -> Features5m:
+        """
+        Features5m untuk closed + candle parsial, O(1).
+        """
+        f = Features5m()
+        f.o, f.h, f.l, f.c, f.v = o, h, l, c, v
+        f.prev_o = self.prev_open
+        f.prev_c = self.prev_close
+        f.impulse_avg_body = self.impulse_avg_body
+        f.pb_high = max(self.pullback_high, h)
+        f.pb_low = min(self.pullback_low, l)
+        f.af_avg_range = self.anti_fake_avg_range
+        f.cont_prev_high = self.cont_prev_high
+        f.cont_prev_low = self.cont_prev_low
+        f.cont_avg_body = self.cont_avg_body
+        f.vol_avg = self.vol_avg
+        f.wick_up, f.wick_down = wick_ratios(o, h, l, c)
+        f.lv_high = max(self.levels_high, h)
+        f.lv_low = min(self.levels_low, l)
+        return f
+
+    def evaluate(
+        self, o: float, h: float, l: float, c: float, v: float, direction: str = LONG
+    ) -> Tuple[Dict[str, bool], Dict[str, float]]:
+        """
+        Kondisi 5m + level untuk candle parsial (o, h, l, c, v).
+        """
+        f = self.features(o, h, l, c, v)
+        return conditions_5m(f, direction), levels_from_range(f.lv_high, f.lv_low, c, direction)
+
+
+# on_provisional(symbol, conditions, levels) → True kalau provisional dikirim
+ProvisionalCallback = Callable[[str, dict, dict], bool]
+# on_cancel(symbol) → kirim info provisional batal (symbol tidak dianalisa saat close)
+CancelCallback = Callable[[str], None]
+
+
+class IntrabarScanner:
+    """
+    Dipasang di atas StreamScanner (pakai engine & cache filter 1h/15m-nya).
+    """
+
+    def __init__(
+        self,
+        scanner,
+        on_provisional: ProvisionalCallback,
+        on_cancel: CancelCallback,
+        min_interval_sec: float = INTRABAR_MIN_INTERVAL_SEC,
+    ):
+        from bar_engine import TF_MS
+
+        self.scanner = scanner
+        self.engine = scanner.engine
+        self.on_provisional = on_provisional
+        self.on_cancel = on_cancel
+        self.min_interval_sec = min_interval_sec
+        self.base_ms = TF_MS["5m"]
+
+        self.states: Dict[str, IntrabarState] = {}
+        self.swings: Dict[str, SwingTracker] = {}
+        self.last_eval: Dict[str, float] = {}
+        # symbol → open_time candle yang sudah dapat provisional
+        self.provisional: Dict[str, float] = {}
+
+        self.engine.subscribe("5m", self._on_5m_close)
+
+    def rebuild(self, symbol: str) -> None:
+        if self.scanner.qualified_direction(symbol) is None:
+            self.states.pop(symbol, None)
+            return
+        closed = self.engine.bars(symbol, "5m")
+        if len(closed) < MIN_CLOSED_BARS:
+            self.states.pop(symbol, None)
+            return
+        swings = self.swings.get(symbol)
+        if swings is None:
+            swings = self.swings[symbol] = SwingTracker()
+        self.states[symbol] = IntrabarState(closed, self.base_ms, swings)
+
+    def _on_5m_close(self, symbol: str, tf: str, bar) -> None:
+        # dipanggil setelah StreamScanner._on_5m_close (subscribe lebih dulu),
+        # jadi batch analisa close bar ini sudah terisi
+        prov_open = self.provisional.pop(symbol, None)
+        if prov_open is not None and not (prov_open == bar[0] and self.scanner.in_batch(symbol, bar[0])):
+            self.on_cancel(symbol)
+        self.rebuild(symbol)
+
+    def on_partial(self, kline: Dict) -> None:
+        """
+        Payload "k" dengan x == false.
+        """
+        symbol = kline.get("s", "").upper()
+        st = self.states.get(symbol)
+        if st is None:
+            return
+        open_time = float(kline["t"])
+        if open_time != st.open_time_next:
+            return  # state belum ter-update untuk candle ini
+        if self.provisional.get(symbol) == open_time:
+            return  # sudah provisional di candle ini
+
+        now = time.monotonic()
+        if now - self.last_eval.get(symbol, 0.0) < self.min_interval_sec:
+            return
+        self.last_eval[symbol] = now
+
+        direction = self.scanner.qualified_direction(symbol)
+        if direction is None:
+            return
+        conds, levels = st.evaluate(
+            float(kline["o"]), float(kline["h"]), float(kline["l"]), float(kline["c"]), float(kline["v"]),
+            direction,
+        )
+        if not (conds["pullback_healthy"] and conds["anti_fake_break"]):
+            return
+
+        conditions = direction_conditions(direction)
+        conditions.update(conds)
+        if self.on_provisional(symbol, conditions, levels):
+            self.provisional[symbol] = open_time
+
+    def retain(self, symbols) -> None:
+        keep = {s.upper() for s in symbols}
+        # symbol keluar universe → candle close-nya tidak akan dianalisa
+        for sym in [s for s in self.provisional if s not in keep]:
+            self.on_cancel(sym)
+        for d in (self.states, self.swings, self.last_eval, self.provisional):
+            for sym in [s for s in d if s not in keep]:
+                del d[sym]
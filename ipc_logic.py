@@ -1,11 +1,39 @@
 # ipc_logic.py
+#
+# pandas diimport lazy (hanya saat DataFrame dibuat) → import modul ini murah
+# saat startup; startup.prewarm_imports() yang memanaskan di background.
 
-import requests
-import pandas as pd
-import numpy as np
-from typing import Tuple, Dict, Any
+from __future__ import annotations
 
-from config import BINANCE_REST_URL, LIMIT_KLINES
+import numpy as np
+from typing import TYPE_CHECKING, Tuple, Dict, Any
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from config import BINANCE_REST_URL, LIMIT_KLINES, SIGNAL_DIRECTIONS
+from exchange import SpotAdapter
+from rate_limit import governed_get, governor_for
+from kernels import (
+    AF_AVG_RANGE,
+    CONT_AVG_BODY,
+    CONT_PREV_HIGH,
+    CONT_PREV_LOW,
+    IMPULSE_AVG_BODY,
+    PB_HIGH,
+    PB_LOW,
+    VOL_AVG,
+    WICK_DOWN,
+    WICK_UP,
+    stats_5m,
+)
+from swings import SwingTracker
+
+LONG = "long"
+SHORT = "short"
+
+# Kolom numerik yang dipakai detector (urutan tetap, untuk array / shared memory)
+KLINE_ARRAY_COLS = ["open_time", "open", "high", "low", "close", "volume"]
 
 
 # ================== DATA FETCHING ==================
@@ -18,9 +46,16 @@ def get_klines(symbol: str, interval: str, limit: int = LIMIT_KLINES) -> pd.Data
     url = f"{BINANCE_REST_URL}/api/v3/klines"
     params = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
 
-    r = requests.get(url, params=params, timeout=10)
+    r = governed_get(governor_for("spot"), url, params, weight=SpotAdapter.kline_weight(limit))
     r.raise_for_status()
-    data = r.json()
+    return klines_to_frame(r.json())
+
+
+def klines_to_frame(data: list) -> pd.DataFrame:
+    """
+    Response JSON /klines (spot & futures formatnya sama) → DataFrame.
+    """
+    import pandas as pd
 
     cols = [
         "open_time", "open", "high", "low", "close", "volume",
@@ -29,7 +64,7 @@ def get_klines(symbol: str, interval: str, limit: int = LIMIT_KLINES) -> pd.Data
     ]
     df = pd.DataFrame(data, columns=cols)
 
-    for c in ["open", "high", "low", "close", "volume"]:
+    for c in KLINE_ARRAY_COLS:
         df[c] = df[c].astype(float)
 
     return df
@@ -46,6 +81,8 @@ def calc_atr_like(df: pd.DataFrame, period: int = 14) -> float:
     """
     ATR sederhana untuk melihat volatilitas rata-rata.
     """
+    import pandas as pd
+
     high = df["high"]
     low = df["low"]
     close = df["close"]
@@ -59,84 +96,116 @@ def calc_atr_like(df: pd.DataFrame, period: int = 14) -> float:
     return float(atr.iloc[-1])
 
 
-def find_recent_swing_high_low(df: pd.DataFrame, window: int = 30) -> Tuple[float, float]:
+def swings_of(df: pd.DataFrame, swings: SwingTracker | None = None) -> SwingTracker:
     """
-    Cari high & low terbaru di jendela window terakhir.
+    Swing DataFrame klines: tracker cache (di-update inkremental) atau baru.
     """
-    highs = df["high"].values
-    lows = df["low"].values
+    swings = swings if swings is not None else SwingTracker()
+    return swings.update(df["open_time"].values, df["high"].values, df["low"].values)
 
-    if len(highs) < window:
-        window = len(highs)
 
-    recent_high = float(np.max(highs[-window:]))
-    recent_low = float(np.min(lows[-window:]))
-
-    return recent_high, recent_low
+def find_recent_swing_high_low(
+    df: pd.DataFrame, window: int = 30, swings: SwingTracker | None = None
+) -> Tuple[float, float]:
+    """
+    Swing high & low terakhir (pivot fractal) di jendela window terakhir;
+    tanpa pivot → high / low tertinggi-terendah jendela.
+    """
+    swings = swings_of(df, swings)
+    return swings.range(df["open_time"].values, df["high"].values, df["low"].values, window)
 
 
 # ================== 1. TREND 1H (WAJIB) ==================
 
 
+def trend_direction_from_emas(last: float, e20: float, e50: float, e200: float) -> int:
+    """
+    +1 = bullish (close > EMA20 > EMA50 > EMA200)
+    -1 = bearish (close < EMA20 < EMA50 < EMA200)
+     0 = tidak trending
+    """
+    if last > e20 > e50 > e200:
+        return 1
+    if last < e20 < e50 < e200:
+        return -1
+    return 0
+
+
+def detect_trend_1h_direction(df_1h: pd.DataFrame) -> int:
+    """
+    Arah trend 1H (long & short dari EMA yang sama, 1x hitung).
+    """
+    close = df_1h["close"]
+    if len(close) < 200:
+        return 0
+
+    last = close.iloc[-1]
+    e20 = ema(close, 20).iloc[-1]
+    e50 = ema(close, 50).iloc[-1]
+    e200 = ema(close, 200).iloc[-1]
+
+    return trend_direction_from_emas(last, e20, e50, e200)
+
+
 def detect_trend_1h_bullish(df_1h: pd.DataFrame) -> bool:
     """
     Trend bullish sederhana:
     - close > EMA20 > EMA50 > EMA200
     - close juga di atas EMA50
     """
-    close = df_1h["close"]
-    if len(close) < 200:
-        return False
-
-    ema20 = ema(close, 20)
-    ema50 = ema(close, 50)
-    ema200 = ema(close, 200)
+    return detect_trend_1h_direction(df_1h) == 1
 
-    last = close.iloc[-1]
-    e20 = ema20.iloc[-1]
-    e50 = ema50.iloc[-1]
-    e200 = ema200.iloc[-1]
 
-    strong_bull = (last > e20 > e50 > e200)
-    return bool(strong_bull)
+def detect_trend_1h_bearish(df_1h: pd.DataFrame) -> bool:
+    """
+    Mirror bearish: close < EMA20 < EMA50 < EMA200
+    """
+    return detect_trend_1h_direction(df_1h) == -1
 
 
 # ================== 2. STRUKTUR 15m (WAJIB) ==================
 
 
-def detect_struct_15m_bullish(df_15m: pd.DataFrame) -> bool:
+def struct_direction_from_values(last_close: float, last_ema50: float, swings: SwingTracker) -> int:
     """
-    Struktur bullish sederhana:
-    - HL / HH terbentuk dalam beberapa candle terakhir
-    - price berada di atas EMA50
+    +1 = struktur swing bullish (HL + HH / break swing high) di atas EMA50,
+    -1 = bearish (LH + LL / break swing low) di bawah EMA50, 0 = tidak jelas.
     """
-    closes = df_15m["close"]
-    highs = df_15m["high"].values
-    lows = df_15m["low"].values
+    direction = swings.direction(last_close)
+    if direction > 0 and last_close > last_ema50:
+        return 1
+    if direction < 0 and last_close < last_ema50:
+        return -1
+    return 0
 
-    if len(closes) < 50:
-        return False
 
-    ema50 = ema(closes, 50)
-    last_close = closes.iloc[-1]
-    last_ema50 = ema50.iloc[-1]
+def detect_struct_15m_direction(df_15m: pd.DataFrame, swings: SwingTracker | None = None) -> int:
+    """
+    Arah struktur 15m (long & short dari EMA50 & swing yang sama).
+    swings = cache tracker 15m symbol ini (None → hitung dari awal).
+    """
+    closes = df_15m["close"]
+    if len(closes) < 50:
+        return 0
 
-    if last_close <= last_ema50:
-        return False
+    last_ema50 = ema(closes, 50).iloc[-1]
+    return struct_direction_from_values(float(closes.iloc[-1]), float(last_ema50), swings_of(df_15m, swings))
 
-    # cek HL / HH kasar
-    # ambil 6 candle terakhir sebagai referensi
-    if len(highs) < 8:
-        return False
 
-    recent_highs = highs[-8:]
-    recent_lows = lows[-8:]
+def detect_struct_15m_bullish(df_15m: pd.DataFrame) -> bool:
+    """
+    Struktur bullish:
+    - swing low terakhir HL, swing high terakhir HH (atau close break swing high)
+    - price berada di atas EMA50
+    """
+    return detect_struct_15m_direction(df_15m) == 1
 
-    # syarat: high terbaru > high beberapa candle sebelum, low terbaru > low beberapa candle sebelum
-    if recent_highs[-1] > recent_highs[-4] and recent_lows[-1] > recent_lows[-4]:
-        return True
 
-    return False
+def detect_struct_15m_bearish(df_15m: pd.DataFrame) -> bool:
+    """
+    Mirror bearish: LH + LL (atau break swing low) & price di bawah EMA50.
+    """
+    return detect_struct_15m_direction(df_15m) == -1
 
 
 # ================== 3. IMPULSE KUAT (OPSIONAL) ==================
@@ -329,54 +398,344 @@ def detect_volume_strong_5m(df_5m: pd.DataFrame, lookback: int = 30) -> bool:
     return bool(last_vol > avg_vol * 1.5)
 
 
-# ================== LEVEL ENTRY / SL / TP ==================
+# ================== FITUR 5m BERSAMA (LONG & SHORT) ==================
+
+# Minimal candle 5m untuk semua detector 5m
+MIN_5M_BARS = 60
 
 
-def build_ipc_levels_from_5m(df_5m: pd.DataFrame, window: int = 30) -> Dict[str, float]:
+class Features5m:
     """
-    Bangun level entry / SL / TP dari struktur 5m sederhana.
-    - Cari swing low & high terakhir (window)
-    - Entry di sekitar mid/discount
-    - SL sedikit di bawah swing low
-    - TP berdasarkan risk dari range swing
+    Statistik 5m yang dipakai semua detector, dihitung 1x per analisa lalu
+    dipakai untuk kondisi LONG dan SHORT sekaligus. Window sama persis dengan
+    detector detect_*_5m di atas (butuh minimal MIN_5M_BARS candle);
+    statistik window dari kernel fused stats_5m (kernels.py).
     """
-    recent_high, recent_low = find_recent_swing_high_low(df_5m, window=window)
-    closes = df_5m["close"].values
 
-    last_close = float(closes[-1])
+    __slots__ = (
+        "o", "h", "l", "c", "v",
+        "prev_o", "prev_c",
+        "impulse_avg_body",
+        "pb_high", "pb_low",
+        "af_avg_range",
+        "cont_prev_high", "cont_prev_low", "cont_avg_body",
+        "vol_avg",
+        "wick_up", "wick_down",
+        "lv_high", "lv_low",
+    )
+
+    @classmethod
+    def from_arrays(cls, opens, highs, lows, closes, vols, times=None, swings: SwingTracker | None = None) -> "Features5m":
+        """
+        times = open_time (untuk swing); swings = cache tracker 5m symbol ini.
+        """
+        f = cls()
+        f.o, f.h, f.l, f.c, f.v = (float(x[-1]) for x in (opens, highs, lows, closes, vols))
+        f.prev_o = float(opens[-2])
+        f.prev_c = float(closes[-2])
+        stats = stats_5m(opens, highs, lows, closes, vols).tolist()
+        f.impulse_avg_body = stats[IMPULSE_AVG_BODY]
+        f.pb_high = stats[PB_HIGH]
+        f.pb_low = stats[PB_LOW]
+        f.af_avg_range = stats[AF_AVG_RANGE]
+        f.cont_prev_high = stats[CONT_PREV_HIGH]
+        f.cont_prev_low = stats[CONT_PREV_LOW]
+        f.cont_avg_body = stats[CONT_AVG_BODY]
+        f.vol_avg = stats[VOL_AVG]
+        f.wick_up = stats[WICK_UP]
+        f.wick_down = stats[WICK_DOWN]
+        # level: swing high / low terakhir (window 30)
+        if times is None:
+            times = np.arange(len(highs), dtype=np.float64)
+        swings = swings if swings is not None else SwingTracker()
+        swings.update(times, highs, lows)
+        f.lv_high, f.lv_low = swings.range(times, highs, lows, window=30)
+        return f
+
+    @classmethod
+    def from_frame(cls, df_5m: pd.DataFrame, swings: SwingTracker | None = None) -> "Features5m":
+        return cls.from_arrays(
+            df_5m["open"].values,
+            df_5m["high"].values,
+            df_5m["low"].values,
+            df_5m["close"].values,
+            df_5m["volume"].values,
+            times=df_5m["open_time"].values,
+            swings=swings,
+        )
+
+
+def conditions_5m(f: Features5m, direction: str = LONG) -> Dict[str, bool]:
+    """
+    Kondisi 5m (pullback, anti-fake, impulse, continuation, volume) untuk
+    arah LONG atau SHORT dari fitur yang sama.
+    """
+    short = direction == SHORT
+    o, h, l, c = f.o, f.h, f.l, f.c
+
+    # pullback sehat: LONG di 30-60% range (discount), SHORT di 40-70% (premium)
+    pullback = False
+    full = f.pb_high - f.pb_low
+    if full > 0:
+        pos = (c - f.pb_low) / full
+        if short:
+            pullback = 0.4 <= pos <= 0.7 and c < f.pb_high
+        else:
+            pullback = 0.3 <= pos <= 0.6 and c > f.pb_low
+
+    # anti fake break: bukan spike & wick searah tidak dominan
+    anti_fake = False
+    last_range = h - l
+    if f.af_avg_range > 0 and last_range <= f.af_avg_range * 3.0:
+        # SHORT: wick bawah, LONG: wick atas (rasio dari kernel)
+        anti_fake = (f.wick_down if short else f.wick_up) <= 0.6
+
+    # impulse: candle searah dengan body > 1.5x rata-rata (2 candle terakhir)
+    impulse = False
+    if f.impulse_avg_body > 0:
+        for op, cl in ((f.prev_o, f.prev_c), (o, c)):
+            searah = cl < op if short else cl > op
+            if searah and abs(cl - op) > f.impulse_avg_body * 1.5:
+                impulse = True
+                break
+
+    # continuation break: close tembus low/high sebelumnya dengan body tegas
+    broke = c < f.cont_prev_low if short else c > f.cont_prev_high
+    cont = broke and f.cont_avg_body > 0 and abs(c - o) >= f.cont_avg_body * 0.8
+
+    # volume kuat (tidak tergantung arah)
+    volume = f.vol_avg > 0 and f.v > f.vol_avg * 1.5
+
+    return {
+        "pullback_healthy": bool(pullback),
+        "anti_fake_break": bool(anti_fake),
+        "impulse_strong": bool(impulse),
+        "continuation_break": bool(cont),
+        "volume_strong": bool(volume),
+    }
+
+
+# ================== LEVEL ENTRY / SL / TP ==================
+
 
+def levels_from_range(recent_high: float, recent_low: float, last_close: float, direction: str = LONG) -> Dict[str, float]:
+    """
+    Level dari swing range:
+    - Entry di 50% range
+    - LONG : SL di bawah swing low, TP ke atas
+    - SHORT: SL di atas swing high, TP ke bawah
+    """
     full_range = recent_high - recent_low
     if full_range <= 0:
         full_range = max(1e-6, abs(last_close) * 0.001)
 
-    # Entry dekat 50% retrace dari swing tinggi → ke bawah (discount)
-    entry = recent_low + full_range * 0.5
-
-    # SL sedikit di bawah swing low
-    sl = recent_low - full_range * 0.25
+    if direction == SHORT:
+        entry = recent_high - full_range * 0.5
+        sl = recent_high + full_range * 0.25
+        risk = sl - entry
+        sign = -1.0
+    else:
+        # Entry dekat 50% retrace dari swing tinggi → ke bawah (discount)
+        entry = recent_low + full_range * 0.5
+        # SL sedikit di bawah swing low
+        sl = recent_low - full_range * 0.25
+        risk = entry - sl
+        sign = 1.0
 
-    # Risk = entry - SL
-    risk = entry - sl
     if risk <= 0:
         risk = full_range * 0.5
 
-    tp1 = entry + risk * 1.0
-    tp2 = entry + risk * 1.5
-    tp3 = entry + risk * 2.0
-
     return {
         "entry": float(entry),
         "sl": float(sl),
-        "tp1": float(tp1),
-        "tp2": float(tp2),
-        "tp3": float(tp3),
+        "tp1": float(entry + sign * risk * 1.0),
+        "tp2": float(entry + sign * risk * 1.5),
+        "tp3": float(entry + sign * risk * 2.0),
     }
 
 
+def build_ipc_levels_from_5m(
+    df_5m: pd.DataFrame, window: int = 30, direction: str = LONG, swings: SwingTracker | None = None
+) -> Dict[str, float]:
+    """
+    Bangun level entry / SL / TP dari struktur swing 5m.
+    - Swing low & high terakhir (pivot fractal) dalam window
+    - Entry di sekitar mid/discount
+    - SL sedikit di bawah swing low (SHORT: di atas swing high)
+    - TP berdasarkan risk dari range swing
+    """
+    recent_high, recent_low = find_recent_swing_high_low(df_5m, window=window, swings=swings)
+    last_close = float(df_5m["close"].values[-1])
+    return levels_from_range(recent_high, recent_low, last_close, direction)
+
+
 # ================== MAIN ANALYZE FUNCTION ==================
 
 
-def analyse_symbol_ipc(symbol: str) -> Tuple[Dict[str, Any] | None, Dict[str, float] | None]:
+def fetch_ipc_frames(symbol: str, fetch=None) -> Dict[str, pd.DataFrame]:
+    """
+    Ambil data 1H, 15m, 5m via REST untuk 1 symbol.
+    fetch = fungsi (symbol, interval, limit) → DataFrame, default get_klines
+    (spot); isi adapter.get_klines untuk market lain.
+    """
+    fetch = fetch or get_klines
+    return {
+        "1h": fetch(symbol, "1h", LIMIT_KLINES),
+        "15m": fetch(symbol, "15m", LIMIT_KLINES),
+        "5m": fetch(symbol, "5m", LIMIT_KLINES),
+    }
+
+
+def frame_to_array(df: pd.DataFrame) -> np.ndarray:
+    """
+    DataFrame klines -> array float64 (n, 6) dengan kolom KLINE_ARRAY_COLS.
+    Dipakai untuk kirim candle lewat shared memory (tanpa pickle DataFrame).
+    """
+    return df[KLINE_ARRAY_COLS].to_numpy(dtype=np.float64)
+
+
+def array_to_frame(arr: np.ndarray) -> pd.DataFrame:
+    """
+    Kebalikan frame_to_array. Tanpa copy: kolom DataFrame = view arr (mis.
+    view ring BarEngine, kolom-mayor → tiap kolom kontigu).
+    """
+    import pandas as pd
+
+    return pd.DataFrame(arr, columns=KLINE_ARRAY_COLS, copy=False)
+
+
+def filter_direction(trend_1h: int, struct_15m: int, directions: Tuple[str, ...] | None = None) -> str | None:
+    """
+    Arah yang lolos filter 1h & 15m (harus searah), atau None.
+    Bullish & bearish tidak bisa lolos bersamaan.
+    """
+    if directions is None:
+        directions = SIGNAL_DIRECTIONS
+    if trend_1h == 0 or trend_1h != struct_15m:
+        return None
+    direction = LONG if trend_1h > 0 else SHORT
+    return direction if direction in directions else None
+
+
+def direction_conditions(direction: str) -> Dict[str, Any]:
+    """
+    Bagian conditions untuk filter 1h/15m yang sudah lolos (per arah).
+    """
+    if direction == SHORT:
+        return {"direction": SHORT, "trend_1h_bearish": True, "struct_15m_bearish": True}
+    return {"direction": LONG, "trend_1h_bullish": True, "struct_15m_bullish": True}
+
+
+def analyse_ipc_frames(
+    symbol: str,
+    df_1h: pd.DataFrame,
+    df_15m: pd.DataFrame,
+    df_5m: pd.DataFrame,
+    trend_1h: int | None = None,
+    struct_15m: int | None = None,
+    directions: Tuple[str, ...] | None = None,
+    swings_15m: SwingTracker | None = None,
+    swings_5m: SwingTracker | None = None,
+) -> Tuple[Dict[str, Any] | None, Dict[str, float] | None]:
+    """
+    Analisa IPC dari data yang sudah ada (tanpa fetch), LONG & SHORT dalam
+    1 pass: EMA 1h/15m dan statistik 5m dihitung sekali untuk kedua arah.
+
+    trend_1h / struct_15m = arah (+1 / -1 / 0) boleh diisi dari cache
+    (mis. worker pool / bar engine); kalau None dihitung dari DataFrame.
+    swings_15m / swings_5m = cache SwingTracker per symbol (None → baru).
+    conditions["direction"] = "long" / "short".
+    """
+    if directions is None:
+        directions = SIGNAL_DIRECTIONS
+
+    if len(df_1h) < 200 or len(df_15m) < 60 or len(df_5m) < MIN_5M_BARS:
+        # data kurang, skip
+        return None, None
+
+    # --- WAJIB (1h & 15m) ---
+    if trend_1h is None:
+        trend_1h = detect_trend_1h_direction(df_1h)
+    if struct_15m is None:
+        struct_15m = detect_struct_15m_direction(df_15m, swings_15m)
+
+    direction = filter_direction(trend_1h, struct_15m, directions)
+    if direction is None:
+        return None, None
+
+    # --- 5m (WAJIB + OPSIONAL) dari fitur bersama ---
+    features = Features5m.from_frame(df_5m, swings_5m)
+    c5 = conditions_5m(features, direction)
+
+    # Jika syarat WAJIB tidak terpenuhi -> NO SIGNAL
+    if not (c5["pullback_healthy"] and c5["anti_fake_break"]):
+        return None, None
+
+    conditions = direction_conditions(direction)
+    conditions.update(c5)
+    # volume quote candle trigger (USDT), untuk ranking sinyal per bar
+    conditions["volume_usdt"] = features.v * features.c
+
+    levels = levels_from_range(features.lv_high, features.lv_low, features.c, direction)
+
+    return conditions, levels
+
+
+def diagnose_ipc_frames(
+    df_1h: pd.DataFrame,
+    df_15m: pd.DataFrame,
+    df_5m: pd.DataFrame,
+    directions: Tuple[str, ...] | None = None,
+) -> Dict[str, Any]:
+    """
+    Seperti analyse_ipc_frames, tapi selalu mengembalikan checklist lengkap
+    (untuk /scan admin), termasuk kalau bukan sinyal.
+    Return {"conditions", "levels", "signal": bool, "reason": str}.
+    Arah yang dilaporkan: arah yang lolos filter, kalau tidak ada → arah
+    trend 1h (atau struktur 15m) yang diizinkan, default LONG.
+    """
+    if directions is None:
+        directions = SIGNAL_DIRECTIONS
+
+    if len(df_1h) < 200 or len(df_15m) < 60 or len(df_5m) < MIN_5M_BARS:
+        return {
+            "conditions": None,
+            "levels": None,
+            "signal": False,
+            "reason": f"data kurang (1h={len(df_1h)}, 15m={len(df_15m)}, 5m={len(df_5m)})",
+        }
+
+    trend_1h = detect_trend_1h_direction(df_1h)
+    struct_15m = detect_struct_15m_direction(df_15m)
+    direction = filter_direction(trend_1h, struct_15m, directions)
+    if direction is None:
+        lean = trend_1h or struct_15m
+        direction = SHORT if lean < 0 else LONG
+        if direction not in directions:
+            direction = directions[0] if directions else LONG
+
+    sign = 1 if direction == LONG else -1
+    features = Features5m.from_frame(df_5m)
+    c5 = conditions_5m(features, direction)
+    suffix = "bullish" if direction == LONG else "bearish"
+    conditions: Dict[str, Any] = {
+        "direction": direction,
+        f"trend_1h_{suffix}": trend_1h == sign,
+        f"struct_15m_{suffix}": struct_15m == sign,
+    }
+    conditions.update(c5)
+
+    missing = [k for k in (f"trend_1h_{suffix}", f"struct_15m_{suffix}", "pullback_healthy", "anti_fake_break")
+               if not conditions[k]]
+    return {
+        "conditions": conditions,
+        "levels": levels_from_range(features.lv_high, features.lv_low, features.c, direction),
+        "signal": not missing,
+        "reason": "semua syarat wajib terpenuhi" if not missing else "gagal: " + ", ".join(missing),
+    }
+
+
+def analyse_symbol_ipc(symbol: str, fetch=None) -> Tuple[Dict[str, Any] | None, Dict[str, float] | None]:
     """
     Analisa 1 symbol untuk model IPC:
     - Ambil data 1H, 15m, 5m
@@ -388,42 +747,9 @@ def analyse_symbol_ipc(symbol: str) -> Tuple[Dict[str, Any] | None, Dict[str, fl
     - Jika semua WAJIB = True -> build levels & return
     """
     try:
-        df_1h = get_klines(symbol, "1h", LIMIT_KLINES)
-        df_15m = get_klines(symbol, "15m", LIMIT_KLINES)
-        df_5m = get_klines(symbol, "5m", LIMIT_KLINES)
+        frames = fetch_ipc_frames(symbol, fetch)
     except Exception as e:
         print(f"[{symbol}] ERROR fetching data (IPC):", e)
         return None, None
 
-    if len(df_1h) < 200 or len(df_15m) < 60 or len(df_5m) < 60:
-        # data kurang, skip
-        return None, None
-
-    # --- WAJIB ---
-    trend_1h = detect_trend_1h_bullish(df_1h)
-    struct_15m = detect_struct_15m_bullish(df_15m)
-    pullback_ok = detect_pullback_healthy_5m(df_5m)
-    anti_fake_ok = detect_anti_fake_break_5m(df_5m)
-
-    # Jika syarat WAJIB tidak terpenuhi -> NO SIGNAL
-    if not (trend_1h and struct_15m and pullback_ok and anti_fake_ok):
-        return None, None
-
-    # --- OPSIONAL ---
-    impulse_ok = detect_impulse_strong_5m(df_5m)
-    cont_ok = detect_continuation_break_5m(df_5m)
-    vol_ok = detect_volume_strong_5m(df_5m)
-
-    conditions = {
-        "trend_1h_bullish": trend_1h,
-        "struct_15m_bullish": struct_15m,
-        "pullback_healthy": pullback_ok,
-        "anti_fake_break": anti_fake_ok,
-        "impulse_strong": impulse_ok,
-        "continuation_break": cont_ok,
-        "volume_strong": vol_ok,
-    }
-
-    levels = build_ipc_levels_from_5m(df_5m, window=30)
-
-    return conditions, levels
+    return analyse_ipc_frames(symbol, frames["1h"], frames["15m"], frames["5m"])
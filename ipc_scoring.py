@@ -1,10 +1,14 @@
+# Urutan tier (dipakai filter & ranking sinyal)
+TIER_ORDER = {"NONE": 0, "B": 1, "A": 2, "A+": 3}
+
+
 def score_ipc_signal(c: dict) -> int:
     """
     Skoring IPC (0 - 130)
 
     4 WAJIB (harus True):
-    - trend_1h_bullish
-    - struct_15m_bullish
+    - trend_1h_bullish   (SHORT: trend_1h_bearish)
+    - struct_15m_bullish (SHORT: struct_15m_bearish)
     - pullback_healthy
     - anti_fake_break
 
@@ -15,11 +19,12 @@ def score_ipc_signal(c: dict) -> int:
     """
 
     score = 0
+    short = c.get("direction") == "short"
 
     # ===== WAJIB (bobot besar) =====
-    if c.get("trend_1h_bullish"):
+    if c.get("trend_1h_bearish" if short else "trend_1h_bullish"):
         score += 30
-    if c.get("struct_15m_bullish"):
+    if c.get("struct_15m_bearish" if short else "struct_15m_bullish"):
         score += 30
     if c.get("pullback_healthy"):
         score += 30
@@ -60,5 +65,4 @@ def should_send_tier(tier: str, min_tier: str = "A") -> bool:
     Hanya kirim sinyal minimal Tier tertentu (default A).
     Urutan: NONE < B < A < A+
     """
-    order = {"NONE": 0, "B": 1, "A": 2, "A+": 3}
-    return order.get(tier, 0) >= order.get(min_tier, 2)
+    return TIER_ORDER.get(tier, 0) >= TIER_ORDER.get(min_tier, 2)
@@ -0,0 +1,273 @@
+# kernels.py
+#
+# Kernel statistik 5m (fused) untuk Features5m:
+# - semua statistik detector 5m (rata-rata body / range / volume, max / min
+#   window, rasio wick candle terakhir) dari STAT_BARS candle terakhir
+#   sekaligus, tidak lagi slice + reduce per detector
+# - numba terpasang (KERNEL_JIT=1) → loop 1 pass di-JIT, tanpa alokasi
+#   selain buffer body / range
+# - tanpa numba → NumPy: 1 slice ekor, body / range dihitung sekali, ufunc
+#   reduce langsung (tanpa wrapper .mean() / .max())
+# - kedua jalur identik bit-per-bit dengan detect_*_5m di ipc_logic:
+#   penjumlahan memakai urutan pairwise numpy (8 akumulator, < 128 elemen)
+#
+# Cek & benchmark:
+#   python kernels.py --rounds 20000
+
+from typing import Tuple
+
+import numpy as np
+
+from config import KERNEL_JIT
+
+try:
+    import numba
+except ImportError:  # opsional
+    numba = None
+
+# candle terakhir yang dibaca kernel (window terpanjang: pullback 40)
+STAT_BARS = 40
+
+# index hasil stats_5m()
+(
+    IMPULSE_AVG_BODY,
+    PB_HIGH,
+    PB_LOW,
+    AF_AVG_RANGE,
+    CONT_PREV_HIGH,
+    CONT_PREV_LOW,
+    CONT_AVG_BODY,
+    VOL_AVG,
+    WICK_UP,
+    WICK_DOWN,
+) = range(10)
+N_STATS = 10
+
+
+def wick_ratios(o: float, h: float, l: float, c: float) -> Tuple[float, float]:
+    """
+    (wick atas, wick bawah) / range candle; wick diukur dari close kalau
+    candle searah, dari open kalau berlawanan (konservatif).
+    """
+    rng = h - l
+    if rng <= 0:
+        return 0.0, 0.0
+    up = h - c if c >= o else h - o
+    down = c - l if c <= o else o - l
+    return up / rng, down / rng
+
+
+# ================== JALUR LOOP (NUMBA) ==================
+
+
+def _pairwise_sum(a, lo, hi):
+    """
+    sum(a[lo:hi]) dengan urutan sama persis np.add.reduce (n <= 128).
+    """
+    n = hi - lo
+    if n < 8:
+        res = 0.0
+        for i in range(lo, hi):
+            res += a[i]
+        return res
+    r0, r1, r2, r3 = a[lo], a[lo + 1], a[lo + 2], a[lo + 3]
+    r4, r5, r6, r7 = a[lo + 4], a[lo + 5], a[lo + 6], a[lo + 7]
+    i = lo + 8
+    stop = hi - n % 8
+    while i < stop:
+        r0 += a[i]
+        r1 += a[i + 1]
+        r2 += a[i + 2]
+        r3 += a[i + 3]
+        r4 += a[i + 4]
+        r5 += a[i + 5]
+        r6 += a[i + 6]
+        r7 += a[i + 7]
+        i += 8
+    res = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+    while i < hi:
+        res += a[i]
+        i += 1
+    return res
+
+
+def _stats_loop(opens, highs, lows, closes, vols):
+    """
+    1 pass atas STAT_BARS candle terakhir (index relatif ekor: 0..39, candle
+    terakhir = 39). Window sama dengan Features5m / detect_*_5m.
+    """
+    n = len(opens)
+    base = n - STAT_BARS
+    bodies = np.empty(STAT_BARS)
+    ranges = np.empty(STAT_BARS)
+    pb_high = -np.inf
+    pb_low = np.inf
+    cont_high = -np.inf
+    cont_low = np.inf
+    for k in range(STAT_BARS):
+        j = base + k
+        h = highs[j]
+        lo = lows[j]
+        bodies[k] = abs(closes[j] - opens[j])
+        ranges[k] = h - lo
+        # pullback: 40 candle terakhir
+        if h > pb_high:
+            pb_high = h
+        if lo < pb_low:
+            pb_low = lo
+        # continuation: candle [-17:-2]
+        if STAT_BARS - 17 <= k < STAT_BARS - 2:
+            if h > cont_high:
+                cont_high = h
+            if lo < cont_low:
+                cont_low = lo
+
+    out = np.empty(N_STATS)
+    out[IMPULSE_AVG_BODY] = _pairwise_sum(bodies, STAT_BARS - 22, STAT_BARS - 2) / 20
+    out[PB_HIGH] = pb_high
+    out[PB_LOW] = pb_low
+    out[AF_AVG_RANGE] = _pairwise_sum(ranges, STAT_BARS - 33, STAT_BARS - 1) / 32
+    out[CONT_PREV_HIGH] = cont_high
+    out[CONT_PREV_LOW] = cont_low
+    out[CONT_AVG_BODY] = _pairwise_sum(bodies, STAT_BARS - 17, STAT_BARS - 2) / 15
+    out[VOL_AVG] = _pairwise_sum(vols, n - 32, n - 2) / 30
+
+    o, h, lo, c = opens[n - 1], highs[n - 1], lows[n - 1], closes[n - 1]
+    rng = h - lo
+    if rng > 0:
+        out[WICK_UP] = (h - c if c >= o else h - o) / rng
+        out[WICK_DOWN] = (c - lo if c <= o else o - lo) / rng
+    else:
+        out[WICK_UP] = 0.0
+        out[WICK_DOWN] = 0.0
+    return out
+
+
+# ================== JALUR NUMPY ==================
+
+
+def _stats_numpy(opens, highs, lows, closes, vols):
+    """
+    Fallback tanpa numba: reduce NumPy di atas 1 slice ekor. Ufunc reduce
+    dipanggil langsung (.mean() / .max() lewat wrapper Python yang lebih
+    mahal dari reduce-nya); add.reduce / n identik bit-per-bit dengan .mean().
+    """
+    o = opens[-STAT_BARS:]
+    h = highs[-STAT_BARS:]
+    lo = lows[-STAT_BARS:]
+    bodies = np.abs(closes[-STAT_BARS:] - o)
+    ranges = h - lo
+
+    add = np.add.reduce
+    vmax = np.maximum.reduce
+    vmin = np.minimum.reduce
+    wick_up, wick_down = wick_ratios(opens[-1], highs[-1], lows[-1], closes[-1])
+    return np.array((
+        add(bodies[-22:-2]) / 20,
+        vmax(h),
+        vmin(lo),
+        add(ranges[-33:-1]) / 32,
+        vmax(h[-17:-2]),
+        vmin(lo[-17:-2]),
+        add(bodies[-17:-2]) / 15,
+        add(vols[-32:-2]) / 30,
+        wick_up,
+        wick_down,
+    ))
+
+
+# stats_5m(opens, highs, lows, closes, vols) → array N_STATS (index konstanta
+# di atas), minimal STAT_BARS candle
+JIT = numba is not None and KERNEL_JIT
+if JIT:
+    _pairwise_sum = numba.njit(cache=True, nogil=True)(_pairwise_sum)
+    stats_5m = numba.njit(cache=True, nogil=True)(_stats_loop)
+else:
+    stats_5m = _stats_numpy
+
+
+# ================== CEK & BENCHMARK ==================
+
+
+def run_check(rounds: int = 20000) -> None:
+    """
+    Bandingkan stats_5m (jalur aktif) + loop Python murni dengan detector
+    asli detect_*_5m, lalu benchmark vs slice + reduce per detector.
+    """
+    import time
+
+    import pandas as pd
+
+    from ipc_logic import (
+        detect_anti_fake_break_5m,
+        detect_continuation_break_5m,
+        detect_impulse_strong_5m,
+        detect_pullback_healthy_5m,
+        detect_volume_strong_5m,
+    )
+
+    rng = np.random.default_rng(11)
+    frames = []
+    for _ in range(200):
+        n = int(rng.integers(60, 300))
+        close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+        opens = close + rng.normal(0, 0.3, n)
+        highs = np.maximum(opens, close) + np.abs(rng.normal(0, 0.3, n))
+        lows = np.minimum(opens, close) - np.abs(rng.normal(0, 0.3, n))
+        vols = np.abs(rng.normal(1000, 400, n))
+        frames.append((opens, highs, lows, close, vols))
+
+    mismatch = 0
+    for opens, highs, lows, closes, vols in frames:
+        active = stats_5m(opens, highs, lows, closes, vols)
+        if not np.array_equal(active, _stats_loop(opens, highs, lows, closes, vols)):
+            mismatch += 1
+        if not np.array_equal(active, _stats_numpy(opens, highs, lows, closes, vols)):
+            mismatch += 1
+        # detector asli (LONG) dari statistik kernel
+        df = pd.DataFrame({"open": opens, "high": highs, "low": lows, "close": closes, "volume": vols})
+        c, o, h, lo, v = closes[-1], opens[-1], highs[-1], lows[-1], vols[-1]
+        full = active[PB_HIGH] - active[PB_LOW]
+        pos = (c - active[PB_LOW]) / full if full > 0 else -1
+        expect = (
+            detect_pullback_healthy_5m(df) == (full > 0 and 0.3 <= pos <= 0.6 and c > active[PB_LOW]),
+            detect_anti_fake_break_5m(df)
+            == (h - lo <= active[AF_AVG_RANGE] * 3.0 and active[WICK_UP] <= 0.6 and active[AF_AVG_RANGE] > 0),
+            detect_continuation_break_5m(df)
+            == (c > active[CONT_PREV_HIGH] and abs(c - o) >= active[CONT_AVG_BODY] * 0.8 and active[CONT_AVG_BODY] > 0),
+            detect_volume_strong_5m(df) == (active[VOL_AVG] > 0 and v > active[VOL_AVG] * 1.5),
+            detect_impulse_strong_5m(df)
+            == any(
+                cl > op and abs(cl - op) > active[IMPULSE_AVG_BODY] * 1.5
+                for op, cl in ((opens[-2], closes[-2]), (o, c))
+            ),
+        )
+        mismatch += expect.count(False)
+    print(f"jalur aktif        : {'numba JIT' if JIT else 'NumPy'}")
+    print(f"selisih vs detector: {mismatch} ({len(frames)} frame)")
+
+    opens, highs, lows, closes, vols = frames[0]
+    stats_5m(opens, highs, lows, closes, vols)  # kompilasi JIT di luar timing
+
+    def per_detector():
+        bodies = np.abs(closes - opens)
+        return (
+            bodies[-22:-2].mean(), highs[-40:].max(), lows[-40:].min(),
+            (highs[-33:-1] - lows[-33:-1]).mean(), highs[-17:-2].max(), lows[-17:-2].min(),
+            bodies[-17:-2].mean(), vols[-32:-2].mean(),
+        )
+
+    for label, fn in (("slice per detector", per_detector), ("stats_5m", lambda: stats_5m(opens, highs, lows, closes, vols))):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        print(f"{label:<19}: {(time.perf_counter() - start) / rounds * 1e6:7.2f} us / analisa")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cek & benchmark kernel statistik 5m")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    run_check(args.rounds)
@@ -0,0 +1,173 @@
+# lifecycle.py
+#
+# Shutdown rapi (SIGTERM / SIGINT / Ctrl-C / pkill):
+# 1. Stop input: task scan (WS) & telegram dibatalkan, tidak ada analisa baru
+# 2. Tunggu analisa yang sedang jalan (pool / stream scanner) selesai
+# 3. Dispatch sinyal yang masih di batch dispatcher
+# 4. Tunggu antrian delivery Telegram kosong
+# 5. Flush storage (outcome tracker, memori sinyal, subscriber, capture) & simpan snapshot state
+#    (replay capture: state live tidak ditulis)
+# 6. Matikan worker pool & tutup koneksi HTTP keep-alive
+# DEPLOY_ROLE=scanner: dispatcher/delivery = link ke coordinator, langkah 5 dilewati.
+# Langkah 2-4 dibatasi SHUTDOWN_TIMEOUT_SEC total.
+
+import asyncio
+import signal
+import time
+from typing import Iterable, List
+
+import http_client
+from config import SHUTDOWN_TIMEOUT_SEC, STORAGE_FLUSH_SEC
+from snapshot import save_snapshot
+
+
+class Lifecycle:
+    def __init__(self, state, timeout_sec: float = SHUTDOWN_TIMEOUT_SEC):
+        self.state = state
+        self.timeout_sec = timeout_sec
+        self.stop_event = asyncio.Event()
+        self.reason = ""
+
+    # ---------- sinyal OS ----------
+
+    def install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop, sig.name)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl-C tetap lewat KeyboardInterrupt
+
+    def request_stop(self, reason: str = "") -> None:
+        if not self.stop_event.is_set():
+            self.reason = reason
+            print(f"Shutdown diminta ({reason or 'internal'})...")
+            self.stop_event.set()
+
+    # ---------- jalan & shutdown ----------
+
+    async def run(self, input_tasks: Iterable[asyncio.Task], service_tasks: Iterable[asyncio.Task]) -> None:
+        """
+        Tunggu sampai stop diminta atau salah satu task berhenti, lalu shutdown.
+        input_tasks  : sumber pekerjaan baru (scan WS, telegram) → dibatalkan dulu
+        service_tasks: dispatcher, outcome, snapshot → dibatalkan setelah drain
+        """
+        input_tasks = list(input_tasks)
+        service_tasks = list(service_tasks)
+        stop_wait = asyncio.create_task(self.stop_event.wait())
+        done, _ = await asyncio.wait(
+            input_tasks + service_tasks + [stop_wait], return_when=asyncio.FIRST_COMPLETED
+        )
+        for t in done:
+            if t is not stop_wait and not t.cancelled() and t.exception() is not None:
+                print("Task berhenti dengan error:", t.exception())
+        stop_wait.cancel()
+        await self.shutdown(input_tasks, service_tasks)
+
+    async def shutdown(self, input_tasks: List[asyncio.Task], service_tasks: List[asyncio.Task]) -> None:
+        state = self.state
+        state.shutting_down = True
+        deadline = time.monotonic() + self.timeout_sec
+
+        await _cancel(input_tasks)
+        if state.prewarm_task is not None:
+            await _cancel([state.prewarm_task])
+
+        # analisa in-flight → hasilnya masih masuk dispatcher
+        inflight = set(state.analysis_tasks)
+        for scanner in state.stream_scanners.values():
+            if scanner is not None:
+                inflight |= scanner.in_flight()
+        if inflight:
+            print(f"Menunggu {len(inflight)} analisa selesai...")
+            _, pending = await asyncio.wait(inflight, timeout=_left(deadline))
+            if pending:
+                print(f"{len(pending)} analisa dibatalkan (timeout).")
+                await _cancel(pending)
+
+        await _cancel(service_tasks)
+        try:
+            n = state.dispatcher.flush()
+            if n:
+                print(f"Dispatch {n} sinyal tersisa.")
+        except Exception as e:
+            print("Error flush dispatcher:", e)
+
+        pending_msgs = state.delivery.pending()
+        if pending_msgs:
+            print(f"Menunggu {pending_msgs} pesan Telegram terkirim...")
+        try:
+            await asyncio.wait_for(state.delivery.join(), timeout=_left(deadline))
+        except asyncio.TimeoutError:
+            print(f"{state.delivery.pending()} pesan tidak terkirim (timeout).")
+        await state.delivery.stop()
+
+        self.flush_storage()
+        state.cooldowns.close()
+
+        if state.analysis_pool is not None:
+            state.analysis_pool.shutdown()
+        if getattr(state, "on_demand", None) is not None:
+            state.on_demand.shutdown()
+        http_client.close_all()
+        print("Shutdown selesai.")
+
+    def flush_storage(self) -> None:
+        state = self.state
+        if state.link is not None:
+            return  # scanner: storage & snapshot milik coordinator
+        if state.outcomes is not None:
+            try:
+                state.outcomes.flush()
+            except Exception as e:
+                print("Gagal simpan outcome tracker:", e)
+        try:
+            state.cooldowns.flush()
+        except Exception as e:
+            print("Gagal simpan memori sinyal:", e)
+        try:
+            state.subscribers.flush()
+        except Exception as e:
+            print("Gagal simpan subscriber:", e)
+        capture = getattr(state, "capture", None)
+        if capture is not None:
+            try:
+                capture.close()
+            except Exception as e:
+                print("Gagal tutup capture:", e)
+            if capture.replaying:
+                return  # replay: snapshot berisi state rekaman, bukan state live
+        try:
+            save_snapshot(state)
+            print("Snapshot state tersimpan.")
+        except Exception as e:
+            print("Gagal simpan snapshot:", e)
+
+
+async def storage_flush_loop(state, interval_sec: float = STORAGE_FLUSH_SEC) -> None:
+    """
+    Tulis perubahan storage yang ditandai dirty (memori sinyal, subscriber)
+    tiap interval_sec, di thread; flush terakhir lewat Lifecycle.flush_storage.
+    """
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            await state.cooldowns.flush_async()
+        except Exception as e:
+            print("Gagal simpan memori sinyal:", e)
+        try:
+            await state.subscribers.flush_async()
+        except Exception as e:
+            print("Gagal simpan subscriber:", e)
+
+
+def _left(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+
+async def _cancel(tasks: Iterable[asyncio.Task]) -> None:
+    tasks = [t for t in tasks if not t.done()]
+    for t in tasks:
+        t.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
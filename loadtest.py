@@ -0,0 +1,288 @@
+# loadtest.py
+#
+# Load test bot lengkap (main.py tanpa diubah) terhadap fake Binance
+# (fake_exchange.py) + fake Telegram (fake_telegram.py):
+# - workdir sementara berisi data/subscribers.json sintetis (N user, 10% VIP)
+# - main.py dijalankan sebagai subprocess dengan env yang diarahkan ke server fake
+# - admin menekan tombol Start Scan lewat getUpdates fake
+# - latency end-to-end per bar: frame close dikirim fake exchange → pesan
+#   sinyal pertama / terakhir diterima fake Telegram
+#
+# - --record FILE: sesi fake direkam (capture.py); --replay FILE: bot diputar
+#   dari capture (sesi live / fake) tanpa exchange, berhenti sendiri saat habis
+#   → bandingkan throughput antar versi dengan input yang sama persis
+# - --scanners N: main.py jalan sebagai 1 coordinator + N proses scanner
+#   (cluster.py, Unix socket di workdir); jumlah sinyal bisa dibandingkan
+#   dengan mode single pada seed fake yang sama
+#
+# Contoh:
+#   python loadtest.py --symbols 500 --subscribers 10000 --bars 3
+#   python loadtest.py --symbols 1000 --subscribers 10000 --bar-period 60 --fail-ratio 0.01
+#   python loadtest.py --symbols 500 --bars 3 --record /tmp/burst.jsonl.gz
+#   python loadtest.py --replay /tmp/burst.jsonl.gz --speed 0
+#   python loadtest.py --symbols 500 --bars 3 --scanners 3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from fake_exchange import FakeExchangeServer
+from fake_telegram import FakeTelegramServer
+
+ADMIN_ID = 1
+TOKEN = "LOADTEST"
+MAIN_PY = Path(__file__).resolve().parent / "main.py"
+
+
+def write_subscribers(workdir: Path, n: int, vip_ratio: float = 0.1) -> None:
+    vip_exp = (datetime.now(timezone.utc).date() + timedelta(days=30)).isoformat()
+    n_vip = int(n * vip_ratio)
+    subs = {
+        str(100_000 + i): {
+            "active": True,
+            "signals_today": 0,
+            "last_signal_date": "",
+            "vip_expiry": vip_exp if i < n_vip else None,
+            "pause_until": None,
+        }
+        for i in range(n)
+    }
+    data = workdir / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    (data / "subscribers.json").write_text(json.dumps(subs), encoding="utf-8")
+    # cooldown pendek: bar fake dipercepat, pair yang sama boleh sinyal lagi
+    (data / "cooldown.json").write_text(json.dumps({"cooldown_seconds": 1}), encoding="utf-8")
+
+
+def bot_env(exchange: FakeExchangeServer | None, telegram: FakeTelegramServer, args) -> Dict[str, str]:
+    env = dict(os.environ)
+    if exchange is not None:
+        env.update({
+            "BINANCE_REST_URL": exchange.rest_url,
+            "BINANCE_STREAM_URL": exchange.stream_url,
+        })
+    if args.record:
+        env.update({"CAPTURE_MODE": "record", "CAPTURE_FILE": str(Path(args.record).resolve())})
+    if args.replay:
+        env.update({
+            "CAPTURE_MODE": "replay",
+            "CAPTURE_FILE": str(Path(args.replay).resolve()),
+            "REPLAY_SPEED": str(args.speed),
+            # drain antrian Telegram sampai habis sebelum proses keluar
+            "SHUTDOWN_TIMEOUT_SEC": "600",
+        })
+    env.update({
+        "TELEGRAM_TOKEN": TOKEN,
+        "TELEGRAM_ADMIN_ID": str(ADMIN_ID),
+        "TELEGRAM_API_URL": telegram.api_url,
+        "MARKETS": "spot",
+        "MARKET_DATA_MODE": args.mode,
+        "MIN_VOLUME_USDT": "0",
+        "MAX_USDT_PAIRS": str(args.symbols),
+        "MIN_TIER_TO_SEND": "B",
+        "DEDUPE_ENTRY_PCT": "0",
+        "DELIVERY_RATE_PER_SEC": str(args.rate),
+        "DELIVERY_WORKERS": str(args.delivery_workers),
+        "ANALYSIS_WORKERS": str(args.workers),
+        "SNAPSHOT_INTERVAL_SEC": "0",
+        "WATCHDOG_STALL_SEC": "600",
+        "PYTHONUNBUFFERED": "1",
+    })
+    return env
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def report(exchange: FakeExchangeServer, telegram: FakeTelegramServer, started: float) -> None:
+    """
+    Pesan ke subscriber (bukan admin) diatribusikan ke bar close terakhir
+    sebelum pesan diterima. Kalau fan-out > durasi bar, sisa antrian bar
+    sebelumnya ikut terhitung di bar berikutnya (delivery jadi bottleneck).
+    """
+    closes = sorted(ts for ts in exchange.close_log.values() if ts >= started)
+    per_bar: Dict[float, List[float]] = {}
+    for recv_ts, chat_id, _ in telegram.sent:
+        if chat_id == ADMIN_ID:
+            continue
+        prev = [c for c in closes if c <= recv_ts]
+        if prev:
+            per_bar.setdefault(prev[-1], []).append(recv_ts - prev[-1])
+
+    print("\n===== HASIL LOAD TEST =====")
+    print(f"bar close     : {len(closes)}")
+    print(f"pesan terkirim: {len(telegram.sent)} (admin {len(telegram.messages_to(ADMIN_ID))})")
+    print(f"ditolak 429   : {telegram.rejected}")
+    firsts, lasts = [], []
+    for close_ts in closes:
+        lat = per_bar.get(close_ts)
+        if not lat:
+            print(f"  bar @{time.strftime('%H:%M:%S', time.localtime(close_ts))}: tidak ada sinyal")
+            continue
+        firsts.append(min(lat))
+        lasts.append(max(lat))
+        print(
+            f"  bar @{time.strftime('%H:%M:%S', time.localtime(close_ts))}: {len(lat):6d} pesan, "
+            f"pertama {min(lat) * 1000:7.0f} ms, p50 {_pct(lat, 50) * 1000:7.0f} ms, "
+            f"terakhir {max(lat) * 1000:7.0f} ms"
+        )
+    if firsts:
+        print(f"latency pesan pertama : p50 {_pct(firsts, 50) * 1000:.0f} ms, max {max(firsts) * 1000:.0f} ms")
+        print(f"latency fan-out penuh : p50 {_pct(lasts, 50) * 1000:.0f} ms, max {max(lasts) * 1000:.0f} ms")
+
+
+def report_replay(telegram: FakeTelegramServer, started: float, finished: float, log_path: Path) -> None:
+    subs = [ts for ts, chat_id, _ in telegram.sent if chat_id != ADMIN_ID]
+    print("\n===== HASIL REPLAY =====")
+    for line in log_path.read_text(encoding="utf-8").splitlines():
+        if line.startswith(("Replay selesai", "Batch dispatch", "Batch bar")):
+            print(" ", line)
+    print(f"pesan subscriber : {len(subs)} (admin {len(telegram.messages_to(ADMIN_ID))})")
+    print(f"waktu total      : {finished - started:.1f} s (start bot → semua pesan terkirim)")
+    if subs:
+        span = max(subs) - min(subs)
+        print(f"throughput kirim : {len(subs) / max(span, 1e-9):,.0f} pesan/s")
+
+
+def run_replay(args) -> int:
+    """
+    Bot diputar dari file capture, bukan fake exchange; selesai saat capture
+    habis & antrian Telegram kosong.
+    """
+    telegram = FakeTelegramServer(token=TOKEN, fail_ratio=args.fail_ratio).start()
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="ipc_replay_"))
+    write_subscribers(workdir, args.subscribers)
+    log_path = workdir / "bot.log"
+    print(f"workdir: {workdir} (log bot: {log_path})")
+
+    started = time.time()
+    with log_path.open("w", encoding="utf-8") as log:
+        proc = subprocess.Popen(
+            [sys.executable, str(MAIN_PY)],
+            cwd=workdir,
+            env=bot_env(None, telegram, args),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        try:
+            proc.wait(timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            print(f"Replay belum selesai setelah {args.timeout:.0f} s, dihentikan.")
+            proc.terminate()
+            proc.wait(timeout=60)
+        finally:
+            telegram.stop()
+    report_replay(telegram, started, time.time(), log_path)
+    return 0
+
+
+def run(args) -> int:
+    if args.replay:
+        return run_replay(args)
+    symbols = [f"L{i:04d}USDT" for i in range(args.symbols)]
+    exchange = FakeExchangeServer(
+        market="spot",
+        symbols=symbols,
+        bar_period_sec=args.bar_period,
+        updates_per_bar=args.updates_per_bar,
+        trend_ratio=args.trend_ratio,
+    ).start()
+    telegram = FakeTelegramServer(token=TOKEN, fail_ratio=args.fail_ratio).start()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="ipc_loadtest_"))
+    write_subscribers(workdir, args.subscribers)
+    log_path = workdir / "bot.log"
+    print(f"workdir: {workdir} (log bot: {log_path})")
+
+    env = bot_env(exchange, telegram, args)
+    scanners: List[subprocess.Popen] = []
+    if args.scanners > 0:
+        env.update({"DEPLOY_ROLE": "coordinator", "COORDINATOR_ADDRESS": f"unix:{workdir / 'coordinator.sock'}"})
+    with log_path.open("w", encoding="utf-8") as log:
+        proc = subprocess.Popen(
+            [sys.executable, str(MAIN_PY)],
+            cwd=workdir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        for i in range(args.scanners):
+            scanner_log = (workdir / f"scanner-{i + 1}.log").open("w", encoding="utf-8")
+            scanners.append(subprocess.Popen(
+                [sys.executable, str(MAIN_PY)],
+                cwd=workdir,
+                env={**env, "DEPLOY_ROLE": "scanner", "SCANNER_NAME": f"s{i + 1}"},
+                stdout=scanner_log,
+                stderr=subprocess.STDOUT,
+            ))
+            scanner_log.close()
+        if scanners:
+            print(f"Mode cluster: 1 coordinator + {len(scanners)} scanner (log scanner-N.log).")
+        try:
+            # tunggu command loop polling, lalu admin start scan
+            deadline = time.time() + 60
+            while telegram.get_updates_calls < 2 and time.time() < deadline and proc.poll() is None:
+                time.sleep(0.2)
+            # cluster: tunggu semua scanner bergabung (shard final, tanpa rebalance di bar pertama)
+            joined = f"({len(scanners)} aktif)"
+            while scanners and joined not in log_path.read_text(encoding="utf-8") and time.time() < deadline:
+                time.sleep(0.2)
+            if proc.poll() is not None:
+                print("main.py berhenti sebelum siap, lihat log.")
+                return 1
+            # teks tombol keyboard admin ("/startscan" tertangkap cabang "/start")
+            telegram.push_update(ADMIN_ID, "▶️ Start Scan")
+            started = time.time()
+            print(f"Start Scan dikirim, jalan {args.bars} bar (@{args.bar_period:.0f} detik)...")
+
+            # +1 bar untuk backfill awal
+            end = started + (args.bars + 1) * args.bar_period
+            while time.time() < end and proc.poll() is None:
+                time.sleep(1)
+        finally:
+            # scanner dulu (batch bar terakhir masih diteruskan), lalu coordinator
+            for p in scanners + [proc]:
+                if p.poll() is None:
+                    p.terminate()
+                    try:
+                        p.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        p.kill()
+            exchange.stop()
+            telegram.stop()
+
+    report(exchange, telegram, started)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test bot IPC dengan fake Binance + fake Telegram")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--bars", type=int, default=3)
+    parser.add_argument("--bar-period", type=float, default=30.0, help="durasi nyata 1 bar 5m (detik)")
+    parser.add_argument("--updates-per-bar", type=int, default=10, help="update kline parsial per bar per symbol")
+    parser.add_argument("--trend-ratio", type=float, default=0.5, help="fraksi symbol yang bisa menghasilkan sinyal")
+    parser.add_argument("--fail-ratio", type=float, default=0.0, help="fraksi sendMessage yang dibalas 429")
+    parser.add_argument("--mode", choices=("rest", "stream"), default="stream")
+    parser.add_argument("--workers", type=int, default=0, help="ANALYSIS_WORKERS bot")
+    parser.add_argument("--scanners", type=int, default=0, help="jalan sebagai coordinator + N proses scanner")
+    parser.add_argument("--rate", type=float, default=0, help="DELIVERY_RATE_PER_SEC bot (0 = tanpa batas)")
+    parser.add_argument("--delivery-workers", type=int, default=16)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--record", default=None, help="rekam market data sesi fake ke file capture")
+    parser.add_argument("--replay", default=None, help="putar ulang file capture (tanpa fake exchange)")
+    parser.add_argument("--speed", type=float, default=0, help="kecepatan replay: 1 = real-time, 0 = secepatnya")
+    parser.add_argument("--timeout", type=float, default=1800, help="batas waktu replay (detik)")
+    sys.exit(run(parser.parse_args()))
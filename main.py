@@ -4,127 +4,412 @@ import asyncio
 import json
 import time
 from types import SimpleNamespace
-from typing import List, Dict
+from typing import TYPE_CHECKING, List
 
 import websockets
-import requests
 
 from config import (
     TELEGRAM_TOKEN,
     TELEGRAM_ADMIN_ID,
-    BINANCE_REST_URL,
-    BINANCE_STREAM_URL,
+    TELEGRAM_API_URL,
+    TELEGRAM_API_URL_DEFAULT,
+    MARKETS,
     MIN_VOLUME_USDT,
     MAX_USDT_PAIRS,
     MIN_TIER_TO_SEND,
     REFRESH_PAIR_INTERVAL_HOURS,
+    ANALYSIS_WORKERS,
+    MARKET_DATA_MODE,
+    STREAM_SOURCE,
+    BAR_TIMEFRAMES,
+    INTRABAR_ENABLED,
+    OUTCOME_TRACKING,
+    SNAPSHOT_INTERVAL_SEC,
+    STORAGE_FLUSH_SEC,
+    CAPTURE_MODE,
+    CAPTURE_FILE,
+    REPLAY_SPEED,
+    REPLAY_LIVE_TELEGRAM,
+    DEPLOY_ROLE,
 )
-
-# --- Import IPC logic dengan cara fleksibel ---
-import ipc_logic
-try:
-    analyse_symbol_ipc = ipc_logic.analyse_symbol
-except AttributeError:
-    # fallback kalau namanya analyse_symbol_ipc
-    analyse_symbol_ipc = ipc_logic.analyse_symbol_ipc
+from lifecycle import Lifecycle, storage_flush_loop
+from analysis_pool import AnalysisPool
+from exchange import ExchangeAdapter, SpotAdapter, make_adapter
+from bar_engine import BarEngine, SOURCE_BASE_TF, TF_MS
 
 from ipc_scoring import score_ipc_signal, tier_from_score, should_send_tier
-from signal_builder import build_ipc_signal_message
-from storage import (
-    load_subscribers_dict,
-    save_subscribers_dict,
-    ensure_user,
-    can_receive_signal,
-    mark_signal_sent,
-    bump_stats,
-    get_cooldown_seconds,
+from signal_builder import (
+    build_ipc_signal_message,
+    build_provisional_cancel_message,
+    load_signal_templates,
+    render_signal,
+    signal_values,
 )
-from telegram_bot import send_message, telegram_command_loop
+from telegram_bot import prepare_message, telegram_command_loop
+from delivery import DeliveryQueue
+from dispatcher import SignalDispatcher, PendingSignal
+from outcome_tracker import OutcomeTracker
+from cooldown import CooldownEngine
+from snapshot import load_snapshot, apply_snapshot, snapshot_loop
+from ondemand import OnDemandScanner
+from subscribers import SubscriberTable
+from watchdog import Supervisor
+from capture import CaptureWriter, CaptureReplay
+from rate_limit import PRIORITY_BACKFILL
+from startup import load_concurrently, prewarm_imports
+from cluster import Coordinator, CoordinatorLink
+
+# ipc_logic (+ kernels, swings) diimport saat analisa pertama, bukan saat start
+if TYPE_CHECKING:
+    from intrabar import IntrabarScanner
+    from stream_scanner import StreamScanner
+
+
+def analyse_symbol_ipc(symbol: str, get_klines):
+    """
+    Analisa IPC inline (REST), nama fungsi ipc_logic fleksibel.
+    """
+    import ipc_logic
+
+    analyse = getattr(ipc_logic, "analyse_symbol", None) or ipc_logic.analyse_symbol_ipc
+    return analyse(symbol, get_klines)
 
 
 # ================== PAIRS FILTER (VOLUME) ==================
 
-def get_usdt_pairs_with_volume(min_volume: float, max_pairs: int) -> List[str]:
+def get_usdt_pairs_with_volume(
+    min_volume: float, max_pairs: int, adapter: ExchangeAdapter | None = None
+) -> List[str]:
     """
     Ambil semua pair USDT yang statusnya TRADING,
     filter hanya yang 24h quoteVolume >= min_volume (USDT),
     lalu urutkan dari volume terbesar dan batasi max_pairs.
+    adapter None → spot.
     """
-    info_url = f"{BINANCE_REST_URL}/api/v3/exchangeInfo"
-    r = requests.get(info_url, timeout=10)
-    r.raise_for_status()
-    info = r.json()
-
-    usdt_symbols = []
-    for s in info["symbols"]:
-        if s["status"] == "TRADING" and s["quoteAsset"] == "USDT":
-            usdt_symbols.append(s["symbol"])
-
-    ticker_url = f"{BINANCE_REST_URL}/api/v3/ticker/24hr"
-    r2 = requests.get(ticker_url, timeout=10)
-    r2.raise_for_status()
-    tickers = r2.json()
-
-    vol_map: Dict[str, float] = {}
-    for t in tickers:
-        sym = t.get("symbol")
-        if sym in usdt_symbols:
-            try:
-                qv = float(t.get("quoteVolume", "0"))  # dalam USDT
-            except ValueError:
-                qv = 0.0
-            vol_map[sym] = qv
-
-    filtered = [s for s in usdt_symbols if vol_map.get(s, 0.0) >= min_volume]
-    filtered_sorted = sorted(filtered, key=lambda s: vol_map.get(s, 0.0), reverse=True)
-    if max_pairs > 0:
-        filtered_sorted = filtered_sorted[:max_pairs]
-
-    symbols_lower = [s.lower() for s in filtered_sorted]
-    print(f"Filter volume >= {min_volume:,.0f} USDT → {len(symbols_lower)} pair.")
+    adapter = adapter or SpotAdapter()
+    symbols_lower = adapter.list_universe(min_volume, max_pairs)
+    print(f"[{adapter.name}] Filter volume >= {min_volume:,.0f} USDT → {len(symbols_lower)} pair.")
     return symbols_lower
 
 
+# ================== PROSES SINYAL ==================
+
+def in_cooldown(state, symbol: str) -> bool:
+    return state.cooldowns.in_cooldown(symbol)
+
+
+def process_ipc_result(state, symbol: str, conditions, levels) -> None:
+    """
+    Hasil analisa IPC → scoring, filter tier/duplikat, lalu masuk dispatcher.
+    Provisional intrabar symbol ini dikonfirmasi kalau sinyal masuk
+    dispatcher (admin & VIP menerima sinyal final), selain itu dibatalkan.
+    """
+    submitted = submit_ipc_result(state, symbol, conditions, levels)
+    if submitted is not None:
+        settle_provisional(state, symbol, submitted)
+
+
+def submit_ipc_result(state, symbol: str, conditions, levels) -> bool | None:
+    """
+    True = masuk dispatcher, False = ditolak, None = diteruskan ke coordinator.
+    """
+    if not conditions or not levels:
+        return False
+
+    # cek ulang cooldown: analisa di pool bisa selesai setelah sinyal lain terkirim
+    if in_cooldown(state, symbol):
+        return False
+
+    # mode scanner: scoring, cooldown & dedupe terpusat di coordinator
+    if state.link is not None:
+        state.link.result(symbol, conditions, levels)
+        # coordinator memutuskan provisional dari hasil yang sama
+        state.provisional_recipients.pop(symbol, None)
+        return None
+
+    score = score_ipc_signal(conditions)
+    tier = tier_from_score(score)
+
+    if not should_send_tier(tier, state.min_tier):
+        return False
+
+    entry = levels.get("entry")
+    if entry is None:
+        return False
+
+    # anti-duplikat entry (default 0.1%)
+    if state.cooldowns.is_duplicate(symbol, entry):
+        return False
+
+    values = signal_values(symbol, levels, conditions, score, tier)
+    text = render_signal(values)
+
+    # UPDATE trackers
+    state.cooldowns.record(symbol, tier, entry)
+
+    # KIRIM: dikumpulkan per candle close → admin + subscribers (free/vip)
+    state.dispatcher.submit(
+        PendingSignal(
+            symbol=symbol,
+            text=text,
+            score=score,
+            tier=tier,
+            levels=levels,
+            values=values,
+            volume=float(conditions.get("volume_usdt", 0.0)),
+        )
+    )
+    return True
+
+
+def send_provisional_signal(state, symbol: str, conditions, levels) -> bool:
+    """
+    Sinyal intrabar (provisional) → admin + VIP saja, tidak memotong kuota free.
+    Return True kalau terkirim.
+    """
+    if not state.scanning_enabled or state.paused or in_cooldown(state, symbol):
+        return False
+    if state.link is not None:
+        # penerima dipilih coordinator; batal tetap diteruskan (tanpa penerima = no-op)
+        state.link.early(symbol, conditions, levels)
+        state.provisional_recipients[symbol] = []
+        return True
+
+    score = score_ipc_signal(conditions)
+    tier = tier_from_score(score)
+    if not should_send_tier(tier, state.min_tier):
+        return False
+
+    payload = prepare_message(build_ipc_signal_message(symbol, levels, conditions, score, tier, provisional=True))
+
+    recipients = []
+    if TELEGRAM_ADMIN_ID:
+        recipients.append(TELEGRAM_ADMIN_ID)
+    table = state.subscribers
+    mask = table.reachable_mask() & table.vip_mask() & table.accept_mask(symbol, tier)
+    if TELEGRAM_ADMIN_ID and TELEGRAM_ADMIN_ID in table:
+        mask[table.index[TELEGRAM_ADMIN_ID]] = False
+    recipients += table.chat_id[: len(table)][mask].tolist()
+
+    state.delivery.enqueue_many([(chat_id, payload) for chat_id in recipients])
+    state.provisional_recipients[symbol] = recipients
+
+    print(f"[{symbol}] Early signal (provisional): Score {score}, Tier {tier}")
+    return True
+
+
+def settle_provisional(state, symbol: str, confirmed: bool) -> None:
+    """
+    Akhiri provisional symbol ini (kalau ada): konfirmasi = cukup dilepas,
+    sinyal final menyusul lewat dispatcher; selain itu kirim info batal.
+    """
+    if symbol not in state.provisional_recipients:
+        return
+    if confirmed:
+        del state.provisional_recipients[symbol]
+    else:
+        cancel_provisional_signal(state, symbol)
+
+
+def cancel_provisional_signal(state, symbol: str) -> None:
+    recipients = state.provisional_recipients.pop(symbol, [])
+    if state.link is not None:
+        state.link.cancel(symbol)
+        return
+    payload = prepare_message(build_provisional_cancel_message(symbol))
+    state.delivery.enqueue_many([(chat_id, payload) for chat_id in recipients])
+    if recipients:
+        print(f"[{symbol}] Early signal dibatalkan saat candle close.")
+
+
+def notify_outcome(state, chat_ids: List[int], text: str) -> None:
+    """
+    Follow-up TP/SL ke penerima sinyal (lewat antrian delivery).
+    """
+    payload = prepare_message(text)
+    state.delivery.enqueue_many([(chat_id, payload) for chat_id in chat_ids])
+
+
+async def analyse_and_process_pooled(
+    state, pool: AnalysisPool, symbol: str, adapter: ExchangeAdapter | None = None
+) -> None:
+    """
+    Fetch REST di thread, analisa di worker process, lalu proses hasil di event loop.
+    """
+    from ipc_logic import fetch_ipc_frames, frame_to_array
+
+    adapter = adapter or SpotAdapter()
+    key = adapter.signal_key(symbol)
+    try:
+        frames = await asyncio.to_thread(fetch_ipc_frames, symbol, adapter.get_klines)
+    except Exception as e:
+        print(f"[{key}] ERROR fetching data (IPC):", e)
+        return
+
+    try:
+        arrays = {tf: frame_to_array(df) for tf, df in frames.items()}
+        conditions, levels = await pool.analyse(key, arrays)
+    except Exception as e:
+        print(f"[{key}] ERROR analisa pool:", e)
+        return
+
+    process_ipc_result(state, key, conditions, levels)
+
+
 # ================== SCAN LOOP (WEBOSCKET) ==================
 
-async def scan_loop(state) -> None:
+async def open_ws(state, ws_url: str, market: str):
+    """
+    Koneksi WS market; mode replay → frame dari file capture.
+    """
+    if state.capture is not None and state.capture.replaying:
+        return state.capture.connect(market)
+    return await websockets.connect(ws_url, ping_interval=20, ping_timeout=20)
+
+
+async def wait_pipeline_idle(state) -> None:
+    """
+    Replay speed 0: tunggu analisa in-flight & dispatch sinyal yang sudah
+    masuk selesai (batas antar bar di capture).
+    """
+    while True:
+        inflight = set(state.analysis_tasks)
+        for scanner in state.stream_scanners.values():
+            if scanner is not None:
+                inflight |= scanner.in_flight()
+        if not inflight:
+            break
+        await asyncio.wait(inflight)
+    await state.dispatcher.queue.join()
+
+
+async def hot_swap_ws(state, ws, ws_url: str, market: str):
+    """
+    Buka koneksi WS baru dulu, baru tutup yang lama → tidak ada jeda data.
+    Frame dobel di masa transisi aman (bar engine abaikan candle duplikat).
+    """
+    try:
+        new_ws = await open_ws(state, ws_url, market)
+    except Exception as e:
+        print(f"[{market}] Gagal buka WebSocket baru, tetap pakai koneksi lama:", e)
+        return ws
+    await ws.close()
+    print(f"[{market}] WebSocket diganti (hot swap) tanpa jeda data.")
+    return new_ws
+
+
+async def scan_loop(state, adapter: ExchangeAdapter) -> None:
     """
     - Refresh daftar pair (volume filter) periodik
     - Connect WebSocket kline_5m
     - Hanya saat state.scanning_enabled & not paused sinyal diproses
     - Analisa IPC & kirim sinyal ke admin + subscribers (free/vip)
+
+    1 scan_loop per market (adapter); pool analisa, cooldown & dispatcher
+    dipakai bersama lewat state. Key sinyal = adapter.signal_key(symbol).
+    DEPLOY_ROLE=scanner: symbol = shard dari coordinator (state.link).
     """
-    symbols: List[str] = []
-    last_pairs_refresh = 0.0
+    market = adapter.name
+    # universe disimpan di state (ikut snapshot warm restart)
+    universe = state.universe.setdefault(market, {"symbols": [], "refreshed": 0.0})
+    symbols: List[str] = list(universe["symbols"])
+    last_pairs_refresh = universe["refreshed"]
     refresh_interval = REFRESH_PAIR_INTERVAL_HOURS * 3600
-
-    last_signal_time: Dict[str, float] = {}
-    last_signal_entry: Dict[str, float] = {}
-    recent_signal_ts: List[float] = []
-
-    HEARTBEAT_TIMEOUT_SEC = 120
-    last_tick_time = time.time()
-    heartbeat_warned = False
+    link: CoordinatorLink | None = state.link
+    shard_version = 0
+
+    # Mode multi-core (ANALYSIS_WORKERS > 0) → pool dibuat di main()
+    pool: AnalysisPool | None = state.analysis_pool
+
+    # Mode stream: candle dibangun lokal dari WS, analisa per timeframe close
+    scanner: StreamScanner | None = None
+    stream_name = "kline_5m"
+    if MARKET_DATA_MODE == "stream":
+        from stream_scanner import StreamScanner
+
+        stream_name = STREAM_SOURCE
+        engine = BarEngine(
+            base_tf=SOURCE_BASE_TF[STREAM_SOURCE],
+            timeframes=set(BAR_TIMEFRAMES) | {"5m", "15m", "1h"},
+        )
+        scanner = StreamScanner(
+            engine,
+            on_result=lambda sym, c, lv: process_ipc_result(state, sym, c, lv),
+            should_analyse=lambda sym: (
+                state.scanning_enabled and not state.paused and not in_cooldown(state, sym)
+            ),
+            pool=pool,
+            # backfill prioritas terendah di governor weight (rate_limit.py)
+            fetch_klines=lambda sym, tf, limit: adapter.get_klines(sym, tf, limit, priority=PRIORITY_BACKFILL),
+            signal_key=adapter.signal_key,
+            # seleksi per bar: dispatcher menunggu batch analisa bar ini selesai
+            on_batch_start=state.dispatcher.hold,
+            on_batch_end=state.dispatcher.release,
+        )
+        if state.capture is not None and state.capture.replaying:
+            # candle forming dari REST terekam dinilai dengan jam rekaman
+            scanner.clock = lambda: state.capture.clock
+        print(f"[{market}] Market data mode: STREAM ({STREAM_SOURCE}) → {', '.join(engine.timeframes)}")
+        restored = state.snapshot_candles.pop(market, None)
+        if restored:
+            scanner.restore_state(restored, state.snapshot_flags.pop(market, {}))
+    state.stream_scanners[market] = scanner
+
+    # Early-signal intrabar (hanya dari stream kline_5m yang kirim update parsial)
+    intrabar: IntrabarScanner | None = None
+    if INTRABAR_ENABLED:
+        if scanner is not None and STREAM_SOURCE == "kline_5m":
+            from intrabar import IntrabarScanner
+
+            intrabar = IntrabarScanner(
+                scanner,
+                on_provisional=lambda sym, c, lv: send_provisional_signal(state, adapter.signal_key(sym), c, lv),
+                on_cancel=lambda sym: cancel_provisional_signal(state, adapter.signal_key(sym)),
+            )
+            print("Intrabar early-signal AKTIF.")
+        else:
+            print("INTRABAR_ENABLED butuh MARKET_DATA_MODE=stream & STREAM_SOURCE=kline_5m → dilewati.")
+    last_trade_flush = 0.0
+
+    # detak koneksi & candle per symbol, dipantau Supervisor (watchdog.py)
+    health = state.watchdog.shard(market, TF_MS[SOURCE_BASE_TF[stream_name]] / 1000)
+    # rekam frame WS mentah (CAPTURE_MODE=record)
+    recorder = state.capture if isinstance(state.capture, CaptureWriter) else None
 
     while True:
         try:
             now = time.time()
-            if (
+            if link is not None:
+                # mode scanner: universe milik coordinator, cukup ambil shard
+                shard_version, symbols = link.shard(market)
+                if not symbols:
+                    await asyncio.sleep(1)
+                    continue
+            elif (
                 not symbols
                 or (now - last_pairs_refresh) > refresh_interval
-                or getattr(state, "request_hard_restart", False)
+                or (state.request_hard_restart and market not in state.hard_restart_done)
             ):
-                print("Refresh daftar pair USDT berdasarkan volume...")
+                print(f"[{market}] Refresh daftar pair USDT berdasarkan volume...")
                 try:
-                    symbols = get_usdt_pairs_with_volume(MIN_VOLUME_USDT, MAX_USDT_PAIRS)
+                    symbols = await asyncio.to_thread(
+                        get_usdt_pairs_with_volume, MIN_VOLUME_USDT, MAX_USDT_PAIRS, adapter
+                    )
                     last_pairs_refresh = time.time()
-                    state.request_hard_restart = False
-                    print(f"Scan {len(symbols)} pair:", ", ".join(s.upper() for s in symbols))
+                    universe["symbols"] = list(symbols)
+                    universe["refreshed"] = last_pairs_refresh
+                    if state.request_hard_restart:
+                        state.hard_restart_done.add(market)
+                        if state.hard_restart_done >= set(state.markets):
+                            state.request_hard_restart = False
+                            state.hard_restart_done.clear()
+                    print(f"[{market}] Scan {len(symbols)} pair:", ", ".join(s.upper() for s in symbols))
 
                     if TELEGRAM_ADMIN_ID:
-                        send_message(
+                        # lewat antrian delivery: HTTP Telegram tidak menahan loop WS
+                        state.delivery.enqueue(
                             TELEGRAM_ADMIN_ID,
-                            f"🔄 Pair list diperbarui.\nTotal pair: *{len(symbols)}* (volume >= {MIN_VOLUME_USDT:,.0f} USDT).",
+                            f"🔄 Pair list *{market}* diperbarui.\nTotal pair: *{len(symbols)}* (volume >= {MIN_VOLUME_USDT:,.0f} USDT).",
                         )
                 except Exception as e:
                     print("Gagal refresh pair:", e)
@@ -141,60 +426,99 @@ async def scan_loop(state) -> None:
                 await asyncio.sleep(2)
                 continue
 
-            streams = "/".join([f"{s}@kline_5m" for s in symbols])
-            ws_url = f"{BINANCE_STREAM_URL}?streams={streams}"
+            # Mode stream: backfill symbol baru / yang bolong sebelum connect
+            if scanner is not None:
+                await scanner.sync_universe(symbols)
+            if intrabar is not None:
+                intrabar.retain(symbols)
+            if pool is not None:
+                pool.retain([adapter.signal_key(s) for s in symbols], adapter.key_suffix)
+            health.retain(symbols)
 
-            print("Menghubungkan ke WebSocket...")
-            async with websockets.connect(ws_url, ping_interval=20, ping_timeout=20) as ws:
-                print("WebSocket terhubung.")
+            ws_url = adapter.stream_url(symbols, stream_name)
+
+            print(f"[{market}] Menghubungkan ke WebSocket...")
+            ws = await open_ws(state, ws_url, market)
+            health.attach(ws, time.time())
+            try:
+                print(f"[{market}] WebSocket terhubung.")
                 if state.scanning_enabled and not state.paused:
                     print("Scan AKTIF → memantau sinyal IPC.")
                 else:
                     print("Scan dalam mode PAUSE / STANDBY.\n")
 
-                last_tick_time = time.time()
-                heartbeat_warned = False
-
                 while True:
-                    # Soft/hard restart dari admin
-                    if state.request_soft_restart or state.request_hard_restart:
-                        print("Soft/Hard restart diminta, putuskan WebSocket & reconnect...")
+                    # Soft/hard restart dari admin (flag soft dipecah per market)
+                    if state.request_soft_restart:
+                        state.soft_restart_pending = set(state.markets)
                         state.request_soft_restart = False
+                    if market in state.soft_restart_pending:
+                        # soft: ganti koneksi tanpa jeda, analisa & kirim tetap jalan
+                        state.soft_restart_pending.discard(market)
+                        ws = await hot_swap_ws(state, ws, ws_url, market)
+                        health.attach(ws, time.time())
+                    if link is not None:
+                        # shard dibagi ulang (scanner masuk/keluar, refresh pair, hard restart)
+                        if link.shard(market)[0] != shard_version:
+                            print(f"[{market}] Shard dari coordinator berubah → sinkron & reconnect...")
+                            break
+                    elif state.request_hard_restart and market not in state.hard_restart_done:
+                        print(f"[{market}] Hard restart diminta, refresh pair & reconnect...")
                         break
 
                     # Pair refresh tiap interval
-                    if time.time() - last_pairs_refresh > refresh_interval:
+                    elif time.time() - last_pairs_refresh > refresh_interval:
                         print("Interval pair refresh tercapai → refresh & reconnect...")
                         break
 
-                    # Heartbeat check
-                    now = time.time()
-                    if now - last_tick_time > HEARTBEAT_TIMEOUT_SEC and not heartbeat_warned:
-                        if TELEGRAM_ADMIN_ID:
-                            send_message(
-                                TELEGRAM_ADMIN_ID,
-                                f"⚠ Tidak ada data market selama {HEARTBEAT_TIMEOUT_SEC} detik.\n"
-                                "Kemungkinan gangguan koneksi atau Binance.",
-                            )
-                        heartbeat_warned = True
-
+                    # heartbeat dicek Supervisor; socket yang diam ditutup paksa dari sana
                     try:
                         msg = await ws.recv()
-                        last_tick_time = time.time()
-                        if heartbeat_warned:
-                            if TELEGRAM_ADMIN_ID:
-                                send_message(
-                                    TELEGRAM_ADMIN_ID,
-                                    "✅ Data market kembali diterima. Koneksi normal.",
-                                )
-                            heartbeat_warned = False
+                        now = time.time()
+                        health.on_frame(now)
+                        if recorder is not None:
+                            recorder.record_ws(market, msg)
                     except websockets.ConnectionClosed:
                         print("WebSocket terputus. Reconnect dalam 5 detik...")
                         await asyncio.sleep(5)
                         break
 
                     data = json.loads(msg)
-                    kline = data.get("data", {}).get("k", {})
+                    payload = data.get("data", {})
+                    if payload.get("k"):
+                        if payload["k"].get("x"):
+                            health.on_close(payload["k"]["s"], now)
+                    elif payload.get("s"):
+                        # aggTrade: candle dibangun dari trade → trade = detak symbol
+                        health.on_close(payload["s"], now)
+
+                    # outcome tracker: entry / TP / SL sinyal terbuka dari harga stream
+                    tracker = state.outcomes
+                    if tracker is not None and tracker.has_open:
+                        if payload.get("k"):
+                            tracker.on_kline(adapter.signal_key(payload["k"]["s"]), payload["k"])
+                        elif payload.get("e") == "aggTrade":
+                            tracker.on_price(adapter.signal_key(payload["s"]), float(payload["p"]))
+
+                    if scanner is not None:
+                        # bar engine selalu di-update (walau pause) supaya candle tidak bolong;
+                        # detector sendiri yang cek scanning_enabled / paused
+                        if stream_name == "aggTrade":
+                            if payload.get("s"):
+                                scanner.engine.on_agg_trade(
+                                    payload["s"], float(payload["p"]), float(payload["q"]), int(payload["T"])
+                                )
+                            if now - last_trade_flush >= 1.0:
+                                scanner.engine.flush_due(int(now * 1000))
+                                last_trade_flush = now
+                        elif payload.get("k"):
+                            if not scanner.engine.on_kline(payload["k"]) and intrabar is not None:
+                                intrabar.on_partial(payload["k"])
+                        if scanner.engine.needs_backfill:
+                            scanner.schedule_gap_backfill()
+                        continue
+
+                    kline = payload.get("k", {})
                     if not kline:
                         continue
 
@@ -206,73 +530,39 @@ async def scan_loop(state) -> None:
                     if not state.scanning_enabled or state.paused:
                         continue
 
-                    # COOLDOWN per pair
-                    cooldown_sec = get_cooldown_seconds()
-                    now_ts = time.time()
-                    last_ts = last_signal_time.get(symbol)
-                    if last_ts and now_ts - last_ts < cooldown_sec:
-                        continue
-
-                    # ANALISA IPC
-                    conditions, levels = analyse_symbol_ipc(symbol)
-                    if not conditions or not levels:
+                    # COOLDOWN per pair (per market)
+                    key = adapter.signal_key(symbol)
+                    if in_cooldown(state, key):
                         continue
 
-                    score = score_ipc_signal(conditions)
-                    tier = tier_from_score(score)
-
-                    if not should_send_tier(tier, state.min_tier):
-                        continue
-
-                    entry = levels.get("entry")
-                    if entry is None:
-                        continue
-
-                    # anti-duplikat entry (0.1%)
-                    prev_entry = last_signal_entry.get(symbol)
-                    if prev_entry is not None:
-                        diff = abs(entry - prev_entry) / max(prev_entry, 1e-9)
-                        if diff < 0.001:
-                            continue
-
-                    text = build_ipc_signal_message(symbol, levels, conditions, score, tier)
-
-                    # UPDATE trackers
-                    last_signal_time[symbol] = now_ts
-                    last_signal_entry[symbol] = entry
-                    bump_stats(symbol)
-
-                    # KIRIM KE ADMIN
-                    if TELEGRAM_ADMIN_ID:
-                        send_message(TELEGRAM_ADMIN_ID, text)
-
-                    # KIRIM KE USER
-                    subs = load_subscribers_dict()
-                    changed = False
-                    for cid_str, user in subs.items():
-                        chat_id = int(cid_str)
-                        # skip admin agar tidak dobel
-                        if TELEGRAM_ADMIN_ID and chat_id == TELEGRAM_ADMIN_ID:
-                            continue
-                        if not can_receive_signal(user):
-                            continue
-                        send_message(chat_id, text)
-                        mark_signal_sent(user)
-                        changed = True
-
-                    if changed:
-                        save_subscribers_dict(subs)
-
-                    print(f"[{symbol}] Sinyal dikirim: Score {score}, Tier {tier}")
+                    if pool is None:
+                        # ANALISA IPC (inline, mode lama) di thread: REST + tunggu
+                        # slot weight governor tidak boleh menahan event loop
+                        conditions, levels = await asyncio.to_thread(analyse_symbol_ipc, symbol, adapter.get_klines)
+                        process_ipc_result(state, key, conditions, levels)
+                    else:
+                        # ANALISA IPC di worker pool (tidak menahan loop WS);
+                        # dispatcher ditahan sampai analisa selesai (seleksi per bar)
+                        state.dispatcher.hold()
+                        task = asyncio.create_task(analyse_and_process_pooled(state, pool, symbol, adapter))
+                        state.analysis_tasks.add(task)
+                        task.add_done_callback(state.analysis_tasks.discard)
+                        task.add_done_callback(lambda _: state.dispatcher.release())
+            finally:
+                health.detach()
+                await ws.close()
 
         except Exception as e:
-            print("Error di scan_loop:", e)
+            print(f"[{market}] Error di scan_loop:", e)
             await asyncio.sleep(5)
 
 
 # ================== MAIN ==================
 
-async def main():
+def new_state() -> SimpleNamespace:
+    """
+    State dasar yang dipakai semua DEPLOY_ROLE.
+    """
     state = SimpleNamespace()
     state.scanning_enabled = False   # mulai standby
     state.paused = False
@@ -280,25 +570,198 @@ async def main():
     state.request_hard_restart = False
     state.min_tier = MIN_TIER_TO_SEND
     state.last_update_id = None
+    state.provisional_recipients = {}
+    state.analysis_pool = None
+    state.analysis_tasks = set()
+    # prewarm import modul berat (referensi dipegang supaya tidak di-GC,
+    # dibatalkan saat shutdown kalau belum selesai)
+    state.prewarm_task = None
+    state.shutting_down = False
+    state.delivery = DeliveryQueue()
+    state.markets = list(MARKETS)
+    state.stream_scanners = {}
+    # restart per market: soft = set market yang belum reconnect,
+    # hard = flag global, selesai setelah semua market refresh pair
+    state.soft_restart_pending = set()
+    state.hard_restart_done = set()
+    state.universe = {}
+    state.snapshot_candles = {}
+    state.snapshot_flags = {}
+    state.capture = None
+    # multi-proses (cluster.py): link = sisi scanner, coordinator = sisi coordinator
+    state.link = None
+    state.coordinator = None
+    return state
+
 
-    # Pesan startup ke admin (mirip SMC intraday)
+async def main():
+    if DEPLOY_ROLE == "scanner":
+        await main_scanner()
+        return
+
+    state = new_state()
+    adapters = [make_adapter(m) for m in state.markets]
+    coordinator = DEPLOY_ROLE == "coordinator"
+    capture_mode = CAPTURE_MODE
+    if coordinator and capture_mode:
+        print("CAPTURE_MODE tidak didukung di mode coordinator (WS ada di scanner) → dimatikan.")
+        capture_mode = ""
+
+    replay = capture_mode == "replay"
+    if replay and TELEGRAM_API_URL == TELEGRAM_API_URL_DEFAULT and not REPLAY_LIVE_TELEGRAM:
+        raise SystemExit(
+            "CAPTURE_MODE=replay ditolak: TELEGRAM_API_URL masih Telegram asli (sinyal rekaman "
+            "akan terkirim ke user). Arahkan ke fake_telegram.py atau set REPLAY_LIVE_TELEGRAM=true."
+        )
+
+    # replay: state live (cooldown, outcome, subscriber, stats, snapshot) tidak ditulis
+    state.outcomes = None
+    if OUTCOME_TRACKING:
+        state.outcomes = OutcomeTracker(
+            notify=lambda chat_ids, text: notify_outcome(state, chat_ids, text), persist=not replay
+        )
+
+    # file state dibaca paralel di thread (startup tidak antri I/O satu per satu)
+    loaded = await load_concurrently({
+        # cooldown & dedupe entry (di memory, tahan restart lewat signal_memory.json)
+        "cooldowns": CooldownEngine if not replay else (lambda: CooldownEngine(persist=False)),
+        # subscriber kolumnar di memory (subscribers.json dibaca 1x)
+        "subscribers": SubscriberTable.load,
+        # replay: tanpa snapshot (input harus sama persis)
+        "snapshot": load_snapshot if not replay else None,
+        "templates": load_signal_templates,
+        "outcomes": state.outcomes.restore if state.outcomes is not None and not replay else None,
+        "replay": (lambda: CaptureReplay(CAPTURE_FILE, state.markets, speed=REPLAY_SPEED)) if replay else None,
+    })
+    state.cooldowns = loaded["cooldowns"]
+    state.subscribers = loaded["subscribers"]
+    state.subscribers.persist = not replay
+
+    # rekam / replay market data (capture.py)
+    if capture_mode == "record":
+        state.capture = CaptureWriter(CAPTURE_FILE)
+        print(f"Rekam market data → {CAPTURE_FILE}")
+    elif replay:
+        state.capture = loaded["replay"]
+        # replay: scan langsung aktif, cooldown ikut jam rekaman
+        state.scanning_enabled = True
+        state.cooldowns.use_clock(lambda: state.capture.clock)
+        print(f"Replay market data ← {CAPTURE_FILE} (speed {REPLAY_SPEED or 'max'})")
+    for adapter in adapters:
+        adapter.capture = state.capture
+
+    # warm restart: status scan, universe & candle dari snapshot terakhir
+    snap = loaded["snapshot"]
+    if snap is not None:
+        apply_snapshot(state, snap)
+        age_min = (time.time() - snap["saved_ts"]) / 60
+        print(f"Snapshot dipulihkan (umur {age_min:.1f} menit, scan {'AKTIF' if state.scanning_enabled else 'STANDBY'}).")
+
+    if loaded["templates"]:
+        print(f"Template sinyal custom: {loaded['templates']} file.")
+    if loaded["outcomes"]:
+        print(f"Outcome tracker: {loaded['outcomes']} sinyal terbuka dipulihkan.")
+    state.dispatcher = SignalDispatcher(
+        state.delivery, tracker=state.outcomes, subscribers=state.subscribers, persist=not replay
+    )
+    # /scan & /scanall admin: thread pool terpisah dari jalur scan live
+    state.on_demand = OnDemandScanner(state, adapters)
+    # supervisor: lag loop, detak WS per market, candle per symbol, antrian
+    state.watchdog = Supervisor(state)
+
+    # coordinator tidak menganalisa sendiri (analisa jalan di scanner)
+    if ANALYSIS_WORKERS > 0 and not coordinator:
+        state.analysis_pool = AnalysisPool(workers=ANALYSIS_WORKERS)
+        # fork worker sekarang (sebelum pre-import pandas di thread), init worker tidak ditunggu
+        state.analysis_pool.start_workers()
+        print(f"Analysis pool aktif: {ANALYSIS_WORKERS} worker process.")
+
+    # Pesan startup ke admin (mirip SMC intraday), lewat antrian delivery
+    # → tidak menahan startup menunggu Telegram
     if TELEGRAM_ADMIN_ID:
-        send_message(
+        state.delivery.enqueue(
             TELEGRAM_ADMIN_ID,
             "✅ *IPC Intraday Signal Bot ONLINE*\n\n"
-            "- Scan : *STANDBY*\n"
+            f"- Scan : *{'AKTIF' if state.scanning_enabled else 'STANDBY'}*"
+            f"{' (dipulihkan dari snapshot)' if snap is not None else ''}\n"
+            f"- Market : *{', '.join(state.markets)}*\n"
+            f"- Mode : *{DEPLOY_ROLE}*\n"
             f"- Min Tier : *{state.min_tier}*\n\n"
             "Gunakan *▶️ Start Scan* di panel admin untuk mulai scan market.",
         )
 
-    task_tg = asyncio.create_task(telegram_command_loop(state))
-    task_scan = asyncio.create_task(scan_loop(state))
+    lifecycle = Lifecycle(state)
+    lifecycle.install_signal_handlers()
+    if isinstance(state.capture, CaptureReplay):
+        state.capture.on_done = lambda: lifecycle.request_stop("replay selesai")
+        state.capture.settle = lambda: wait_pipeline_idle(state)
+
+    state.delivery.start()
+    # input: sumber pekerjaan baru, dihentikan duluan saat shutdown
+    tasks_input = [asyncio.create_task(telegram_command_loop(state))]
+    if coordinator:
+        # universe dibagi ke proses scanner, hasil analisa masuk jalur sinyal yang sama
+        state.coordinator = Coordinator(
+            state,
+            adapters,
+            refresh_universe=lambda adapter: get_usdt_pairs_with_volume(MIN_VOLUME_USDT, MAX_USDT_PAIRS, adapter),
+            on_result=lambda key, c, lv: process_ipc_result(state, key, c, lv),
+            on_early=lambda key, c, lv: send_provisional_signal(state, key, c, lv),
+            on_cancel=lambda key: cancel_provisional_signal(state, key),
+        )
+        tasks_input.append(asyncio.create_task(state.coordinator.run()))
+    else:
+        tasks_input += [asyncio.create_task(scan_loop(state, adapter)) for adapter in adapters]
+    # service: dihentikan setelah analisa in-flight selesai
+    tasks_service = [asyncio.create_task(state.dispatcher.run())]
+    if state.outcomes is not None:
+        tasks_service.append(asyncio.create_task(state.outcomes.run()))
+    if SNAPSHOT_INTERVAL_SEC > 0 and not replay:
+        tasks_service.append(asyncio.create_task(snapshot_loop(state)))
+    if STORAGE_FLUSH_SEC > 0 and not replay:
+        tasks_service.append(asyncio.create_task(storage_flush_loop(state)))
+    tasks_service.append(asyncio.create_task(state.watchdog.run()))
+
+    # modul berat (pandas) dipanaskan di background setelah online
+    state.prewarm_task = asyncio.create_task(prewarm_imports())
+
+    await lifecycle.run(tasks_input, tasks_service)
+
+
+async def main_scanner():
+    """
+    DEPLOY_ROLE=scanner: scan_loop untuk shard dari coordinator saja.
+    Subscriber, cooldown, dispatcher, outcome & Telegram milik coordinator;
+    di sini diganti CoordinatorLink yang meneruskan semuanya lewat socket.
+    """
+    state = new_state()
+    adapters = [make_adapter(m) for m in state.markets]
+
+    # salinan cooldown dari coordinator (hanya untuk skip analisa), tidak ke disk
+    state.cooldowns = CooldownEngine(persist=False)
+    state.link = CoordinatorLink(state)
+    state.dispatcher = state.delivery = state.outcomes = state.link
+    state.watchdog = Supervisor(state)
+
+    if ANALYSIS_WORKERS > 0:
+        state.analysis_pool = AnalysisPool(workers=ANALYSIS_WORKERS)
+        state.analysis_pool.start_workers()
+        print(f"Analysis pool aktif: {ANALYSIS_WORKERS} worker process.")
+
+    lifecycle = Lifecycle(state)
+    lifecycle.install_signal_handlers()
+
+    state.link.start()
+    tasks_input = [asyncio.create_task(scan_loop(state, adapter)) for adapter in adapters]
+    tasks_service = [asyncio.create_task(state.watchdog.run())]
+    state.prewarm_task = asyncio.create_task(prewarm_imports())
 
-    await asyncio.gather(task_tg, task_scan)
+    await lifecycle.run(tasks_input, tasks_service)
 
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
+        # fallback kalau signal handler tidak tersedia (mis. Windows)
         print("Bot dihentikan oleh user.")
@@ -0,0 +1,134 @@
+# ondemand.py
+#
+# Scan on-demand dari admin (/scan SYMBOL, /scanall):
+# - Data: candle bar engine (mode stream) kalau ada, selain itu REST adapter
+# - Analisa di thread pool sendiri (SCANALL_CONCURRENCY), tidak memblok
+#   event loop / jalur scan live, tidak memotong kuota & tidak kena cooldown
+# - Balasan lewat antrian delivery
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from config import SCANALL_CONCURRENCY, SCANALL_TOP
+from ipc_scoring import score_ipc_signal, tier_from_score, TIER_ORDER
+from signal_builder import build_scan_report, build_scanall_summary
+
+
+class OnDemandScanner:
+    def __init__(self, state, adapters, concurrency: int = SCANALL_CONCURRENCY):
+        self.state = state
+        self.adapters = {a.name: a for a in adapters}
+        self.concurrency = max(1, concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ondemand")
+        self.scanall_running = False
+
+    # ---------- resolve symbol ----------
+
+    def resolve(self, symbol: str) -> Tuple[Any, str]:
+        """
+        "BTCUSDT.P" → (futures adapter, "BTCUSDT"); selain itu market pertama
+        yang universe-nya memuat symbol, default market pertama.
+        """
+        symbol = symbol.upper()
+        for adapter in self.adapters.values():
+            if adapter.key_suffix and symbol.endswith(adapter.key_suffix):
+                return adapter, symbol[: -len(adapter.key_suffix)]
+        for name, adapter in self.adapters.items():
+            if symbol.lower() in self.state.universe.get(name, {}).get("symbols", []):
+                return adapter, symbol
+        return next(iter(self.adapters.values())), symbol
+
+    # ---------- analisa ----------
+
+    def _local_arrays(self, market: str, symbol: str) -> Dict | None:
+        scanner = self.state.stream_scanners.get(market)
+        if scanner is None or not scanner.engine.has_history(symbol):
+            return None
+        return {tf: scanner.engine.bars(symbol, tf) for tf in ("1h", "15m", "5m")}
+
+    @staticmethod
+    def _diagnose(adapter, symbol: str, arrays: Dict | None) -> Dict[str, Any]:
+        # ipc_logic diimport saat /scan pertama (di thread), bukan saat start
+        from ipc_logic import array_to_frame, diagnose_ipc_frames, fetch_ipc_frames
+
+        if arrays is not None:
+            frames = {tf: array_to_frame(arr) for tf, arr in arrays.items()}
+        else:
+            frames = fetch_ipc_frames(symbol, adapter.get_klines)
+        return diagnose_ipc_frames(frames["1h"], frames["15m"], frames["5m"])
+
+    async def scan_symbol(self, symbol: str) -> Dict[str, Any]:
+        adapter, raw = self.resolve(symbol)
+        # snapshot candle diambil di event loop, analisa di thread
+        arrays = self._local_arrays(adapter.name, raw)
+        loop = asyncio.get_running_loop()
+        diagnosis = await loop.run_in_executor(self.executor, self._diagnose, adapter, raw, arrays)
+        conditions = diagnosis.get("conditions") or {}
+        score = score_ipc_signal(conditions) if conditions else 0
+        return {
+            "symbol": adapter.signal_key(raw),
+            "market": adapter.name,
+            "source": "stream" if arrays is not None else "rest",
+            "diagnosis": diagnosis,
+            "direction": conditions.get("direction", "-"),
+            "score": score,
+            "tier": tier_from_score(score),
+            "signal": bool(diagnosis.get("signal")),
+        }
+
+    async def scan_all(self) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Scan semua pair di universe semua market. Return (hasil urut ranking, total).
+        """
+        targets = []
+        for name, adapter in self.adapters.items():
+            for sym in self.state.universe.get(name, {}).get("symbols", []):
+                targets.append(adapter.signal_key(sym))
+
+        sem = asyncio.Semaphore(self.concurrency)
+        results: List[Dict[str, Any]] = []
+
+        async def one(key: str) -> None:
+            async with sem:
+                try:
+                    results.append(await self.scan_symbol(key))
+                except Exception as e:
+                    print(f"[{key}] Gagal scan on-demand:", e)
+
+        await asyncio.gather(*(one(k) for k in targets))
+        results.sort(key=lambda r: (r["signal"], TIER_ORDER.get(r["tier"], 0), r["score"]), reverse=True)
+        return results, len(targets)
+
+    # ---------- handler command admin ----------
+
+    def _reply(self, chat_id: int, text: str) -> None:
+        self.state.delivery.enqueue(chat_id, text)
+
+    async def handle_scan(self, chat_id: int, symbol: str) -> None:
+        try:
+            r = await self.scan_symbol(symbol)
+        except Exception as e:
+            self._reply(chat_id, f"❌ Gagal scan *{symbol.upper()}*: {e}")
+            return
+        cooldown_left = self.state.cooldowns.remaining(r["symbol"])
+        text = build_scan_report(r["symbol"], r["market"], r["diagnosis"], r["score"], r["tier"], cooldown_left)
+        self._reply(chat_id, text + f"\n\n_data: {r['source']}_")
+
+    async def handle_scanall(self, chat_id: int, top: int = SCANALL_TOP) -> None:
+        if self.scanall_running:
+            self._reply(chat_id, "⏳ /scanall masih berjalan, tunggu hasilnya.")
+            return
+        self.scanall_running = True
+        try:
+            t0 = time.monotonic()
+            rows, total = await self.scan_all()
+            self._reply(chat_id, build_scanall_summary(rows, total, time.monotonic() - t0, top))
+        except Exception as e:
+            self._reply(chat_id, f"❌ Gagal /scanall: {e}")
+        finally:
+            self.scanall_running = False
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,388 @@
+# outcome_tracker.py
+#
+# Lacak sinyal yang sudah terkirim sampai entry / TP1-3 / SL:
+# - Harga dari stream WS yang sudah ada (kline / aggTrade), tanpa REST
+# - Index per symbol: level trigger terurut (bisect), jadi 1 update harga
+#   = O(log k) + jumlah trigger yang kena, bukan loop semua sinyal terbuka
+# - Follow-up opsional ke penerima sinyal (OUTCOME_NOTIFY_EVENTS)
+# - Sinyal terbuka disimpan ke data/open_signals.json (tahan restart),
+#   hasil akhir ke data/outcomes.jsonl + counter di stats.json
+
+import asyncio
+import heapq
+import itertools
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from config import (
+    OUTCOME_NOTIFY_EVENTS,
+    OUTCOME_ENTRY_EXPIRY_HOURS,
+    OUTCOME_MAX_HOURS,
+)
+from storage import load_open_signals, save_open_signals, record_outcome
+
+# trigger: (level, seq, signal_id, event)
+Trigger = Tuple[float, int, int, str]
+
+# notify(chat_ids, text)
+NotifyCallback = Callable[[List[int], str], None]
+
+
+class TrackedSignal:
+    __slots__ = (
+        "id", "symbol", "direction", "tier", "score",
+        "entry", "sl", "tp1", "tp2", "tp3",
+        "recipients", "created_ts", "entry_ts", "tp_hit",
+        "triggers",
+    )
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__ if k != "triggers"}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TrackedSignal":
+        sig = cls()
+        for k in cls.__slots__:
+            setattr(sig, k, d.get(k))
+        sig.recipients = list(sig.recipients or [])
+        sig.tp_hit = int(sig.tp_hit or 0)
+        sig.triggers = []
+        return sig
+
+    @property
+    def is_long(self) -> bool:
+        return self.direction != "short"
+
+
+class _SymbolIndex:
+    """
+    up   : trigger yang kena saat harga naik ke level (level <= high)
+    down : trigger yang kena saat harga turun ke level (level >= low)
+    Keduanya list terurut naik.
+    """
+
+    __slots__ = ("up", "down", "last")
+
+    def __init__(self):
+        self.up: List[Trigger] = []
+        self.down: List[Trigger] = []
+        # (open_time, high, low, close) update kline terakhir
+        self.last: Tuple[float, float, float, float] | None = None
+
+    def __bool__(self) -> bool:
+        return bool(self.up or self.down)
+
+
+class OutcomeTracker:
+    def __init__(
+        self,
+        notify: NotifyCallback | None = None,
+        notify_events: Iterable[str] = OUTCOME_NOTIFY_EVENTS,
+        entry_expiry_hours: float = OUTCOME_ENTRY_EXPIRY_HOURS,
+        max_hours: float = OUTCOME_MAX_HOURS,
+        persist: bool = True,
+    ):
+        self.notify = notify
+        self.notify_events = set(notify_events)
+        self.entry_expiry_sec = entry_expiry_hours * 3600
+        self.max_sec = max_hours * 3600
+        self.persist = persist
+
+        self.signals: Dict[int, TrackedSignal] = {}
+        self._index: Dict[str, _SymbolIndex] = {}
+        self._deadlines: List[Tuple[float, int]] = []
+        self._seq = itertools.count()
+        self._next_id = 1
+        self._dirty = False
+
+    # ---------- buka / tutup ----------
+
+    @property
+    def has_open(self) -> bool:
+        return bool(self._index)
+
+    def open_symbols(self) -> List[str]:
+        """
+        Key yang punya sinyal terbuka (harga-nya diteruskan scanner, cluster.py).
+        """
+        return list(self._index)
+
+    def open(
+        self,
+        symbol: str,
+        direction: str,
+        levels: Dict[str, float],
+        tier: str = "",
+        score: int = 0,
+        recipients: Iterable[int] = (),
+        created_ts: float | None = None,
+    ) -> TrackedSignal:
+        sig = TrackedSignal()
+        sig.id = self._next_id
+        self._next_id += 1
+        sig.symbol = symbol.upper()
+        sig.direction = direction.lower()
+        sig.tier = tier
+        sig.score = score
+        sig.entry = float(levels["entry"])
+        sig.sl = float(levels["sl"])
+        sig.tp1 = float(levels["tp1"])
+        sig.tp2 = float(levels["tp2"])
+        sig.tp3 = float(levels["tp3"])
+        sig.recipients = list(recipients)
+        sig.created_ts = created_ts or time.time()
+        sig.entry_ts = None
+        sig.tp_hit = 0
+        sig.triggers = []
+        self._register(sig)
+        self._dirty = True
+        self._save()
+        return sig
+
+    def open_from_pending(self, pending) -> TrackedSignal | None:
+        """
+        Dari dispatcher.PendingSignal yang baru di-dispatch.
+        """
+        if not pending.levels or "entry" not in pending.levels:
+            return None
+        direction = str(pending.values.get("direction", "LONG")).lower()
+        return self.open(
+            pending.symbol, direction, pending.levels,
+            tier=pending.tier, score=pending.score, recipients=pending.recipients,
+        )
+
+    def _register(self, sig: TrackedSignal) -> None:
+        self.signals[sig.id] = sig
+        if sig.entry_ts is None:
+            # tunggu harga kembali ke entry (pullback ke 50% range)
+            self._add_trigger(sig, sig.entry, "entry", down=sig.is_long)
+            heapq.heappush(self._deadlines, (sig.created_ts + self.entry_expiry_sec, sig.id))
+        else:
+            self._arm_targets(sig)
+        heapq.heappush(self._deadlines, (sig.created_ts + self.max_sec, sig.id))
+
+    def _arm_targets(self, sig: TrackedSignal) -> None:
+        for n in range(sig.tp_hit + 1, 4):
+            self._add_trigger(sig, getattr(sig, f"tp{n}"), f"tp{n}", down=not sig.is_long)
+        self._add_trigger(sig, sig.sl, "sl", down=sig.is_long)
+
+    def _add_trigger(self, sig: TrackedSignal, level: float, event: str, down: bool) -> None:
+        idx = self._index.get(sig.symbol)
+        if idx is None:
+            idx = self._index[sig.symbol] = _SymbolIndex()
+        trig = (level, next(self._seq), sig.id, event)
+        insort(idx.down if down else idx.up, trig)
+        sig.triggers.append((down, trig))
+
+    def _drop_triggers(self, sig: TrackedSignal) -> None:
+        idx = self._index.get(sig.symbol)
+        for down, trig in sig.triggers:
+            if idx is None:
+                break
+            side = idx.down if down else idx.up
+            i = bisect_left(side, trig)
+            if i < len(side) and side[i] == trig:
+                del side[i]
+        sig.triggers = []
+        if idx is not None and not idx:
+            del self._index[sig.symbol]
+
+    def _close(self, sig: TrackedSignal, result: str, price: float | None, ts: float) -> None:
+        self._drop_triggers(sig)
+        self.signals.pop(sig.id, None)
+        record = sig.to_dict()
+        record.update({
+            "result": result,
+            "exit_price": price,
+            "closed_ts": ts,
+            "closed_at": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+        })
+        if self.persist:
+            try:
+                record_outcome(record)
+            except Exception as e:
+                print("Gagal simpan outcome:", e)
+        self._dirty = True
+        print(f"[{sig.symbol}] Outcome: {result}")
+
+    # ---------- update harga ----------
+
+    def on_kline(self, symbol: str, kline: Dict) -> None:
+        """
+        Payload "k" dari stream kline (parsial maupun close).
+        h/l kline kumulatif per candle, jadi range harga sejak update
+        sebelumnya = ekstrem baru (kalau ada) + close lama/baru.
+        """
+        idx = self._index.get(symbol)
+        if idx is None:
+            return
+        open_time = float(kline["t"])
+        h, l, c = float(kline["h"]), float(kline["l"]), float(kline["c"])
+        last = idx.last
+        if last is None or last[0] != open_time:
+            lo, hi = l, h
+        else:
+            _, prev_h, prev_l, prev_c = last
+            hi = h if h > prev_h else max(prev_c, c)
+            lo = l if l < prev_l else min(prev_c, c)
+        idx.last = (open_time, h, l, c)
+        self._on_range(symbol, idx, lo, hi, c)
+
+    def on_price(self, symbol: str, price: float) -> None:
+        """
+        Harga trade tunggal (aggTrade).
+        """
+        idx = self._index.get(symbol)
+        if idx is None:
+            return
+        self._on_range(symbol, idx, price, price, price)
+
+    def _on_range(self, symbol: str, idx: _SymbolIndex, lo: float, hi: float, last: float) -> None:
+        down_hit: List[Trigger] = []
+        up_hit: List[Trigger] = []
+        if idx.down and idx.down[-1][0] >= lo:
+            j = bisect_left(idx.down, (lo, -1))
+            down_hit = idx.down[j:]
+        if idx.up and idx.up[0][0] <= hi:
+            i = bisect_right(idx.up, (hi, float("inf")))
+            up_hit = idx.up[:i]
+        if not down_hit and not up_hit:
+            return
+
+        now = time.time()
+        # urutan konservatif: entry & SL dulu, baru TP
+        hits = sorted(down_hit + up_hit, key=lambda t: (t[3] not in ("entry", "sl"), t[3]))
+        armed = set()
+        for level, _, sid, event in hits:
+            sig = self.signals.get(sid)
+            if sig is None or sid in armed:
+                continue  # sudah ditutup / target baru dipasang di update ini
+            if event == "entry":
+                self._drop_triggers(sig)
+                sig.entry_ts = now
+                self._arm_targets(sig)
+                armed.add(sid)
+                self._dirty = True
+                self._emit(sig, "entry", level)
+            elif event == "sl":
+                self._emit(sig, "sl", level)
+                self._close(sig, f"TP{sig.tp_hit}" if sig.tp_hit else "SL", level, now)
+            else:
+                n = int(event[2])
+                if n <= sig.tp_hit:
+                    continue
+                sig.tp_hit = n
+                self._remove_trigger(sig, event)
+                self._dirty = True
+                self._emit(sig, event, level)
+                if n == 3:
+                    self._close(sig, "TP3", level, now)
+        self._save()
+
+    def _remove_trigger(self, sig: TrackedSignal, event: str) -> None:
+        idx = self._index.get(sig.symbol)
+        keep = []
+        for down, trig in sig.triggers:
+            if trig[3] != event:
+                keep.append((down, trig))
+                continue
+            side = idx.down if down else idx.up
+            i = bisect_left(side, trig)
+            if i < len(side) and side[i] == trig:
+                del side[i]
+        sig.triggers = keep
+
+    # ---------- kadaluarsa ----------
+
+    def expire_due(self, now: float | None = None) -> int:
+        """
+        Tutup sinyal yang entry-nya tidak tersentuh / terbuka terlalu lama.
+        Return jumlah sinyal yang ditutup.
+        """
+        now = now or time.time()
+        closed = 0
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, sid = heapq.heappop(self._deadlines)
+            sig = self.signals.get(sid)
+            if sig is None:
+                continue
+            if sig.entry_ts is None:
+                self._emit(sig, "expired", None)
+                self._close(sig, "EXPIRED", None, now)
+                closed += 1
+            elif deadline >= sig.created_ts + self.max_sec:
+                idx = self._index.get(sig.symbol)
+                price = idx.last[3] if idx is not None and idx.last else None
+                self._close(sig, f"TP{sig.tp_hit}" if sig.tp_hit else "TIMEOUT", price, now)
+                closed += 1
+        if closed:
+            self._save()
+        return closed
+
+    async def run(self, interval_sec: float = 60) -> None:
+        while True:
+            await asyncio.sleep(interval_sec)
+            try:
+                self.expire_due()
+            except Exception as e:
+                print("Error outcome tracker:", e)
+
+    # ---------- notifikasi ----------
+
+    def _emit(self, sig: TrackedSignal, event: str, price: float | None) -> None:
+        if self.notify is None or event not in self.notify_events or not sig.recipients:
+            return
+        try:
+            self.notify(sig.recipients, build_outcome_message(sig, event, price))
+        except Exception as e:
+            print(f"[{sig.symbol}] Gagal kirim follow-up:", e)
+
+    # ---------- persist ----------
+
+    def _save(self) -> None:
+        if not self._dirty or not self.persist:
+            return
+        self._dirty = False
+        try:
+            save_open_signals([s.to_dict() for s in self.signals.values()])
+        except Exception as e:
+            print("Gagal simpan open signals:", e)
+
+    def flush(self) -> None:
+        self._dirty = True
+        self._save()
+
+    def restore(self) -> int:
+        """
+        Load sinyal terbuka dari file (setelah restart). Return jumlahnya.
+        """
+        for d in load_open_signals():
+            try:
+                sig = TrackedSignal.from_dict(d)
+            except Exception:
+                continue
+            self._register(sig)
+            self._next_id = max(self._next_id, int(sig.id) + 1)
+        return len(self.signals)
+
+
+_EVENT_TEXT = {
+    "entry": "📥 Entry tersentuh",
+    "tp1": "🎯 TP1 tercapai",
+    "tp2": "🎯 TP2 tercapai",
+    "tp3": "🏆 TP3 tercapai",
+    "sl": "🛑 Kena SL",
+    "expired": "⌛ Entry tidak tersentuh, sinyal kadaluarsa",
+}
+
+
+def build_outcome_message(sig: TrackedSignal, event: str, price: float | None) -> str:
+    lines = [f"{_EVENT_TEXT.get(event, event)} — *{sig.symbol}* ({sig.direction.upper()})"]
+    if price is not None:
+        lines.append(f"Harga : {price:.6f}")
+    lines.append(f"Entry : {sig.entry:.6f}")
+    if event == "sl" and sig.tp_hit:
+        lines.append(f"(TP{sig.tp_hit} sudah tercapai sebelumnya)")
+    return "\n".join(lines)
@@ -0,0 +1,462 @@
+# rate_limit.py
+#
+# Governor weight REST Binance (batas per IP per menit, mis. spot 6.000):
+# - weight terpakai window menit ini: hitungan lokal + header
+#   X-MBX-USED-WEIGHT-1M (ambil yang terbesar)
+# - request diprediksi biayanya (weight yang sedang jalan + yang antre) →
+#   diizinkan, ditunda sampai window berikutnya, atau dibuang per prioritas:
+#     backfill < analisa < refresh universe
+#   prioritas rendah hanya boleh memakai sebagian budget, sisanya cadangan
+#   untuk prioritas lebih tinggi
+# - 429 / 418 → semua request market itu berhenti sampai Retry-After
+#   (request lanjutan saat 429 yang bikin IP di-ban 418)
+# - acquire() bisa menunggu (blocking) → hanya dari thread worker
+#   (asyncio.to_thread / executor), jangan dari thread event loop
+#
+# 1 governor per market (spot & futures punya budget terpisah), dipakai
+# bersama adapter exchange.py & fungsi REST lama (ipc_logic, volume_filter).
+#
+# Cek terhadap fake exchange (weight_limit aktif, window dipendekkan):
+#   python rate_limit.py
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import http_client
+from config import (
+    BINANCE_WEIGHT_LIMIT_1M,
+    BINANCE_FUTURES_WEIGHT_LIMIT_1M,
+    WEIGHT_MAX_WAIT_BACKFILL_SEC,
+    WEIGHT_MAX_WAIT_ANALYSIS_SEC,
+    WEIGHT_MAX_WAIT_UNIVERSE_SEC,
+)
+
+PRIORITY_BACKFILL = 0
+PRIORITY_ANALYSIS = 1
+PRIORITY_UNIVERSE = 2
+PRIORITY_NAMES = {PRIORITY_BACKFILL: "backfill", PRIORITY_ANALYSIS: "analisa", PRIORITY_UNIVERSE: "universe"}
+
+# fraksi budget per window yang boleh dipakai tiap prioritas
+PRIORITY_SHARE = {PRIORITY_BACKFILL: 0.70, PRIORITY_ANALYSIS: 0.85, PRIORITY_UNIVERSE: 0.95}
+
+PRIORITY_MAX_WAIT = {
+    PRIORITY_BACKFILL: WEIGHT_MAX_WAIT_BACKFILL_SEC,
+    PRIORITY_ANALYSIS: WEIGHT_MAX_WAIT_ANALYSIS_SEC,
+    PRIORITY_UNIVERSE: WEIGHT_MAX_WAIT_UNIVERSE_SEC,
+}
+
+# Retry-After tidak ada di response: 429 → sampai window berikutnya, 418 → X detik
+BAN_DEFAULT_SEC = 120
+
+MARKET_WEIGHT_LIMIT = {"spot": BINANCE_WEIGHT_LIMIT_1M, "futures": BINANCE_FUTURES_WEIGHT_LIMIT_1M}
+
+
+class WeightBudgetExceeded(RuntimeError):
+    """
+    Request dibuang: budget weight tidak cukup dalam batas tunggu prioritasnya.
+    """
+
+
+class WeightGovernor:
+    """
+    Thread-safe (request REST jalan di asyncio.to_thread / pool /scanall).
+    acquire() sebelum request (bisa menunggu / raise WeightBudgetExceeded),
+    complete() setelah response (atau gagal).
+
+    Window dihitung dari window_origin (default 0 = menit UTC seperti
+    Binance); clock bisa diganti untuk test. Menunggu tetap memakai waktu
+    nyata, jadi clock pengganti yang tidak ikut berjalan hanya untuk
+    pengecekan tanpa tunggu.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window_sec: float = 60.0,
+        name: str = "",
+        shares: Dict[int, float] | None = None,
+        max_wait: Dict[int, float] | None = None,
+        clock: Callable[[], float] = time.time,
+        window_origin: float = 0.0,
+    ):
+        self.name = name
+        self.limit = max(1, limit)
+        self.window_sec = window_sec
+        self.clock = clock
+        self.window_origin = window_origin
+        self.shares = dict(shares or PRIORITY_SHARE)
+        self.max_wait = dict(max_wait or PRIORITY_MAX_WAIT)
+
+        self._cond = threading.Condition()
+        self._window = -1
+        # weight window ini: sudah dijawab server / sudah diizinkan tapi belum dijawab
+        self.used = 0
+        self.inflight = 0
+        # weight yang sedang menunggu slot, per prioritas
+        self.queued = {p: 0 for p in self.shares}
+        self.paused_until = 0.0
+
+        self.admitted = {p: 0 for p in self.shares}
+        self.delayed = {p: 0 for p in self.shares}
+        self.dropped = {p: 0 for p in self.shares}
+        self.n_429 = 0
+        self.n_418 = 0
+
+    # ---------- window ----------
+
+    def _window_index(self, now: float) -> int:
+        return int((now - self.window_origin) // self.window_sec)
+
+    def _roll(self, now: float) -> None:
+        window = self._window_index(now)
+        if window != self._window:
+            self._window = window
+            self.used = 0
+
+    def _window_end(self, now: float) -> float:
+        return self.window_origin + (self._window_index(now) + 1) * self.window_sec - now
+
+    def start_window(self, origin: float | None = None) -> float:
+        """
+        Window baru mulai di origin (default: sekarang), weight terpakai 0.
+        Untuk menyamakan batas window dengan server (test).
+        """
+        with self._cond:
+            self.window_origin = self.clock() if origin is None else origin
+            self._window = -1
+            self._roll(self.clock())
+            self._cond.notify_all()
+            return self.window_origin
+
+    def _ceiling(self, priority: int) -> float:
+        return self.limit * self.shares[priority]
+
+    def _fits(self, weight: int, priority: int, ahead: int) -> bool:
+        return self.used + self.inflight + ahead + weight <= self._ceiling(priority)
+
+    def predict_wait(self, weight: int, priority: int, now: float | None = None) -> float:
+        """
+        Perkiraan detik sampai request ini boleh jalan: weight yang antre di
+        prioritas >= ini jalan duluan, tiap window baru memuat ceiling prioritas.
+        """
+        now = now if now is not None else self.clock()
+        self._roll(now)
+        ahead = sum(q for p, q in self.queued.items() if p >= priority)
+        pause = max(0.0, self.paused_until - now)
+        if not pause and self._fits(weight, priority, ahead):
+            return 0.0
+        ceiling = self._ceiling(priority)
+        windows = max(1, math.ceil((ahead + weight) / ceiling))
+        wait = self._window_end(now) + self.window_sec * (windows - 1)
+        return max(wait, pause)
+
+    # ---------- izin ----------
+
+    def acquire(self, weight: int, priority: int = PRIORITY_ANALYSIS) -> None:
+        max_wait = self.max_wait[priority]
+        with self._cond:
+            now = self.clock()
+            wait = self.predict_wait(weight, priority, now)
+            if wait > 0:
+                if wait > max_wait:
+                    self.dropped[priority] += 1
+                    raise WeightBudgetExceeded(
+                        f"[{self.name}] weight {weight} ({PRIORITY_NAMES[priority]}) butuh tunggu "
+                        f"~{wait:.0f} s > {max_wait:.0f} s"
+                    )
+                self.delayed[priority] += 1
+                self._wait_slot(weight, priority, now + max_wait)
+            self.inflight += weight
+            self.admitted[priority] += 1
+
+    def _wait_slot(self, weight: int, priority: int, deadline: float) -> None:
+        self.queued[priority] += weight
+        try:
+            while True:
+                now = self.clock()
+                if now >= deadline:
+                    self.dropped[priority] += 1
+                    raise WeightBudgetExceeded(
+                        f"[{self.name}] weight {weight} ({PRIORITY_NAMES[priority]}) tidak dapat slot"
+                    )
+                # bangun saat window / pause berakhir, atau saat ada response (notify)
+                wake = max(self.paused_until - now, 0.0) or self._window_end(now)
+                self._cond.wait(timeout=min(wake, deadline - now) + 0.001)
+                now = self.clock()
+                self._roll(now)
+                if now < self.paused_until:
+                    continue
+                # prioritas lebih tinggi yang antre jalan duluan
+                ahead = sum(q for p, q in self.queued.items() if p > priority)
+                if self._fits(weight, priority, ahead):
+                    return
+        finally:
+            self.queued[priority] -= weight
+
+    def complete(self, weight: int, response: Any = None) -> None:
+        """
+        Request selesai: weight pindah dari in-flight ke terpakai, header
+        weight & Retry-After (429 / 418) diterapkan. response None = gagal
+        tanpa response (tetap dihitung, server mungkin sudah mencatat).
+        """
+        with self._cond:
+            now = self.clock()
+            self._roll(now)
+            self.inflight = max(0, self.inflight - weight)
+            self.used += weight
+            if response is not None:
+                headers = response.headers
+                used = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("x-mbx-used-weight-1m")
+                try:
+                    if used is not None:
+                        self.used = max(self.used, int(used))
+                except ValueError:
+                    pass
+                if response.status_code in (429, 418):
+                    self._pause(response.status_code, headers.get("Retry-After"), now)
+            self._cond.notify_all()
+
+    def _pause(self, status: int, retry_after: str | None, now: float) -> None:
+        try:
+            sec = float(retry_after)
+        except (TypeError, ValueError):
+            sec = self._window_end(now) if status == 429 else BAN_DEFAULT_SEC
+        if status == 418:
+            self.n_418 += 1
+        else:
+            self.n_429 += 1
+        if now + sec > self.paused_until:
+            self.paused_until = now + sec
+            print(f"[{self.name}] Binance {status}: semua request REST berhenti {sec:.0f} detik.")
+
+    # ---------- statistik ----------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._roll(self.clock())
+            return {
+                "market": self.name,
+                "limit": self.limit,
+                "used": self.used,
+                "inflight": self.inflight,
+                "queued": sum(self.queued.values()),
+                "paused_sec": max(0.0, self.paused_until - self.clock()),
+                "admitted": dict(self.admitted),
+                "delayed": dict(self.delayed),
+                "dropped": dict(self.dropped),
+                "http_429": self.n_429,
+                "http_418": self.n_418,
+            }
+
+    def summary(self) -> str:
+        s = self.stats()
+        text = (
+            f"{self.name} {s['used']}/{s['limit']}, antre {s['queued']}, "
+            f"tunda {sum(s['delayed'].values())}, buang {sum(s['dropped'].values())}, "
+            f"429 {s['http_429']}, 418 {s['http_418']}"
+        )
+        if s["paused_sec"]:
+            text += f", PAUSE {s['paused_sec']:.0f} s"
+        return text
+
+
+# ================== REGISTRY PER MARKET ==================
+
+_governors: Dict[str, WeightGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def governor_for(market: str) -> WeightGovernor:
+    gov = _governors.get(market)
+    if gov is None:
+        with _governors_lock:
+            gov = _governors.get(market)
+            if gov is None:
+                limit = MARKET_WEIGHT_LIMIT.get(market, BINANCE_WEIGHT_LIMIT_1M)
+                gov = _governors[market] = WeightGovernor(limit, name=market)
+    return gov
+
+
+def governed_get(
+    governor: WeightGovernor,
+    url: str,
+    params: Dict[str, Any] | None = None,
+    weight: int = 1,
+    priority: int = PRIORITY_ANALYSIS,
+    timeout: float | None = None,
+):
+    """
+    http_client.get dengan izin governor. Response dikembalikan apa adanya
+    (caller yang raise_for_status).
+    """
+    governor.acquire(weight, priority)
+    r = None
+    try:
+        r = http_client.get(url, params=params, timeout=timeout)
+        return r
+    finally:
+        governor.complete(weight, r)
+
+
+def summary() -> str:
+    return "; ".join(gov.summary() for gov in list(_governors.values())) or "belum ada request"
+
+
+# ================== CEK (FAKE EXCHANGE) ==================
+
+
+def run_check(n_symbols: int = 150, limit: int = 200, window_sec: float = 2.0) -> None:
+    """
+    0) governor dengan jam manual: window, jatah prioritas, Retry-After
+    1-3) burst backfill /klines ke fake exchange yang menegakkan weight_limit:
+    tanpa governor kena 429/418, dengan governor tidak; universe tetap
+    jalan saat backfill memenuhi budget; Retry-After menghentikan semua request
+    4) request yang menunggu di asyncio.to_thread tidak menahan event loop.
+    Batas window server & governor di-reset tepat sebelum burst, jadi hasil
+    tidak bergantung pada posisi jam.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    from exchange import SpotAdapter
+    from fake_exchange import FakeExchangeServer
+
+    # 0) tanpa network, tanpa tunggu
+    clock = [1000.0]
+    gov = WeightGovernor(
+        100, window_sec=10.0, name="cek", clock=lambda: clock[0], window_origin=1000.0,
+        max_wait={p: 0.0 for p in PRIORITY_SHARE},
+    )
+    for _ in range(7):
+        gov.acquire(10, PRIORITY_BACKFILL)
+        gov.complete(10)
+    assert gov.predict_wait(10, PRIORITY_BACKFILL) == 10.0, "backfill penuh di 70%"
+    gov.acquire(10, PRIORITY_UNIVERSE)  # cadangan prioritas lebih tinggi
+    gov.complete(10)
+    try:
+        gov.acquire(10, PRIORITY_BACKFILL)
+        raise AssertionError("backfill harus dibuang (max_wait 0)")
+    except WeightBudgetExceeded:
+        pass
+    clock[0] += 10.0
+    assert gov.predict_wait(70, PRIORITY_BACKFILL) == 0.0, "window baru, weight terpakai 0"
+    gov.complete(0, SimpleNamespace(status_code=429, headers={"Retry-After": "12"}))
+    assert gov.predict_wait(1, PRIORITY_UNIVERSE) == 12.0, "Retry-After menahan semua prioritas"
+    clock[0] += 12.0
+    assert gov.predict_wait(1, PRIORITY_UNIVERSE) == 0.0
+    print(f"jam manual     : {gov.summary()}")
+
+    symbols = [f"R{i:03d}USDT" for i in range(n_symbols)]
+
+    def burst(fetch) -> float:
+        start = time.time()
+        with ThreadPoolExecutor(16) as ex:
+            for fut in [ex.submit(fetch, s) for s in symbols]:
+                try:
+                    fut.result()
+                except Exception:
+                    pass
+        return time.time() - start
+
+    def fresh_server(window: float) -> FakeExchangeServer:
+        srv = FakeExchangeServer(market="spot", symbols=symbols, weight_limit=limit, weight_window_sec=window)
+        return srv.start()
+
+    # 1) tanpa governor: window panjang mulai tepat sebelum burst → burst
+    # (n_symbols x weight 2 > limit) pasti jatuh di 1 window
+    assert n_symbols * SpotAdapter.kline_weight(300) > limit
+    srv = fresh_server(60.0)
+    try:
+        url = f"{srv.rest_url}/api/v3/klines"
+        srv.reset_weight_window()
+        burst(lambda s: http_client.get(url, params={"symbol": s, "interval": "5m", "limit": 300}))
+        print(f"tanpa governor : {srv.n_429} x 429, {srv.n_418} x 418")
+        assert srv.n_429 + srv.n_418 > 0, "fake exchange harus menolak burst tanpa governor"
+    finally:
+        srv.stop()
+
+    # 2) dengan governor: semua backfill jalan (ditunda ke window berikutnya), 0 penolakan
+    srv = fresh_server(window_sec)
+    try:
+        adapter = SpotAdapter(rest_url=srv.rest_url)
+        gov = adapter.governor = WeightGovernor(
+            limit, window_sec=window_sec, name="spot",
+            max_wait={PRIORITY_BACKFILL: 30 * window_sec, PRIORITY_ANALYSIS: 0.5, PRIORITY_UNIVERSE: 30 * window_sec},
+        )
+        gov.start_window(srv.reset_weight_window())
+        results = {}
+
+        def universe_later() -> None:
+            time.sleep(0.05)
+            t = time.time()
+            adapter.list_universe(0, 0)
+            results["universe_sec"] = time.time() - t
+
+        t_uni = threading.Thread(target=universe_later)
+        t_uni.start()
+        elapsed = burst(lambda s: adapter.get_klines_raw(s, "5m", 300, priority=PRIORITY_BACKFILL))
+        t_uni.join()
+        try:
+            adapter.get_klines_raw(symbols[0], "5m", 300, priority=PRIORITY_ANALYSIS)
+            analysis = "diizinkan"
+        except WeightBudgetExceeded:
+            analysis = "dibuang (budget habis)"
+        s = gov.stats()
+        print(
+            f"dengan governor: {srv.n_429} x 429, {srv.n_418} x 418, backfill {s['admitted'][PRIORITY_BACKFILL]}"
+            f"/{n_symbols} dalam {elapsed:.1f} s ({s['delayed'][PRIORITY_BACKFILL]} ditunda), "
+            f"universe {results['universe_sec'] * 1000:.0f} ms, analisa saat penuh: {analysis}"
+        )
+        assert srv.n_429 == 0 and srv.n_418 == 0
+        assert s["admitted"][PRIORITY_BACKFILL] == n_symbols
+        assert results["universe_sec"] < window_sec * 2
+
+        # 3) Retry-After: 429 dari server → semua request berhenti selama pause
+        srv.force_retry_after = 1
+        try:
+            adapter.get_klines_raw(symbols[0], "5m", 50, priority=PRIORITY_UNIVERSE)
+        except Exception:
+            pass
+        t = time.time()
+        adapter.get_klines_raw(symbols[0], "5m", 50, priority=PRIORITY_UNIVERSE)
+        paused = time.time() - t
+        print(f"Retry-After 1 s: request berikutnya menunggu {paused:.2f} s, 418 {srv.n_418}")
+        assert paused >= 0.9 and srv.n_418 == 0
+
+        # 4) menunggu pause lewat asyncio.to_thread: request tetap jalan
+        # (tidak dibuang), event loop tetap berdetak
+        gov.paused_until = time.time() + 1
+
+        async def on_loop() -> tuple:
+            t = time.time()
+            task = asyncio.ensure_future(
+                asyncio.to_thread(adapter.get_klines_raw, symbols[0], "5m", 50, PRIORITY_UNIVERSE)
+            )
+            lag = 0.0
+            while not task.done():
+                tick = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lag = max(lag, time.perf_counter() - tick - 0.01)
+            rows = await task
+            return time.time() - t, lag, len(rows)
+
+        waited, lag, n_rows = asyncio.run(on_loop())
+        print(f"to_thread saat pause: selesai setelah {waited:.2f} s, {n_rows} candle, lag loop maks {lag * 1000:.0f} ms")
+        assert waited >= 0.9 and n_rows == 50 and lag < 0.1
+    finally:
+        srv.stop()
+    print("OK")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cek governor weight terhadap fake exchange")
+    parser.add_argument("--symbols", type=int, default=150)
+    parser.add_argument("--limit", type=int, default=200, help="weight_limit fake exchange per window")
+    parser.add_argument("--window", type=float, default=2.0, help="panjang window weight (detik)")
+    args = parser.parse_args()
+    run_check(args.symbols, args.limit, args.window)
@@ -1,28 +1,47 @@
-from typing import Dict
+import string
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from config import SIGNAL_TEMPLATE_DIR, DEFAULT_LANG
 
 
 def _mark(flag: bool) -> str:
     return "✅" if flag else "❌"
 
 
-def build_ipc_signal_message(
-    symbol: str,
-    levels: Dict[str, float],
-    conditions: Dict[str, bool],
-    score: int,
-    tier: str,
-) -> str:
+# ============ TEMPLATE (PRECOMPILED) ============
+
+
+class CompiledTemplate:
     """
-    Bangun teks sinyal IPC sesuai format yang kamu mau.
+    Template format-string yang di-parse sekali saat load.
+    render() hanya join literal + field (tanpa parsing ulang tiap sinyal).
+    Field mendukung format spec, contoh: {entry:.6f}
     """
 
-    entry = levels.get("entry", 0.0)
-    sl = levels.get("sl", 0.0)
-    tp1 = levels.get("tp1", 0.0)
-    tp2 = levels.get("tp2", 0.0)
-    tp3 = levels.get("tp3", 0.0)
+    def __init__(self, source: str):
+        self.source = source
+        self.parts: List[Tuple[str, str | None, str, str | None]] = []
+        for literal, field, spec, conv in string.Formatter().parse(source):
+            self.parts.append((literal, field, spec or "", conv))
+
+    def render(self, values: Dict[str, Any]) -> str:
+        out = []
+        for literal, field, spec, conv in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            v = values[field]
+            if conv == "r":
+                v = repr(v)
+            elif conv == "s":
+                v = str(v)
+            out.append(format(v, spec))
+        return "".join(out)
+
 
-    text = f"""🟦 IPC INTRADAY CONTINUATION SIGNAL — {symbol.upper()}
+DEFAULT_SIGNAL_TEMPLATE = """{header} — {symbol}
 
 IPC SCORE: {score}/130 — Tier {tier}
 
@@ -34,17 +53,214 @@ IPC SCORE: {score}/130 — Tier {tier}
 • TP3   : {tp3:.6f}
 
 📌 Checklist Wajib
-• Trend 1H          : {_mark(conditions.get("trend_1h_bullish", False))}
-• Struktur 15m      : {_mark(conditions.get("struct_15m_bullish", False))}
-• Pullback sehat    : {_mark(conditions.get("pullback_healthy", False))}
-• Anti-fake break   : {_mark(conditions.get("anti_fake_break", False))}
+{checklist_wajib}
 
 📌 Checklist Penguat
-• Impulse kuat      : {_mark(conditions.get("impulse_strong", False))}
-• Break lanjut      : {_mark(conditions.get("continuation_break", False))}
-• Volume kuat       : {_mark(conditions.get("volume_strong", False))}
+{checklist_penguat}
 
 📝 Catatan
 Free: maksimal 2 sinyal/hari. VIP: Unlimited sinyal.
-"""
-    return text
+{footer}"""
+
+# (key kondisi, label) — urutan sesuai checklist
+CHECKLIST_WAJIB = (
+    ("trend_1h_bullish", "Trend 1H          "),
+    ("struct_15m_bullish", "Struktur 15m      "),
+    ("pullback_healthy", "Pullback sehat    "),
+    ("anti_fake_break", "Anti-fake break   "),
+)
+CHECKLIST_WAJIB_SHORT = (
+    ("trend_1h_bearish", "Trend 1H          "),
+    ("struct_15m_bearish", "Struktur 15m      "),
+    ("pullback_healthy", "Pullback sehat    "),
+    ("anti_fake_break", "Anti-fake break   "),
+)
+CHECKLIST_PENGUAT = (
+    ("impulse_strong", "Impulse kuat      "),
+    ("continuation_break", "Break lanjut      "),
+    ("volume_strong", "Volume kuat       "),
+)
+
+# header per arah: (normal, provisional)
+_HEADERS = {
+    "long": ("🟦 IPC INTRADAY CONTINUATION SIGNAL", "⚡ IPC EARLY SIGNAL (PROVISIONAL)"),
+    "short": ("🟥 IPC INTRADAY CONTINUATION SIGNAL (SHORT)", "⚡ IPC EARLY SIGNAL SHORT (PROVISIONAL)"),
+}
+_FOOTER_PROVISIONAL = "⚠ Candle 5m belum close. Tunggu konfirmasi saat candle close.\n"
+
+# (lang, tier) → CompiledTemplate; tier "*" = semua tier
+_TEMPLATES: Dict[Tuple[str, str], CompiledTemplate] = {
+    (DEFAULT_LANG, "*"): CompiledTemplate(DEFAULT_SIGNAL_TEMPLATE),
+}
+
+
+def _tier_file_tag(tier: str) -> str:
+    return tier.replace("+", "plus")
+
+
+def load_signal_templates(template_dir: str = SIGNAL_TEMPLATE_DIR) -> int:
+    """
+    Load template opsional sekali saat startup:
+      <dir>/signal_<lang>.txt          → semua tier
+      <dir>/signal_<lang>_<tier>.txt   → tier tertentu (A+ ditulis "Aplus")
+    Return jumlah template yang di-load.
+    """
+    path = Path(template_dir)
+    if not path.is_dir():
+        return 0
+
+    tiers = {_tier_file_tag(t): t for t in ("A+", "A", "B")}
+    count = 0
+    for f in sorted(path.glob("signal_*.txt")):
+        parts = f.stem.split("_")[1:]
+        if not parts:
+            continue
+        lang = parts[0]
+        tier = tiers.get(parts[1], None) if len(parts) > 1 else "*"
+        if tier is None:
+            print(f"Template dilewati (tier tidak dikenal): {f.name}")
+            continue
+        try:
+            _TEMPLATES[(lang, tier)] = CompiledTemplate(f.read_text(encoding="utf-8"))
+            count += 1
+        except Exception as e:
+            print(f"Gagal load template {f.name}:", e)
+    return count
+
+
+def resolve_template_key(lang: str, tier: str) -> Tuple[str, str]:
+    """
+    Key template paling spesifik yang tersedia untuk (lang, tier).
+    """
+    for key in ((lang, tier), (lang, "*"), (DEFAULT_LANG, tier)):
+        if key in _TEMPLATES:
+            return key
+    return (DEFAULT_LANG, "*")
+
+
+@lru_cache(maxsize=None)
+def _checklist_block(items: Tuple[Tuple[str, str], ...], flags: Tuple[bool, ...]) -> str:
+    # hanya 2^n kombinasi → fragment checklist dibuat sekali per kombinasi
+    return "\n".join(f"• {label}: {_mark(flag)}" for (_, label), flag in zip(items, flags))
+
+
+def signal_values(
+    symbol: str,
+    levels: Dict[str, float],
+    conditions: Dict[str, bool],
+    score: int,
+    tier: str,
+    provisional: bool = False,
+) -> Dict[str, Any]:
+    direction = conditions.get("direction", "long")
+    wajib = CHECKLIST_WAJIB_SHORT if direction == "short" else CHECKLIST_WAJIB
+    values: Dict[str, Any] = {
+        "header": _HEADERS.get(direction, _HEADERS["long"])[1 if provisional else 0],
+        "direction": direction.upper(),
+        "footer": _FOOTER_PROVISIONAL if provisional else "",
+        "symbol": symbol.upper(),
+        "score": score,
+        "tier": tier,
+        "entry": levels.get("entry", 0.0),
+        "sl": levels.get("sl", 0.0),
+        "tp1": levels.get("tp1", 0.0),
+        "tp2": levels.get("tp2", 0.0),
+        "tp3": levels.get("tp3", 0.0),
+    }
+    for items, field in ((wajib, "checklist_wajib"), (CHECKLIST_PENGUAT, "checklist_penguat")):
+        flags = tuple(bool(conditions.get(key, False)) for key, _ in items)
+        values[field] = _checklist_block(items, flags)
+        for (key, _), flag in zip(items, flags):
+            values[f"check_{key}"] = _mark(flag)
+    # alias netral arah untuk template custom
+    values["check_trend_1h"] = _mark(bool(conditions.get(wajib[0][0], False)))
+    values["check_struct_15m"] = _mark(bool(conditions.get(wajib[1][0], False)))
+    return values
+
+
+def render_signal(values: Dict[str, Any], lang: str = DEFAULT_LANG) -> str:
+    return _TEMPLATES[resolve_template_key(lang, values["tier"])].render(values)
+
+
+def build_ipc_signal_message(
+    symbol: str,
+    levels: Dict[str, float],
+    conditions: Dict[str, bool],
+    score: int,
+    tier: str,
+    provisional: bool = False,
+) -> str:
+    """
+    Bangun teks sinyal IPC sesuai format yang kamu mau.
+    provisional=True → sinyal intrabar (candle 5m belum close).
+    """
+    values = signal_values(symbol, levels, conditions, score, tier, provisional=provisional)
+    return render_signal(values)
+
+
+def build_provisional_cancel_message(symbol: str) -> str:
+    return (
+        f"❌ Early signal *{symbol.upper()}* dibatalkan.\n"
+        "Candle 5m close tidak memenuhi syarat wajib IPC."
+    )
+
+
+def build_scan_report(
+    symbol: str,
+    market: str,
+    diagnosis: Dict[str, Any],
+    score: int,
+    tier: str,
+    cooldown_left: float = 0.0,
+) -> str:
+    """
+    Laporan /scan admin: checklist lengkap + score, juga untuk non-sinyal.
+    """
+    conditions = diagnosis.get("conditions")
+    if not conditions:
+        return f"🔎 *SCAN {symbol.upper()}* ({market})\n\n⚠ {diagnosis.get('reason', 'tidak ada data')}"
+
+    direction = conditions.get("direction", "long")
+    wajib = CHECKLIST_WAJIB_SHORT if direction == "short" else CHECKLIST_WAJIB
+    lines = [
+        f"🔎 *SCAN {symbol.upper()}* ({market})",
+        "",
+        f"Arah   : *{direction.upper()}*",
+        f"Score  : *{score}/130* — Tier {tier}",
+        "Status : " + ("✅ Sinyal valid" if diagnosis.get("signal") else "❌ Bukan sinyal"),
+        f"Ket    : {diagnosis.get('reason', '')}",
+    ]
+    if cooldown_left > 0:
+        lines.append(f"⏲️ Cooldown aktif: {cooldown_left / 60:.0f} menit lagi")
+    for title, items in (("📌 Checklist Wajib", wajib), ("📌 Checklist Penguat", CHECKLIST_PENGUAT)):
+        flags = tuple(bool(conditions.get(key, False)) for key, _ in items)
+        lines += ["", title, _checklist_block(items, flags)]
+
+    levels = diagnosis.get("levels")
+    if levels:
+        lines += [
+            "",
+            "💰 Level (referensi)",
+            f"• Entry : {levels['entry']:.6f}",
+            f"• SL    : {levels['sl']:.6f}",
+            f"• TP1   : {levels['tp1']:.6f}",
+        ]
+    return "\n".join(lines)
+
+
+def build_scanall_summary(rows: List[Dict[str, Any]], total: int, elapsed: float, top: int) -> str:
+    """
+    rows sudah urut ranking: {"symbol", "direction", "score", "tier", "signal"}.
+    """
+    n_signal = sum(1 for r in rows if r["signal"])
+    lines = [
+        "📊 *SCAN ALL*",
+        f"{total} pair dalam {elapsed:.1f} detik — {n_signal} sinyal valid",
+        "",
+    ]
+    for i, r in enumerate(rows[:top], 1):
+        mark = "✅" if r["signal"] else "▫️"
+        lines.append(f"{i}. {mark} `{r['symbol']}` {r['direction'].upper()} — {r['score']} ({r['tier']})")
+    if not rows:
+        lines.append("Tidak ada data.")
+    return "\n".join(lines)
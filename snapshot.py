@@ -0,0 +1,149 @@
+# snapshot.py
+#
+# Snapshot state scan untuk warm restart:
+# - status scan & min tier (cooldown/dedupe disimpan sendiri oleh CooldownEngine)
+# - universe pair per market + waktu refresh terakhir
+# - cache indikator (arah trend 1h / struktur 15m per symbol)
+# - ekor candle store bar engine (mode stream)
+#
+# Format: 1 file .npz (binary numpy, terkompresi):
+#   "meta"            → JSON (uint8)
+#   "candles_<market>" → float64 (n, 6), semua (symbol, tf) disambung;
+#                        offset & panjang tiap seri ada di meta
+# Ditulis ke file sementara lalu os.replace (tidak pernah setengah jadi).
+
+import asyncio
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+from config import SNAPSHOT_FILE, SNAPSHOT_INTERVAL_SEC, SNAPSHOT_MAX_AGE_HOURS
+
+SNAPSHOT_VERSION = 1
+
+
+def build_snapshot(state) -> Dict[str, np.ndarray]:
+    meta: Dict[str, Any] = {
+        "version": SNAPSHOT_VERSION,
+        "saved_ts": time.time(),
+        "scanning_enabled": state.scanning_enabled,
+        "paused": state.paused,
+        "min_tier": state.min_tier,
+        "markets": {},
+    }
+    arrays: Dict[str, np.ndarray] = {}
+
+    for market, uni in state.universe.items():
+        m: Dict[str, Any] = {
+            "symbols": list(uni.get("symbols", [])),
+            "refreshed": uni.get("refreshed", 0.0),
+        }
+        scanner = state.stream_scanners.get(market)
+        if scanner is not None:
+            candles, flags = scanner.export_state()
+            series = []
+            parts = []
+            offset = 0
+            for symbol, by_tf in candles.items():
+                for tf, arr in by_tf.items():
+                    if not len(arr):
+                        continue
+                    series.append([symbol, tf, offset, len(arr)])
+                    parts.append(arr)
+                    offset += len(arr)
+            m["series"] = series
+            m["tf_flags"] = flags
+            if parts:
+                arrays[f"candles_{market}"] = np.concatenate(parts).astype(np.float64, copy=False)
+        meta["markets"][market] = m
+
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+    return arrays
+
+
+def write_snapshot(arrays: Dict[str, np.ndarray], path: str = SNAPSHOT_FILE) -> int:
+    """
+    Kompres & tulis hasil build_snapshot (atomic, aman dijalankan di thread).
+    Return ukuran file (byte).
+    """
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    data = buf.getvalue()
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, target)
+    return len(data)
+
+
+def save_snapshot(state, path: str = SNAPSHOT_FILE) -> int:
+    return write_snapshot(build_snapshot(state), path)
+
+
+def load_snapshot(path: str = SNAPSHOT_FILE, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS) -> Dict[str, Any] | None:
+    """
+    Baca snapshot. None kalau tidak ada, rusak, versi beda, atau terlalu lama.
+    Return meta + "candles": {market: {symbol: {tf: ndarray}}}.
+    """
+    target = Path(path)
+    if not target.exists():
+        return None
+    try:
+        with np.load(target, allow_pickle=False) as z:
+            meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != SNAPSHOT_VERSION:
+                return None
+            if time.time() - float(meta.get("saved_ts", 0)) > max_age_hours * 3600:
+                print("Snapshot terlalu lama, diabaikan.")
+                return None
+            candles: Dict[str, Dict[str, Dict[str, np.ndarray]]] = {}
+            for market, m in meta.get("markets", {}).items():
+                key = f"candles_{market}"
+                if key not in z.files:
+                    continue
+                flat = z[key]
+                per_symbol: Dict[str, Dict[str, np.ndarray]] = {}
+                for symbol, tf, offset, n in m.get("series", []):
+                    per_symbol.setdefault(symbol, {})[tf] = flat[offset:offset + n]
+                candles[market] = per_symbol
+    except Exception as e:
+        print("Gagal baca snapshot:", e)
+        return None
+    meta["candles"] = candles
+    return meta
+
+
+def apply_snapshot(state, snap: Dict[str, Any]) -> None:
+    """
+    Pulihkan field state dari snapshot. Candle & cache indikator disimpan di
+    state.snapshot_candles / state.snapshot_flags, diambil scan_loop per market.
+    """
+    state.scanning_enabled = bool(snap.get("scanning_enabled", False))
+    state.paused = bool(snap.get("paused", False))
+    state.min_tier = snap.get("min_tier", state.min_tier)
+    for market, m in snap.get("markets", {}).items():
+        state.universe[market] = {"symbols": list(m.get("symbols", [])), "refreshed": float(m.get("refreshed", 0.0))}
+        state.snapshot_flags[market] = m.get("tf_flags", {})
+    state.snapshot_candles.update(snap.get("candles", {}))
+
+
+async def snapshot_loop(state, interval_sec: float = SNAPSHOT_INTERVAL_SEC) -> None:
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            # copy state di event loop, kompres + tulis file di thread
+            arrays = build_snapshot(state)
+            size = await asyncio.to_thread(write_snapshot, arrays)
+            print(f"Snapshot state tersimpan ({size / 1024:.0f} KB).")
+        except Exception as e:
+            print("Gagal simpan snapshot:", e)
@@ -0,0 +1,136 @@
+# startup.py
+#
+# Startup cepat (restart systemd kembali online < 1 detik):
+# - modul berat (pandas, ipc_logic) tidak diimport saat start; di-warm di thread
+#   background setelah bot online, jadi analisa pertama tidak menahan loop
+# - file state (subscriber, snapshot, template, outcome) dibaca paralel
+#
+# Benchmark:
+#   python startup.py                (import main + waktu sampai online)
+#   python startup.py --users 100000
+
+import asyncio
+import importlib
+import time
+from typing import Any, Callable, Dict, Iterable
+
+# diimport lazy: ipc_logic (+ kernels, swings) oleh main / ondemand saat
+# analisa pertama, pandas oleh ipc_logic (jalur DataFrame)
+HEAVY_MODULES = ("ipc_logic", "pandas")
+
+
+async def prewarm_imports(modules: Iterable[str] = HEAVY_MODULES) -> None:
+    """
+    Import modul berat di thread terpisah (tidak memblok event loop).
+    """
+    start = time.perf_counter()
+    for name in modules:
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except Exception as e:
+            print(f"Gagal pre-import {name}:", e)
+    print(f"Pre-import {', '.join(modules)} selesai ({(time.perf_counter() - start) * 1000:.0f} ms, background).")
+
+
+async def load_concurrently(loaders: Dict[str, Callable[[], Any] | None]) -> Dict[str, Any]:
+    """
+    Jalankan loader file state paralel di thread. Loader None → hasil None.
+    """
+    names = [name for name, fn in loaders.items() if fn is not None]
+    results = await asyncio.gather(*(asyncio.to_thread(loaders[name]) for name in names))
+    out = dict.fromkeys(loaders)
+    out.update(zip(names, results))
+    return out
+
+
+# ================== BENCHMARK ==================
+
+
+def _import_time(module: str, rounds: int) -> float:
+    """
+    Median waktu import modul di interpreter baru (cold, tanpa cache modul).
+    """
+    import statistics
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(rounds):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def _time_to_online(n_users: int) -> tuple:
+    """
+    Jalankan main.py (fake Binance + fake Telegram, workdir sementara):
+    detik sampai polling Telegram pertama & pesan ONLINE admin diterima.
+    """
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    from pathlib import Path
+
+    from fake_exchange import FakeExchangeServer
+    from fake_telegram import FakeTelegramServer
+    from loadtest import ADMIN_ID, TOKEN, write_subscribers
+
+    exchange = FakeExchangeServer(market="spot", symbols=["BTCUSDT", "ETHUSDT"]).start()
+    telegram = FakeTelegramServer(token=TOKEN).start()
+    workdir = Path(tempfile.mkdtemp(prefix="ipc_startup_"))
+    write_subscribers(workdir, n_users)
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_TOKEN": TOKEN,
+        "TELEGRAM_ADMIN_ID": str(ADMIN_ID),
+        "TELEGRAM_API_URL": telegram.api_url,
+        "BINANCE_REST_URL": exchange.rest_url,
+        "BINANCE_STREAM_URL": exchange.stream_url,
+        "MARKETS": "spot",
+    })
+    t_online = t_msg = float("nan")
+    start = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve().parent / "main.py")],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + 30
+        while time.time() < deadline and (t_online != t_online or t_msg != t_msg):
+            if telegram.get_updates_calls and t_online != t_online:
+                t_online = time.time() - start
+            if telegram.sent and t_msg != t_msg:
+                t_msg = telegram.sent[0][0] - start
+            time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        exchange.stop()
+        telegram.stop()
+    return t_online, t_msg
+
+
+def run_benchmark(n_users: int = 10_000, rounds: int = 5) -> None:
+    print(f"import pandas     : {_import_time('pandas', rounds) * 1000:7.0f} ms (cold)")
+    print(f"import main       : {_import_time('main', rounds) * 1000:7.0f} ms (cold)")
+    online = [_time_to_online(n_users) for _ in range(rounds)]
+    online.sort()
+    mid = online[len(online) // 2]
+    print(f"start → polling   : {mid[0] * 1000:7.0f} ms (median {rounds}x, {n_users} subscriber)")
+    print(f"start → pesan ONLINE diterima: {mid[1] * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark startup bot")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.users, args.rounds)
@@ -1,19 +1,25 @@
 # storage.py
 
 import json
+import os
+import time
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from typing import Dict
+from typing import Callable, Dict, List
 
-from config import SIGNAL_COOLDOWN_SECONDS
+from config import SIGNAL_COOLDOWN_SECONDS, PREF_TZ_OFFSET_HOURS, PREF_MAX_SYMBOLS
+from ipc_scoring import TIER_ORDER
 
+# folder dibuat saat file pertama ditulis (_save_json), bukan saat import
 DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
 
 SUBSCRIBERS_FILE = DATA_DIR / "subscribers.json"
 VIP_FILE = DATA_DIR / "vip_users.json"
 STATS_FILE = DATA_DIR / "stats.json"
 COOLDOWN_FILE = DATA_DIR / "cooldown.json"
+OPEN_SIGNALS_FILE = DATA_DIR / "open_signals.json"
+OUTCOMES_FILE = DATA_DIR / "outcomes.jsonl"
+SIGNAL_MEMORY_FILE = DATA_DIR / "signal_memory.json"
 
 FREE_SIGNALS_PER_DAY = 2  # sama seperti SMC: free 2 sinyal/hari
 
@@ -30,8 +36,12 @@ def _load_json(path: Path, default):
 
 
 def _save_json(path: Path, data):
+    # tulis ke file sementara lalu rename → file tidak pernah setengah jadi
+    # walau proses dimatikan di tengah penulisan
     path.parent.mkdir(exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
 
 
 # ============ SUBSCRIBERS ============
@@ -144,16 +154,167 @@ def is_paused(user: dict) -> bool:
     return datetime.now(timezone.utc) < dt
 
 
-# ============ COOLDOWN GLOBAL ============
+# ============ PREFERENSI USER ============
+# Disimpan di dict user (subscribers.json), semua opsional:
+#   "min_tier"    : "A" / "A+" (tidak ada = ikut min tier global)
+#   "watchlist"   : ["BTCUSDT", ...] hanya symbol ini (tidak ada = semua)
+#   "mute"        : ["DOGEUSDT", ...] symbol yang tidak mau diterima
+#   "quiet_hours" : [22, 6] jam mulai & selesai (zona PREF_TZ_OFFSET_HOURS)
+# Symbol tanpa suffix market → berlaku untuk spot & futures (BTCUSDT.P).
 
-def get_cooldown_seconds() -> int:
+def normalize_symbols(symbols) -> List[str]:
+    out: List[str] = []
+    for s in symbols or []:
+        sym = str(s).strip().upper().split(".", 1)[0]
+        if sym and sym not in out:
+            out.append(sym)
+    return out[:PREF_MAX_SYMBOLS]
+
+
+def set_min_tier(user: dict, tier: str | None):
+    if tier in TIER_ORDER and TIER_ORDER[tier] > 0:
+        user["min_tier"] = tier
+    else:
+        user.pop("min_tier", None)
+
+
+def set_watchlist(user: dict, symbols):
+    symbols = normalize_symbols(symbols)
+    if symbols:
+        user["watchlist"] = symbols
+    else:
+        user.pop("watchlist", None)
+
+
+def mute_symbols(user: dict, symbols):
+    user["mute"] = normalize_symbols(list(user.get("mute") or []) + list(symbols))
+    if not user["mute"]:
+        user.pop("mute")
+
+
+def unmute_symbols(user: dict, symbols=None):
+    """
+    symbols None → hapus semua mute.
+    """
+    drop = set(normalize_symbols(symbols)) if symbols is not None else None
+    keep = [s for s in user.get("mute") or [] if drop is not None and s not in drop]
+    if keep:
+        user["mute"] = keep
+    else:
+        user.pop("mute", None)
+
+
+def set_quiet_hours(user: dict, start: int | None, end: int | None = None):
+    if start is None or end is None or int(start) % 24 == int(end) % 24:
+        user.pop("quiet_hours", None)
+    else:
+        user["quiet_hours"] = [int(start) % 24, int(end) % 24]
+
+
+def local_hour(now: float | None = None) -> int:
+    ts = now if now is not None else time.time()
+    return int((ts / 3600 + PREF_TZ_OFFSET_HOURS) % 24)
+
+
+def quiet_hours_contain(start: int, end: int, hour: int) -> bool:
+    # rentang boleh lewat tengah malam (22-6)
+    return start <= hour < end if start < end else hour >= start or hour < end
+
+
+def accepts_signal(user: dict, symbol: str, tier: str, now: float | None = None) -> bool:
+    """
+    Cek preferensi 1 user (acuan; dispatch pakai index di SubscriberTable).
+    """
+    min_tier = user.get("min_tier")
+    if min_tier and TIER_ORDER.get(tier, 0) < TIER_ORDER.get(min_tier, 0):
+        return False
+    base = symbol.upper().split(".", 1)[0]
+    watch = user.get("watchlist")
+    if watch and base not in watch:
+        return False
+    if base in (user.get("mute") or []):
+        return False
+    quiet = user.get("quiet_hours")
+    if quiet and quiet_hours_contain(quiet[0], quiet[1], local_hour(now)):
+        return False
+    return True
+
+
+# ============ COOLDOWN ============
+
+# callback(config) dipanggil tiap kali cooldown.json diubah lewat fungsi di bawah
+_cooldown_listeners: List[Callable[[dict], None]] = []
+
+
+def on_cooldown_change(callback: Callable[[dict], None]):
+    _cooldown_listeners.append(callback)
+
+
+def off_cooldown_change(callback: Callable[[dict], None]):
+    try:
+        _cooldown_listeners.remove(callback)
+    except ValueError:
+        pass
+
+
+def load_cooldown_config() -> dict:
+    """
+    Format:
+    {
+      "cooldown_seconds": 900,          # default semua pair
+      "tiers":   {"A+": 600},           # override per tier sinyal terakhir
+      "symbols": {"BTCUSDT": 1800}      # override per pair (paling kuat)
+    }
+    """
     data = _load_json(COOLDOWN_FILE, {})
-    return int(data.get("cooldown_seconds", SIGNAL_COOLDOWN_SECONDS))
+    return {
+        "cooldown_seconds": int(data.get("cooldown_seconds", SIGNAL_COOLDOWN_SECONDS)),
+        "tiers": {k: int(v) for k, v in (data.get("tiers") or {}).items()},
+        "symbols": {k.upper(): int(v) for k, v in (data.get("symbols") or {}).items()},
+    }
+
+
+def save_cooldown_config(config: dict):
+    _save_json(COOLDOWN_FILE, config)
+    for cb in list(_cooldown_listeners):
+        try:
+            cb(config)
+        except Exception as e:
+            print("Error listener cooldown:", e)
+
+
+def get_cooldown_seconds() -> int:
+    return load_cooldown_config()["cooldown_seconds"]
 
 
 def set_cooldown_seconds(seconds: int):
-    data = {"cooldown_seconds": int(seconds)}
-    _save_json(COOLDOWN_FILE, data)
+    config = load_cooldown_config()
+    config["cooldown_seconds"] = int(seconds)
+    save_cooldown_config(config)
+
+
+def set_cooldown_override(kind: str, key: str, seconds: int):
+    """
+    kind "tiers" / "symbols". seconds <= 0 → hapus override.
+    """
+    config = load_cooldown_config()
+    table = config[kind]
+    key = key.upper()
+    if seconds > 0:
+        table[key] = int(seconds)
+    else:
+        table.pop(key, None)
+    save_cooldown_config(config)
+
+
+# ============ MEMORI SINYAL (COOLDOWN + DEDUPE) ============
+
+def load_signal_memory() -> dict:
+    return _load_json(SIGNAL_MEMORY_FILE, {})
+
+
+def save_signal_memory(data: dict):
+    _save_json(SIGNAL_MEMORY_FILE, data)
 
 
 # ============ LIMIT HARIAN ============
@@ -205,9 +366,58 @@ def save_stats(stats):
 
 
 def bump_stats(symbol: str):
+    bump_stats_many([symbol])
+
+
+def bump_stats_many(symbols: List[str]):
+    """
+    Update stats untuk banyak sinyal sekaligus (1x baca + 1x tulis file).
+    symbols urut ranking batch (terbaik dulu) → last_symbol = sinyal teratas.
+    """
+    if not symbols:
+        return
     stats = load_stats()
-    stats["signals_today_total"] = int(stats.get("signals_today_total", 0)) + 1
-    stats["total_signals"] = int(stats.get("total_signals", 0)) + 1
-    stats["last_symbol"] = symbol
+    stats["signals_today_total"] = int(stats.get("signals_today_total", 0)) + len(symbols)
+    stats["total_signals"] = int(stats.get("total_signals", 0)) + len(symbols)
+    stats["last_symbol"] = symbols[0]
     stats["last_signal_time"] = datetime.now(timezone.utc).isoformat()
     save_stats(stats)
+
+
+# ============ OUTCOME SINYAL ============
+
+def load_open_signals() -> List[dict]:
+    return _load_json(OPEN_SIGNALS_FILE, [])
+
+
+def save_open_signals(signals: List[dict]):
+    _save_json(OPEN_SIGNALS_FILE, signals)
+
+
+def record_outcome(record: dict):
+    """
+    Simpan hasil akhir 1 sinyal:
+    - append 1 baris ke outcomes.jsonl (detail, untuk analisa)
+    - counter per hasil di stats.json ("outcomes": {"TP1": n, "SL": n, ...})
+    """
+    OUTCOMES_FILE.parent.mkdir(exist_ok=True)
+    with OUTCOMES_FILE.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    stats = load_stats()
+    outcomes = stats.setdefault("outcomes", {})
+    result = record.get("result", "UNKNOWN")
+    outcomes[result] = int(outcomes.get(result, 0)) + 1
+    save_stats(stats)
+
+
+def outcome_summary(stats: dict) -> str:
+    """
+    Ringkasan 1 baris dari stats["outcomes"], contoh: "TP 12 / SL 5 (winrate 70.6%)".
+    """
+    outcomes = stats.get("outcomes") or {}
+    wins = sum(int(v) for k, v in outcomes.items() if k.startswith("TP"))
+    losses = int(outcomes.get("SL", 0))
+    if wins + losses == 0:
+        return "-"
+    return f"TP {wins} / SL {losses} (winrate {wins / (wins + losses) * 100:.1f}%)"
@@ -0,0 +1,367 @@
+# stream_scanner.py
+#
+# Menghubungkan BarEngine dengan detector IPC:
+# - 1h close  → hitung arah trend 1h (cache per symbol, +1 / -1 / 0)
+# - 15m close → hitung arah struktur 15m (cache per symbol)
+# - 5m close  → kandidat dikumpulkan per bar, dianalisa 1 batch (detector
+#               5m + cache 1h/15m) → callback hasil; dispatcher ditahan
+#               (on_batch_start / on_batch_end) sampai batch selesai supaya
+#               seleksi sinyal per bar melihat semua kandidat
+#
+# Tidak ada REST per candle; REST hanya untuk backfill awal / setelah gap.
+# 1 scanner per market (spot / futures); backfill lewat fetch_klines adapter,
+# hasil dikirim dengan signal_key (mis. "BTCUSDT.P") supaya tidak bentrok.
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from bar_engine import BarEngine, TF_MS
+from config import LIMIT_KLINES, BACKFILL_CONCURRENCY, BAR_COLLECT_SEC
+from ipc_logic import (
+    analyse_ipc_frames,
+    array_to_frame,
+    detect_struct_15m_direction,
+    detect_trend_1h_direction,
+    filter_direction,
+    frame_to_array,
+    get_klines,
+)
+from swings import SwingTracker
+
+# jeda minimal antar backfill gap (kalau REST gagal, jangan spam)
+GAP_BACKFILL_RETRY_SEC = 30
+
+ResultCallback = Callable[[str, dict | None, dict | None], None]
+
+
+class StreamScanner:
+    """
+    state per symbol: {"trend_1h": int, "struct_15m": int} (arah +1 / -1 / 0)
+    """
+
+    def __init__(
+        self,
+        engine: BarEngine,
+        on_result: ResultCallback,
+        should_analyse: Callable[[str], bool],
+        pool=None,
+        fetch_klines: Callable | None = None,
+        signal_key: Callable[[str], str] | None = None,
+        on_batch_start: Callable[[], None] | None = None,
+        on_batch_end: Callable[[], None] | None = None,
+        collect_sec: float = BAR_COLLECT_SEC,
+    ):
+        self.engine = engine
+        self.on_result = on_result
+        self.should_analyse = should_analyse
+        self.pool = pool
+        self.fetch_klines = fetch_klines or get_klines
+        self.signal_key = signal_key or (lambda s: s)
+        self.tf_flags: Dict[str, Dict[str, bool]] = {}
+        # cache swing per symbol: {"15m": SwingTracker, "5m": SwingTracker}
+        self.swings: Dict[str, Dict[str, SwingTracker]] = {}
+        self._tasks: set = set()
+        self._backfilling: set = set()
+        self._last_gap_backfill = 0.0
+        # candle dari snapshot (warm restart) yang belum di-seed ke engine
+        self._restored: Dict[str, Dict[str, np.ndarray]] = {}
+        # batch per bar 5m (open time): kandidat, jumlah pair yang sudah close
+        self.on_batch_start = on_batch_start
+        self.on_batch_end = on_batch_end
+        self.collect_sec = collect_sec
+        self._bar_batch: Dict[int, List[str]] = {}
+        self._bar_seen: Dict[int, int] = {}
+        self._bar_complete: Dict[int, asyncio.Event] = {}
+        # jam market (replay capture: jam rekaman, lihat capture.py)
+        self.clock: Callable[[], float] = time.time
+
+        engine.subscribe("1h", self._on_1h_close)
+        engine.subscribe("15m", self._on_15m_close)
+        engine.subscribe("5m", self._on_5m_close)
+
+    # ---------- detector per timeframe ----------
+
+    def _update_trend_1h(self, symbol: str) -> None:
+        df_1h = array_to_frame(self.engine.bars(symbol, "1h"))
+        self.tf_flags.setdefault(symbol, {})["trend_1h"] = detect_trend_1h_direction(df_1h)
+
+    def swing_tracker(self, symbol: str, tf: str) -> SwingTracker:
+        trackers = self.swings.setdefault(symbol, {})
+        tracker = trackers.get(tf)
+        if tracker is None:
+            tracker = trackers[tf] = SwingTracker()
+        return tracker
+
+    def _update_struct_15m(self, symbol: str) -> None:
+        df_15m = array_to_frame(self.engine.bars(symbol, "15m"))
+        self.tf_flags.setdefault(symbol, {})["struct_15m"] = detect_struct_15m_direction(
+            df_15m, self.swing_tracker(symbol, "15m")
+        )
+
+    def qualified_direction(self, symbol: str) -> str | None:
+        """
+        Arah yang lolos filter 1h/15m dari cache, atau None.
+        """
+        flags = self.tf_flags.get(symbol, {})
+        return filter_direction(flags.get("trend_1h", 0), flags.get("struct_15m", 0))
+
+    def _on_1h_close(self, symbol: str, tf: str, bar) -> None:
+        self._update_trend_1h(symbol)
+
+    def _on_15m_close(self, symbol: str, tf: str, bar) -> None:
+        self._update_struct_15m(symbol)
+
+    def _on_5m_close(self, symbol: str, tf: str, bar) -> None:
+        bar_ts = int(bar[0])
+        if bar_ts not in self._bar_seen:
+            # bar baru → buang hitungan bar lama yang tidak punya kandidat
+            for old in [t for t in self._bar_seen if t < bar_ts and t not in self._bar_batch]:
+                del self._bar_seen[old]
+            self._bar_seen[bar_ts] = 0
+        self._bar_seen[bar_ts] += 1
+
+        # filter 1h/15m gagal → tidak perlu hitung detector 5m
+        if self.should_analyse(self.signal_key(symbol)) and self.qualified_direction(symbol) is not None:
+            batch = self._bar_batch.get(bar_ts)
+            if batch is None:
+                batch = self._bar_batch[bar_ts] = []
+                self._bar_complete[bar_ts] = asyncio.Event()
+                if self.on_batch_start is not None:
+                    self.on_batch_start()
+                task = asyncio.create_task(self._run_bar(bar_ts))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            batch.append(symbol)
+
+        # semua pair sudah close → batch tidak perlu menunggu collect_sec
+        event = self._bar_complete.get(bar_ts)
+        if event is not None and self._bar_seen[bar_ts] >= len(self.engine.symbols()):
+            event.set()
+
+    def in_batch(self, symbol: str, bar_ts: int) -> bool:
+        """
+        True kalau symbol ikut batch analisa close bar ini (hasilnya pasti
+        lewat on_result, termasuk gagal = None).
+        """
+        return symbol in self._bar_batch.get(int(bar_ts), ())
+
+    async def _run_bar(self, bar_ts: int) -> None:
+        """
+        Analisa semua kandidat 1 bar sekaligus, lalu lepas tahanan dispatcher.
+        """
+        try:
+            try:
+                await asyncio.wait_for(self._bar_complete[bar_ts].wait(), timeout=self.collect_sec)
+            except asyncio.TimeoutError:
+                pass
+            symbols = self._bar_batch.pop(bar_ts, [])
+            self._bar_complete.pop(bar_ts, None)
+            self._bar_seen.pop(bar_ts, None)
+
+            if self.pool is None:
+                for symbol in symbols:
+                    conditions, levels = self.analyse_now(symbol)
+                    self.on_result(self.signal_key(symbol), conditions, levels)
+            else:
+                await asyncio.gather(*(self._analyse_pooled(s) for s in symbols))
+
+            close_ms = bar_ts + TF_MS["5m"]
+            print(
+                f"Batch bar 5m: {len(symbols)} kandidat dianalisa, "
+                f"selesai {self.clock() * 1000 - close_ms:.0f} ms setelah close."
+            )
+        finally:
+            if self.on_batch_end is not None:
+                self.on_batch_end()
+
+    # ---------- analisa ----------
+
+    def analyse_now(self, symbol: str):
+        flags = self.tf_flags.get(symbol, {})
+        return analyse_ipc_frames(
+            symbol,
+            array_to_frame(self.engine.bars(symbol, "1h")),
+            array_to_frame(self.engine.bars(symbol, "15m")),
+            array_to_frame(self.engine.bars(symbol, "5m")),
+            trend_1h=flags.get("trend_1h", 0),
+            struct_15m=flags.get("struct_15m", 0),
+            swings_5m=self.swing_tracker(symbol, "5m"),
+        )
+
+    async def _analyse_pooled(self, symbol: str) -> None:
+        frames = {tf: self.engine.bars(symbol, tf) for tf in ("1h", "15m", "5m")}
+        flags = self.tf_flags.get(symbol, {})
+        key = self.signal_key(symbol)
+        try:
+            conditions, levels = await self.pool.analyse(
+                key,
+                frames,
+                trend_1h=flags.get("trend_1h", 0),
+                struct_15m=flags.get("struct_15m", 0),
+            )
+        except Exception as e:
+            print(f"[{key}] ERROR analisa pool:", e)
+            conditions, levels = None, None
+        self.on_result(key, conditions, levels)
+
+    # ---------- backfill ----------
+
+    def _fetch_history(self, symbol: str) -> Dict:
+        return {tf: frame_to_array(self.fetch_klines(symbol, tf, LIMIT_KLINES)) for tf in self.engine.timeframes}
+
+    async def backfill(self, symbols: Iterable[str]) -> int:
+        """
+        Backfill REST paralel (dibatasi BACKFILL_CONCURRENCY). Return jumlah
+        symbol yang berhasil.
+        """
+        sem = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        ok = 0
+
+        async def one(symbol: str) -> None:
+            nonlocal ok
+            async with sem:
+                try:
+                    hist = await asyncio.to_thread(self._fetch_history, symbol)
+                except Exception as e:
+                    print(f"[{symbol}] Gagal backfill:", e)
+                    return
+            base = hist.pop(self.engine.base_tf)
+            self.engine.seed(symbol, base, hist, now_ms=int(self.clock() * 1000))
+            self._update_trend_1h(symbol)
+            self._update_struct_15m(symbol)
+            ok += 1
+
+        await asyncio.gather(*(one(s.upper()) for s in symbols))
+        return ok
+
+    def in_flight(self) -> set:
+        """
+        Task analisa pool yang masih jalan (ditunggu saat shutdown).
+        """
+        return set(self._tasks)
+
+    # ---------- snapshot (warm restart) ----------
+
+    def export_state(self) -> Tuple[Dict[str, Dict[str, np.ndarray]], Dict[str, Dict[str, int]]]:
+        """
+        Candle closed per (symbol, tf) + cache arah 1h/15m, untuk snapshot.
+        """
+        candles = {
+            sym: {tf: self.engine.bars(sym, tf) for tf in self.engine.timeframes}
+            for sym in self.engine.symbols()
+        }
+        return candles, {sym: dict(flags) for sym, flags in self.tf_flags.items()}
+
+    def restore_state(self, candles: Dict[str, Dict[str, np.ndarray]], flags: Dict[str, Dict[str, int]]) -> None:
+        """
+        Simpan candle snapshot; di-seed saat sync_universe (cukup fetch ekor
+        candle yang terlewat selama bot mati, bukan backfill penuh).
+        """
+        self._restored.update(candles)
+        for sym, f in flags.items():
+            self.tf_flags[sym] = {k: int(v) for k, v in f.items()}
+
+    def _fetch_tail(self, symbol: str, hist: Dict[str, np.ndarray]) -> Tuple[Dict, set] | None:
+        """
+        Gabung candle snapshot + candle yang terlewat. Return (history, tf yang
+        dapat candle closed baru), atau None kalau perlu backfill penuh.
+        """
+        now_ms = int(self.clock() * 1000)
+        out: Dict[str, np.ndarray] = {}
+        updated = set()
+        for tf in self.engine.timeframes:
+            rows = hist.get(tf)
+            if rows is None or not len(rows):
+                return None
+            step = TF_MS[tf]
+            # candle closed yang belum ada di snapshot
+            missing = (now_ms - int(rows[-1, 0])) // step - 1
+            if missing >= self.engine.max_bars:
+                return None
+            if missing < 1:
+                out[tf] = rows
+                continue
+            new = frame_to_array(self.fetch_klines(symbol, tf, int(missing) + 2))
+            out[tf] = np.concatenate([rows[rows[:, 0] < new[0, 0]], new])
+            updated.add(tf)
+        return out, updated
+
+    async def restore_backfill(self, symbols: Iterable[str]) -> list:
+        """
+        Seed symbol dari snapshot. Return symbol yang tetap butuh backfill penuh.
+        """
+        sem = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        fallback = []
+
+        async def one(symbol: str) -> None:
+            hist = self._restored.pop(symbol)
+            async with sem:
+                try:
+                    res = await asyncio.to_thread(self._fetch_tail, symbol, hist)
+                except Exception as e:
+                    print(f"[{symbol}] Gagal fetch ekor candle:", e)
+                    res = None
+            if res is None:
+                fallback.append(symbol)
+                return
+            merged, updated = res
+            base = merged.pop(self.engine.base_tf)
+            self.engine.seed(symbol, base, merged, now_ms=int(self.clock() * 1000))
+            flags = self.tf_flags.get(symbol, {})
+            if "1h" in updated or "trend_1h" not in flags:
+                self._update_trend_1h(symbol)
+            if "15m" in updated or "struct_15m" not in flags:
+                self._update_struct_15m(symbol)
+
+        await asyncio.gather(*(one(s) for s in symbols))
+        return fallback
+
+    def schedule_gap_backfill(self) -> None:
+        """
+        Backfill di background untuk symbol yang candle-nya bolong
+        (tanpa memutus WebSocket).
+        """
+        todo = self.engine.needs_backfill - self._backfilling
+        if not todo or time.time() - self._last_gap_backfill < GAP_BACKFILL_RETRY_SEC:
+            return
+        self._last_gap_backfill = time.time()
+        self._backfilling |= todo
+        print(f"Candle bolong: backfill ulang {len(todo)} symbol...")
+
+        async def run() -> None:
+            try:
+                await self.backfill(todo)
+            finally:
+                self._backfilling -= todo
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def sync_universe(self, symbols: Iterable[str]) -> None:
+        """
+        Setelah refresh pair: buang symbol lama, backfill symbol baru / yang gap.
+        """
+        wanted = [s.upper() for s in symbols]
+        keep = set(wanted)
+        self.engine.retain(keep)
+        for sym in [s for s in self.tf_flags if s not in keep]:
+            del self.tf_flags[sym]
+        for sym in [s for s in self.swings if s not in keep]:
+            del self.swings[sym]
+        missing = [s for s in wanted if not self.engine.has_history(s) or s in self.engine.needs_backfill]
+        restorable = [s for s in missing if s in self._restored]
+        if restorable:
+            fallback = await self.restore_backfill(restorable)
+            print(f"Candle dari snapshot: {len(restorable) - len(fallback)}/{len(restorable)} symbol.")
+            done = set(restorable) - set(fallback)
+            missing = [s for s in missing if s not in done]
+        # snapshot hanya dipakai sekali (symbol di luar universe dibuang)
+        self._restored.clear()
+        if missing:
+            print(f"Backfill candle {len(missing)} symbol...")
+            ok = await self.backfill(missing)
+            print(f"Backfill selesai: {ok}/{len(missing)} symbol.")
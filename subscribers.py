@@ -0,0 +1,538 @@
+# subscribers.py
+#
+# Tabel subscriber kolumnar di memory (100k+ user):
+# - array NumPy paralel: chat_id int64, active bool, vip_day (epoch-day
+#   expiry, -1 = bukan VIP), pause_until (epoch detik, 0 = tidak pause),
+#   signals_today + signal_day (epoch-day hitungan terakhir), kode bahasa
+# - index chat_id → baris (dict)
+# - eligibility broadcast = mask vektor (tanpa parse tanggal per user)
+# - preferensi user (min tier, watchlist, mute, quiet hours; jarang diisi)
+#   di-index terbalik: tier → baris, symbol → baris, jam lokal → baris.
+#   Routing 1 sinyal = gabungan set baris yang menolak, bukan cek per user;
+#   index diperbarui saat preferensi berubah (put_user)
+# File tetap data/subscribers.json (format lama), dibaca 1x saat start,
+# ditulis ulang saat ada perubahan.
+
+import asyncio
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Set
+
+import numpy as np
+
+from ipc_scoring import TIER_ORDER
+from storage import (
+    FREE_SIGNALS_PER_DAY,
+    load_subscribers_dict,
+    save_subscribers_dict,
+    normalize_symbols,
+    local_hour,
+    quiet_hours_contain,
+)
+
+_EPOCH_ORD = date(1970, 1, 1).toordinal()
+_BASE_KEYS = {"active", "signals_today", "last_signal_date", "vip_expiry", "pause_until", "lang"}
+_PREF_KEYS = {"min_tier", "watchlist", "mute", "quiet_hours"}
+_KNOWN_KEYS = _BASE_KEYS | _PREF_KEYS
+
+
+def epoch_day(d: date) -> int:
+    return d.toordinal() - _EPOCH_ORD
+
+
+def today_epoch_day(now: float | None = None) -> int:
+    return int((now if now is not None else time.time()) // 86400)
+
+
+def _parse_day(value) -> int:
+    if not value:
+        return -1
+    try:
+        return epoch_day(datetime.fromisoformat(value).date())
+    except Exception:
+        return -1
+
+
+def _parse_ts(value) -> int:
+    if not value:
+        return 0
+    try:
+        dt = datetime.fromisoformat(value)
+    except Exception:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _parse_prefs(user: dict) -> dict | None:
+    """
+    Preferensi dari dict user (format storage) → bentuk ter-normalisasi
+    (tuple, hashable untuk deteksi perubahan). None kalau tidak ada.
+    """
+    prefs = {}
+    tier = user.get("min_tier")
+    if tier in TIER_ORDER and TIER_ORDER[tier] > 0:
+        prefs["min_tier"] = tier
+    for key in ("watchlist", "mute"):
+        symbols = normalize_symbols(user.get(key))
+        if symbols:
+            prefs[key] = tuple(symbols)
+    try:
+        start, end = (int(h) % 24 for h in user.get("quiet_hours"))
+    except (TypeError, ValueError):
+        start = end = 0
+    if start != end:
+        prefs["quiet_hours"] = (start, end)
+    return prefs or None
+
+
+def _day_str(day: int) -> str | None:
+    return date.fromordinal(day + _EPOCH_ORD).isoformat() if day >= 0 else None
+
+
+def _ts_str(ts: int) -> str | None:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if ts > 0 else None
+
+
+class SubscriberTable:
+    COLUMNS = {
+        "chat_id": np.int64,
+        "active": np.bool_,
+        "vip_day": np.int32,
+        "pause_until": np.int64,
+        "signals_today": np.int32,
+        "signal_day": np.int32,
+        "lang": np.int16,
+    }
+
+    def __init__(self, capacity: int = 1024):
+        self.n = 0
+        self._capacity = max(1, capacity)
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(self._capacity, dtype=dtype))
+        self.index: Dict[int, int] = {}
+        self._langs: List[str] = []
+        self._lang_code: Dict[str, int] = {}
+        # key tak dikenal per baris (jarang) → tetap ikut tersimpan ke file
+        self._extra: Dict[int, dict] = {}
+        # preferensi per baris (hanya user yang mengisi) + index terbalik
+        self._prefs: Dict[int, dict] = {}
+        self._tier_rows: Dict[str, Set[int]] = {}
+        self._watch_rows: Dict[str, Set[int]] = {}
+        self._watchers: Set[int] = set()
+        self._mute_rows: Dict[str, Set[int]] = {}
+        self._quiet_rows: List[Set[int]] = [set() for _ in range(24)]
+        # ada perubahan yang belum ditulis ke subscribers.json
+        self.dirty = False
+        # False (replay capture) → perubahan hanya di memory
+        self.persist = True
+        # urutan salinan yang ditulis: salinan lama dari thread tidak boleh
+        # menimpa salinan yang lebih baru
+        self._save_lock = threading.Lock()
+        self._save_seq = 0
+        self._saved_seq = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, chat_id: int) -> bool:
+        return int(chat_id) in self.index
+
+    # ---------- baris ----------
+
+    def _grow(self, need: int) -> None:
+        if need <= self._capacity:
+            return
+        cap = self._capacity
+        while cap < need:
+            cap *= 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=old.dtype)
+            new[: self.n] = old[: self.n]
+            setattr(self, name, new)
+        self._capacity = cap
+
+    def _lang_id(self, lang) -> int:
+        if not lang:
+            return -1
+        code = self._lang_code.get(lang)
+        if code is None:
+            code = self._lang_code[lang] = len(self._langs)
+            self._langs.append(lang)
+        return code
+
+    def row(self, chat_id: int) -> int:
+        """
+        Baris chat_id; user baru dibuat dengan default ensure_user.
+        """
+        chat_id = int(chat_id)
+        r = self.index.get(chat_id)
+        if r is None:
+            self._grow(self.n + 1)
+            r = self.n
+            self.n += 1
+            self.index[chat_id] = r
+            self.chat_id[r] = chat_id
+            self.active[r] = True
+            self.vip_day[r] = -1
+            self.pause_until[r] = 0
+            self.signals_today[r] = 0
+            self.signal_day[r] = -1
+            self.lang[r] = -1
+            self.dirty = True
+        return r
+
+    def _row_values(self, r: int) -> tuple:
+        return (
+            tuple(getattr(self, name)[r].item() for name in self.COLUMNS),
+            self._extra.get(r),
+            self._prefs.get(r),
+        )
+
+    def put_user(self, chat_id: int, user: dict) -> None:
+        """
+        Tulis 1 user dari format dict lama (string ISO).
+        """
+        r = self.row(chat_id)
+        before = self._row_values(r)
+        self.active[r] = bool(user.get("active", True))
+        self.vip_day[r] = _parse_day(user.get("vip_expiry"))
+        self.pause_until[r] = _parse_ts(user.get("pause_until"))
+        self.signals_today[r] = int(user.get("signals_today", 0) or 0)
+        self.signal_day[r] = _parse_day(user.get("last_signal_date"))
+        self.lang[r] = self._lang_id(user.get("lang"))
+        extra = {k: v for k, v in user.items() if k not in _KNOWN_KEYS}
+        if extra:
+            self._extra[r] = extra
+        else:
+            self._extra.pop(r, None)
+        self._set_prefs(r, _parse_prefs(user))
+        if self._row_values(r) != before:
+            self.dirty = True
+
+    def user(self, chat_id: int) -> dict:
+        """
+        1 user dalam format dict lama (dibuat kalau belum ada).
+        """
+        r = self.row(chat_id)
+        user = dict(self._extra.get(r, {}))
+        user.update({
+            "active": bool(self.active[r]),
+            "signals_today": int(self.signals_today[r]),
+            "last_signal_date": _day_str(int(self.signal_day[r])) or "",
+            "vip_expiry": _day_str(int(self.vip_day[r])),
+            "pause_until": _ts_str(int(self.pause_until[r])),
+        })
+        lang = self.lang_name(int(self.lang[r]))
+        if lang:
+            user["lang"] = lang
+        for key, value in self._prefs.get(r, {}).items():
+            user[key] = list(value) if isinstance(value, tuple) else value
+        return user
+
+    def lang_name(self, code: int) -> str | None:
+        return self._langs[code] if code >= 0 else None
+
+    # ---------- VIP ----------
+
+    def grant_vip(self, chat_id: int, days: int = 30) -> None:
+        r = self.row(chat_id)
+        self.vip_day[r] = epoch_day(datetime.now(timezone.utc).date() + timedelta(days=days))
+        self.dirty = True
+
+    def revoke_vip(self, chat_id: int) -> None:
+        r = self.index.get(int(chat_id))
+        if r is not None:
+            self.vip_day[r] = -1
+            self.dirty = True
+
+    def vip_mask(self, now: float | None = None) -> np.ndarray:
+        return self.vip_day[: self.n] >= today_epoch_day(now)
+
+    def vip_ids(self, now: float | None = None) -> List[int]:
+        return self.chat_id[: self.n][self.vip_mask(now)].tolist()
+
+    # ---------- preferensi (index terbalik) ----------
+
+    def _index_prefs(self, r: int, prefs: dict, add: bool) -> None:
+        def put(index: Dict[str, Set[int]], key: str) -> None:
+            if add:
+                index.setdefault(key, set()).add(r)
+                return
+            rows = index.get(key)
+            if rows is not None:
+                rows.discard(r)
+                if not rows:
+                    del index[key]
+
+        if "min_tier" in prefs:
+            put(self._tier_rows, prefs["min_tier"])
+        for sym in prefs.get("watchlist", ()):
+            put(self._watch_rows, sym)
+        for sym in prefs.get("mute", ()):
+            put(self._mute_rows, sym)
+        if "watchlist" in prefs:
+            (self._watchers.add if add else self._watchers.discard)(r)
+        if "quiet_hours" in prefs:
+            start, end = prefs["quiet_hours"]
+            for hour in range(24):
+                if quiet_hours_contain(start, end, hour):
+                    (self._quiet_rows[hour].add if add else self._quiet_rows[hour].discard)(r)
+
+    def _set_prefs(self, r: int, prefs: dict | None) -> None:
+        old = self._prefs.pop(r, None)
+        if old is not None:
+            self._index_prefs(r, old, add=False)
+        if prefs:
+            self._prefs[r] = prefs
+            self._index_prefs(r, prefs, add=True)
+
+    def prefs_count(self) -> int:
+        return len(self._prefs)
+
+    def rejecting_rows(self, symbol: str, tier: str, now: float | None = None) -> Set[int]:
+        """
+        Baris yang menolak sinyal (symbol, tier) menurut preferensinya:
+        gabungan index tier, watchlist, mute & quiet hours jam ini.
+        """
+        order = TIER_ORDER.get(tier, 0)
+        base = symbol.upper().split(".", 1)[0]
+        rejected: Set[int] = set()
+        for min_tier, rows in self._tier_rows.items():
+            if TIER_ORDER[min_tier] > order:
+                rejected |= rows
+        if self._watchers:
+            rejected |= self._watchers - self._watch_rows.get(base, set())
+        rejected |= self._mute_rows.get(base, set())
+        rejected |= self._quiet_rows[local_hour(now)]
+        return rejected
+
+    def accept_mask(self, symbol: str, tier: str, now: float | None = None) -> np.ndarray:
+        mask = np.ones(self.n, dtype=bool)
+        rejected = self.rejecting_rows(symbol, tier, now)
+        if rejected:
+            mask[np.fromiter(rejected, dtype=np.int64, count=len(rejected))] = False
+        return mask
+
+    # ---------- eligibility (vektor) ----------
+
+    def reachable_mask(self, now: float | None = None) -> np.ndarray:
+        """
+        Aktif & tidak sedang pause.
+        """
+        now = now if now is not None else time.time()
+        n = self.n
+        return self.active[:n] & (self.pause_until[:n] <= now)
+
+    def quota(self, n_signals: int, now: float | None = None, limit: int = FREE_SIGNALS_PER_DAY) -> np.ndarray:
+        """
+        Jumlah sinyal (dari n_signals) yang masih boleh diterima tiap user:
+        VIP = semua, FREE = sisa limit harian, inactive / pause = 0.
+        """
+        now = now if now is not None else time.time()
+        n = self.n
+        today = today_epoch_day(now)
+        used = np.where(self.signal_day[:n] == today, self.signals_today[:n], 0)
+        free_left = np.clip(limit - used, 0, n_signals)
+        q = np.where(self.vip_day[:n] >= today, n_signals, free_left)
+        return np.where(self.reachable_mask(now), q, 0)
+
+    def eligible_mask(self, now: float | None = None, limit: int = FREE_SIGNALS_PER_DAY) -> np.ndarray:
+        return self.quota(1, now, limit) > 0
+
+    def mark_sent(self, rows: np.ndarray, counts: np.ndarray | int = 1, now: float | None = None) -> None:
+        today = today_epoch_day(now)
+        stale = self.signal_day[rows] != today
+        self.signals_today[rows] = np.where(stale, 0, self.signals_today[rows]) + counts
+        self.signal_day[rows] = today
+        self.dirty = True
+
+    # ---------- file ----------
+
+    @classmethod
+    def from_dict(cls, subs: Dict[str, dict]) -> "SubscriberTable":
+        """
+        Bulk load: kolom diisi sekaligus (tanpa put_user per baris), tanggal
+        yang sama (expiry VIP, tanggal sinyal) cukup di-parse 1x.
+        """
+        n = len(subs)
+        table = cls(capacity=max(1024, n))
+        days: Dict[str, int] = {}
+        cols: Dict[str, list] = {name: [0] * n for name in cls.COLUMNS}
+        for r, (cid, user) in enumerate(subs.items()):
+            vip = user.get("vip_expiry")
+            last = user.get("last_signal_date")
+            if vip not in days:
+                days[vip] = _parse_day(vip)
+            if last not in days:
+                days[last] = _parse_day(last)
+            cols["chat_id"][r] = int(cid)
+            cols["active"][r] = bool(user.get("active", True))
+            cols["vip_day"][r] = days[vip]
+            cols["pause_until"][r] = _parse_ts(user.get("pause_until"))
+            cols["signals_today"][r] = int(user.get("signals_today", 0) or 0)
+            cols["signal_day"][r] = days[last]
+            cols["lang"][r] = table._lang_id(user.get("lang"))
+            if len(user) > len(_BASE_KEYS) or not _BASE_KEYS.issuperset(user):
+                extra = {k: v for k, v in user.items() if k not in _KNOWN_KEYS}
+                if extra:
+                    table._extra[r] = extra
+                table._set_prefs(r, _parse_prefs(user))
+        for name, values in cols.items():
+            getattr(table, name)[:n] = values
+        table.n = n
+        table.index = dict(zip(cols["chat_id"], range(n)))
+        table.dirty = False
+        return table
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {str(cid): self.user(cid) for cid in self.chat_id[: self.n].tolist()}
+
+    @classmethod
+    def load(cls) -> "SubscriberTable":
+        return cls.from_dict(load_subscribers_dict())
+
+    def save(self) -> None:
+        self._write(*self._copy())
+
+    def _copy(self) -> tuple:
+        self._save_seq += 1
+        self.dirty = False
+        return self.to_dict(), self._save_seq
+
+    def _write(self, data: Dict[str, dict], seq: int) -> None:
+        with self._save_lock:
+            if seq < self._saved_seq:
+                return
+            save_subscribers_dict(data)
+            self._saved_seq = seq
+
+    def flush(self) -> bool:
+        """
+        Tulis ke file hanya kalau ada perubahan. Return True kalau ditulis.
+        """
+        if not self.dirty or not self.persist:
+            return False
+        self.save()
+        return True
+
+    async def flush_async(self) -> bool:
+        """
+        flush() dengan tulis file di thread: salinan dict dibuat di event
+        loop, JSON + tulis file tidak menahan loop.
+        """
+        if not self.dirty or not self.persist:
+            return False
+        data, seq = self._copy()
+        try:
+            await asyncio.to_thread(self._write, data, seq)
+        except BaseException:
+            self.dirty = True
+            raise
+        return True
+
+
+# ================== BENCHMARK ==================
+
+
+def _synthetic_subs(n: int, rng: np.random.Generator) -> Dict[str, dict]:
+    today = datetime.now(timezone.utc).date()
+    now = datetime.now(timezone.utc)
+    subs = {}
+    for i in range(n):
+        vip = rng.random() < 0.1
+        paused = rng.random() < 0.05
+        subs[str(100_000_000 + i)] = {
+            "active": bool(rng.random() < 0.9),
+            "signals_today": int(rng.integers(0, 3)),
+            "last_signal_date": (today - timedelta(days=int(rng.integers(0, 2)))).isoformat(),
+            "vip_expiry": (today + timedelta(days=int(rng.integers(-10, 30)))).isoformat() if vip else None,
+            "pause_until": (now + timedelta(hours=int(rng.integers(-24, 24)))).isoformat() if paused else None,
+            "lang": "id" if rng.random() < 0.7 else "en",
+        }
+        # ~20% user mengisi preferensi
+        if rng.random() < 0.2:
+            user = subs[str(100_000_000 + i)]
+            kind = int(rng.integers(0, 4))
+            if kind == 0:
+                user["min_tier"] = "A+" if rng.random() < 0.5 else "A"
+            elif kind == 1:
+                user["watchlist"] = [f"P{int(k):03d}USDT" for k in rng.integers(0, 200, 5)]
+            elif kind == 2:
+                user["mute"] = [f"P{int(k):03d}USDT" for k in rng.integers(0, 200, 3)]
+            else:
+                user["quiet_hours"] = [int(rng.integers(20, 24)), int(rng.integers(5, 9))]
+    return subs
+
+
+def _deep_size(obj, seen=None) -> int:
+    import sys
+
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    return size
+
+
+def run_benchmark(n_users: int = 100_000, rounds: int = 5) -> None:
+    """
+    Memori & waktu filter eligibility: dict (storage.can_receive_signal)
+    vs SubscriberTable.quota; routing preferensi: cek per user
+    (storage.accepts_signal) vs index terbalik (accept_mask).
+    """
+    from storage import accepts_signal, can_receive_signal
+
+    rng = np.random.default_rng(42)
+    subs = _synthetic_subs(n_users, rng)
+    table = SubscriberTable.from_dict(subs)
+
+    dict_bytes = _deep_size(subs)
+    table_bytes = sum(getattr(table, c)[: table.n].nbytes for c in table.COLUMNS) + _deep_size(table.index)
+    print(f"memori dict  : {dict_bytes / 1e6:8.1f} MB ({n_users} user)")
+    print(f"memori tabel : {table_bytes / 1e6:8.1f} MB (array {table_bytes - _deep_size(table.index):,} B + index)")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        dict_ids = [int(cid) for cid, u in subs.items() if can_receive_signal(u)]
+    t_dict = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        table_ids = table.chat_id[: table.n][table.eligible_mask()]
+    t_table = (time.perf_counter() - start) / rounds
+
+    print(f"filter dict  : {t_dict * 1000:8.2f} ms")
+    print(f"filter tabel : {t_table * 1000:8.2f} ms (x{t_dict / max(t_table, 1e-9):.0f} lebih cepat)")
+    print(f"eligible     : dict {len(dict_ids)} / tabel {len(table_ids)}")
+
+    signals = [(f"P{int(k):03d}USDT", tier) for k, tier in zip(rng.integers(0, 200, rounds), ["A", "A+", "B"] * rounds)]
+    start = time.perf_counter()
+    for symbol, tier in signals:
+        dict_ids = [int(cid) for cid, u in subs.items() if accepts_signal(u, symbol, tier)]
+    t_dict = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for symbol, tier in signals:
+        table_ids = table.chat_id[: table.n][table.accept_mask(symbol, tier)]
+    t_table = (time.perf_counter() - start) / rounds
+
+    print(f"routing dict : {t_dict * 1000:8.2f} ms per sinyal ({table.prefs_count()} user dengan preferensi)")
+    print(f"routing index: {t_table * 1000:8.2f} ms per sinyal (x{t_dict / max(t_table, 1e-9):.0f} lebih cepat)")
+    print(f"menerima     : dict {len(dict_ids)} / tabel {len(table_ids)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark SubscriberTable")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.users, args.rounds)
@@ -0,0 +1,256 @@
+# swings.py
+#
+# Deteksi swing high / low (pivot fractal) untuk struktur market:
+# - pivot = candle yang high-nya tertinggi (low terendah) di antara
+#   SWING_PIVOT_BARS candle kiri & kanan; semua pivot 1 array dicari dalam
+#   1 pass vektor (sliding_window_view max / min), tanpa loop per candle
+# - candle terakhir array = candle trigger (bisa masih berjalan) → tidak
+#   pernah dipakai mengonfirmasi pivot
+# - SwingTracker: cache per (symbol, tf), update inkremental. Posisi terakhir
+#   yang sudah final disimpan sebagai open_time (tahan window history yang
+#   bergeser) → tiap candle baru cukup cek 1 pivot, biaya tetap walau
+#   history makin panjang
+# - hasil: urutan HH / HL / LH / LL, break of structure (close tembus swing
+#   terakhir) & range swing untuk level entry / SL / TP
+#
+# Benchmark (full recompute vs inkremental per candle):
+#   python swings.py --bars 5000
+
+from typing import List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import SWING_PIVOT_BARS, SWING_KEEP
+
+# update dengan candle tengah sebanyak ini atau kurang → cek per candle
+# (overhead sliding_window_view lebih mahal dari array-nya sendiri)
+SMALL_UPDATE = 8
+
+
+def find_pivots(highs: np.ndarray, lows: np.ndarray, left: int, right: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Index swing high & swing low di highs / lows (semua candle yang punya
+    left candle kiri & right candle kanan). High sama persis: hanya candle
+    paling kiri yang jadi pivot (kiri strict, kanan tidak).
+    """
+    w = left + right + 1
+    n = len(highs)
+    if n < w:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    hw = sliding_window_view(highs, w)
+    lw = sliding_window_view(lows, w)
+    hc = highs[left:n - right]
+    lc = lows[left:n - right]
+    is_high = hc >= hw[:, left:].max(axis=1)
+    is_low = lc <= lw[:, left:].min(axis=1)
+    if left:
+        is_high &= hc > hw[:, :left].max(axis=1)
+        is_low &= lc < lw[:, :left].min(axis=1)
+    return np.flatnonzero(is_high) + left, np.flatnonzero(is_low) + left
+
+
+def _find_pivots_small(highs: np.ndarray, lows: np.ndarray, left: int, right: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sama dengan find_pivots untuk array pendek (update per candle).
+    """
+    hs = highs.tolist()
+    ls = lows.tolist()
+    hi_idx, lo_idx = [], []
+    for c in range(left, len(hs) - right):
+        h, lo = hs[c], ls[c]
+        if h >= max(hs[c:c + right + 1]) and (not left or h > max(hs[c - left:c])):
+            hi_idx.append(c)
+        if lo <= min(ls[c:c + right + 1]) and (not left or lo < min(ls[c - left:c])):
+            lo_idx.append(c)
+    return np.array(hi_idx, dtype=np.int64), np.array(lo_idx, dtype=np.int64)
+
+
+class SwingTracker:
+    """
+    Swing 1 (symbol, tf). Pivot disimpan sebagai (open_time, harga), maks
+    keep per sisi; update() hanya memproses candle yang belum final.
+    """
+
+    __slots__ = ("left", "right", "keep", "high_ts", "high_px", "low_ts", "low_px", "_done_ts")
+
+    def __init__(self, bars: int = SWING_PIVOT_BARS, keep: int = SWING_KEEP):
+        self.left = self.right = max(1, bars)
+        self.keep = max(2, keep)
+        self.reset()
+
+    def reset(self) -> None:
+        self.high_ts: List[float] = []
+        self.high_px: List[float] = []
+        self.low_ts: List[float] = []
+        self.low_px: List[float] = []
+        # open_time candle tengah terakhir yang status pivot-nya sudah final
+        self._done_ts: float | None = None
+
+    @classmethod
+    def from_arrays(cls, times: np.ndarray, highs: np.ndarray, lows: np.ndarray) -> "SwingTracker":
+        return cls().update(times, highs, lows)
+
+    def update(
+        self, times: np.ndarray, highs: np.ndarray, lows: np.ndarray, confirm_last: bool = False
+    ) -> "SwingTracker":
+        """
+        times / highs / lows urut naik (open_time). confirm_last=False →
+        candle terakhir dianggap trigger / masih berjalan (tidak ikut
+        mengonfirmasi pivot); True kalau semua candle sudah closed.
+        """
+        n = len(times)
+        last_center = n - 1 - self.right - (0 if confirm_last else 1)
+        start = self.left
+        if self._done_ts is not None:
+            pos = int(np.searchsorted(times, self._done_ts))
+            if pos < n and times[pos] == self._done_ts:
+                start = max(start, pos + 1)
+            else:
+                # history tidak nyambung (gap / restore) → hitung ulang penuh
+                self.reset()
+        if last_center < start:
+            self._trim(times)
+            return self
+
+        lo = start - self.left
+        hi = last_center + self.right + 1
+        find = _find_pivots_small if last_center - start < SMALL_UPDATE else find_pivots
+        hi_idx, lo_idx = find(highs[lo:hi], lows[lo:hi], self.left, self.right)
+        hi_idx += lo
+        lo_idx += lo
+        self.high_ts.extend(times[hi_idx].tolist())
+        self.high_px.extend(highs[hi_idx].tolist())
+        self.low_ts.extend(times[lo_idx].tolist())
+        self.low_px.extend(lows[lo_idx].tolist())
+        self._done_ts = float(times[last_center])
+        self._trim(times)
+        return self
+
+    def _trim(self, times: np.ndarray) -> None:
+        first = times[0] if len(times) else float("inf")
+        for ts, px in ((self.high_ts, self.high_px), (self.low_ts, self.low_px)):
+            drop = 0
+            while drop < len(ts) and (ts[drop] < first or len(ts) - drop > self.keep):
+                drop += 1
+            if drop:
+                del ts[:drop]
+                del px[:drop]
+
+    # ---------- struktur ----------
+
+    def sequence(self) -> Tuple[str, str]:
+        """
+        Label 2 swing terakhir: ("HH" / "LH" / "", "HL" / "LL" / "").
+        """
+        hs, ls = self.high_px, self.low_px
+        high = ("HH" if hs[-1] > hs[-2] else "LH") if len(hs) >= 2 else ""
+        low = ("HL" if ls[-1] > ls[-2] else "LL") if len(ls) >= 2 else ""
+        return high, low
+
+    def break_of_structure(self, close: float) -> int:
+        """
+        +1 close di atas swing high terakhir, -1 di bawah swing low terakhir.
+        """
+        if self.high_px and close > self.high_px[-1]:
+            return 1
+        if self.low_px and close < self.low_px[-1]:
+            return -1
+        return 0
+
+    def direction(self, close: float) -> int:
+        """
+        +1 = HL terbentuk & (HH atau break swing high), close di atas swing low
+        -1 = LH terbentuk & (LL atau break swing low), close di bawah swing high
+         0 = campur / swing kurang
+        """
+        high, low = self.sequence()
+        if not high or not low:
+            return 0
+        brk = self.break_of_structure(close)
+        if low == "HL" and (high == "HH" or brk > 0) and close > self.low_px[-1]:
+            return 1
+        if high == "LH" and (low == "LL" or brk < 0) and close < self.high_px[-1]:
+            return -1
+        return 0
+
+    # ---------- level ----------
+
+    def last_high(self, since: float) -> float | None:
+        return self.high_px[-1] if self.high_ts and self.high_ts[-1] >= since else None
+
+    def last_low(self, since: float) -> float | None:
+        return self.low_px[-1] if self.low_ts and self.low_ts[-1] >= since else None
+
+    def range(
+        self, times: np.ndarray, highs: np.ndarray, lows: np.ndarray, window: int = 30, pending_last: bool = False
+    ) -> Tuple[float, float]:
+        """
+        (high, low) untuk level: swing high / low terakhir dalam window candle
+        (fallback max / min window), diperluas candle ekor yang belum bisa
+        jadi pivot. pending_last=True → candle trigger belum ada di array
+        (intrabar: high / low parsial digabung belakangan), window & ekor
+        dihitung seolah candle itu sudah ikut.
+        """
+        extra = 1 if pending_last else 0
+        win = max(1, min(window - extra, len(times)))
+        tail = max(1, self.right + 1 - extra)
+        since = times[-win]
+        sh = self.last_high(since)
+        sl = self.last_low(since)
+        high = max(sh, float(highs[-tail:].max())) if sh is not None else float(highs[-win:].max())
+        low = min(sl, float(lows[-tail:].min())) if sl is not None else float(lows[-win:].min())
+        return high, low
+
+
+# ================== BENCHMARK ==================
+
+
+def _synthetic(n: int, seed: int = 7) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n)) + 3 * np.sin(np.arange(n) / 6)
+    spread = np.abs(rng.normal(0, 0.4, n))
+    times = np.arange(n, dtype=np.float64) * 300_000
+    return times, close + spread, close - spread
+
+
+def run_benchmark(n_bars: int = 5000, window: int = 500) -> None:
+    """
+    Candle masuk 1 per 1 (window history bergeser, seperti bar engine):
+    hitung ulang penuh tiap candle vs SwingTracker inkremental. Pivot kedua
+    cara harus sama.
+    """
+    import time
+
+    times, highs, lows = _synthetic(n_bars + window)
+
+    start = time.perf_counter()
+    for end in range(window, window + n_bars):
+        full = SwingTracker.from_arrays(times[end - window:end], highs[end - window:end], lows[end - window:end])
+    t_full = (time.perf_counter() - start) / n_bars
+
+    tracker = SwingTracker()
+    start = time.perf_counter()
+    for end in range(window, window + n_bars):
+        tracker.update(times[end - window:end], highs[end - window:end], lows[end - window:end])
+    t_inc = (time.perf_counter() - start) / n_bars
+
+    same = (tracker.high_ts, tracker.high_px, tracker.low_ts, tracker.low_px) == (
+        full.high_ts, full.high_px, full.low_ts, full.low_px
+    )
+    print(f"history {window} candle, {n_bars} update:")
+    print(f"hitung ulang penuh : {t_full * 1e6:8.1f} us / candle")
+    print(f"inkremental        : {t_inc * 1e6:8.1f} us / candle (x{t_full / max(t_inc, 1e-12):.1f} lebih cepat)")
+    print(f"pivot sama         : {same} ({len(tracker.high_px)} high / {len(tracker.low_px)} low disimpan)")
+    print(f"struktur terakhir  : {tracker.sequence()}, arah {tracker.direction(float(highs[window + n_bars - 1]))}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark deteksi swing inkremental")
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=500, help="panjang history per update")
+    args = parser.parse_args()
+    run_benchmark(args.bars, args.window)
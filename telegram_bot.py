@@ -1,24 +1,27 @@
 # telegram_bot.py
 
 import asyncio
-from typing import Any, Dict
+import json
+from typing import Any, Dict, List
 
-import requests
-
-from config import TELEGRAM_TOKEN, TELEGRAM_ADMIN_ID, TELEGRAM_ADMIN_USERNAME
+import http_client
+import rate_limit
+from config import TELEGRAM_TOKEN, TELEGRAM_ADMIN_ID, TELEGRAM_ADMIN_USERNAME, TELEGRAM_API_URL, PREF_TZ_OFFSET_HOURS
 from storage import (
-    load_subscribers_dict,
-    save_subscribers_dict,
-    ensure_user,
     is_vip,
-    grant_vip_days,
-    revoke_vip,
+    set_min_tier,
+    set_watchlist,
+    mute_symbols,
+    unmute_symbols,
+    set_quiet_hours,
     get_cooldown_seconds,
     set_cooldown_seconds,
-    can_receive_signal,
+    set_cooldown_override,
+    load_cooldown_config,
     clear_pause,
     set_pause_24h,
     load_stats,
+    outcome_summary,
 )
 
 
@@ -26,6 +29,38 @@ def is_admin(chat_id: int) -> bool:
     return TELEGRAM_ADMIN_ID and int(chat_id) == int(TELEGRAM_ADMIN_ID)
 
 
+def store_user(state, chat_id: int, user: dict) -> None:
+    """
+    Tulis balik 1 user ke tabel subscriber; file ditulis hanya kalau berubah.
+    """
+    state.subscribers.put_user(chat_id, user)
+    state.subscribers.flush()
+
+
+# ============ PREFERENSI USER ============
+
+def parse_symbols_arg(arg: str) -> List[str]:
+    """
+    "btc, ETHUSDT sol" → ["BTCUSDT", "ETHUSDT", "SOLUSDT"].
+    """
+    out = []
+    for tok in arg.replace(",", " ").split():
+        sym = tok.upper()
+        out.append(sym if sym.endswith("USDT") else sym + "USDT")
+    return out
+
+
+def format_prefs(user: dict) -> str:
+    quiet = user.get("quiet_hours")
+    quiet_text = f"{quiet[0]:02d}:00-{quiet[1]:02d}:00 (UTC{PREF_TZ_OFFSET_HOURS:+g})" if quiet else "-"
+    return (
+        f"• Min Tier  : *{user.get('min_tier') or 'ikut bot'}*\n"
+        f"• Watchlist : {', '.join(user['watchlist']) if user.get('watchlist') else 'semua pair'}\n"
+        f"• Mute      : {', '.join(user['mute']) if user.get('mute') else '-'}\n"
+        f"• Quiet     : {quiet_text}"
+    )
+
+
 # ============ SEND MESSAGE ============
 
 def send_message(chat_id: int, text: str, reply_keyboard: Dict[str, Any] | None = None) -> None:
@@ -33,7 +68,7 @@ def send_message(chat_id: int, text: str, reply_keyboard: Dict[str, Any] | None
         print("TELEGRAM_TOKEN belum di-set.")
         return
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
+    url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}/sendMessage"
     payload: Dict[str, Any] = {
         "chat_id": chat_id,
         "text": text,
@@ -43,7 +78,55 @@ def send_message(chat_id: int, text: str, reply_keyboard: Dict[str, Any] | None
         payload["reply_markup"] = reply_keyboard
 
     try:
-        r = requests.post(url, json=payload, timeout=10)
+        r = http_client.post(url, json=payload)
+        if not r.ok:
+            print("Gagal kirim Telegram:", r.text)
+    except Exception as e:
+        print("Error kirim Telegram:", e)
+
+
+# ============ PAYLOAD PRE-ENCODED (BROADCAST) ============
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class PreparedMessage:
+    """
+    Body JSON sendMessage yang sudah di-encode sekali.
+    Per penerima hanya bytes chat_id yang disisipkan:
+      b'{"chat_id":' + b'123' + b',"text":...}'
+    """
+
+    __slots__ = ("prefix", "suffix")
+
+    def __init__(self, prefix: bytes, suffix: bytes):
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def body_for(self, chat_id: int) -> bytes:
+        return self.prefix + str(int(chat_id)).encode("ascii") + self.suffix
+
+
+def prepare_message(text: str, reply_keyboard: Dict[str, Any] | None = None) -> PreparedMessage:
+    payload: Dict[str, Any] = {
+        "text": text,
+        "parse_mode": "Markdown",
+    }
+    if reply_keyboard:
+        payload["reply_markup"] = reply_keyboard
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # body = b'{"text":...}' → sisipkan chat_id di depan
+    return PreparedMessage(b'{"chat_id":', b"," + body[1:])
+
+
+def send_prepared(chat_id: int, msg: PreparedMessage) -> None:
+    if not TELEGRAM_TOKEN:
+        print("TELEGRAM_TOKEN belum di-set.")
+        return
+
+    url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}/sendMessage"
+    try:
+        r = http_client.post(url, data=msg.body_for(chat_id), headers=_JSON_HEADERS)
         if not r.ok:
             print("Gagal kirim Telegram:", r.text)
     except Exception as e:
@@ -121,12 +204,12 @@ async def telegram_command_loop(state) -> None:
         return
 
     print("Telegram command loop start...")
-    base_url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
+    base_url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}"
     get_updates_url = f"{base_url}/getUpdates"
 
     # sync awal: skip pesan lama
     try:
-        r = requests.get(get_updates_url, timeout=20)
+        r = await asyncio.to_thread(http_client.get, get_updates_url, timeout=20)
         if r.ok:
             data = r.json()
             results = data.get("result", [])
@@ -147,7 +230,7 @@ async def telegram_command_loop(state) -> None:
             if state.last_update_id is not None:
                 params["offset"] = state.last_update_id + 1
 
-            r = requests.get(get_updates_url, params=params, timeout=35)
+            r = await asyncio.to_thread(http_client.get, get_updates_url, params=params, timeout=35)
             if not r.ok:
                 print("Error getUpdates:", r.text)
                 await asyncio.sleep(2)
@@ -163,9 +246,13 @@ async def telegram_command_loop(state) -> None:
                 if msg:
                     chat_id = msg["chat"]["id"]
                     text = (msg.get("text") or "").strip()
-                    subs = load_subscribers_dict()
-                    ensure_user(subs, chat_id)
-                    user = subs[str(chat_id)]
+                    user = state.subscribers.user(chat_id)
+
+                    # bahasa user (untuk template sinyal per bahasa)
+                    lang_code = (msg.get("from") or {}).get("language_code")
+                    if lang_code:
+                        user["lang"] = lang_code.split("-")[0].lower()
+                    store_user(state, chat_id, user)
 
                     # admin?
                     admin_flag = is_admin(chat_id)
@@ -189,7 +276,7 @@ async def telegram_command_loop(state) -> None:
                                 "Format tidak valid. Kirim angka detik, misal `300`.",
                                 reply_keyboard=build_admin_keyboard(),
                             )
-                        save_subscribers_dict(subs)
+                        store_user(state, chat_id, user)
                         continue
 
                     # ========== ADMIN ==========
@@ -269,8 +356,8 @@ async def telegram_command_loop(state) -> None:
                         elif text == "📊 Status Bot" or text.startswith("/status"):
                             cooldown = get_cooldown_seconds()
                             stats = load_stats()
-                            total_users = len(subs)
-                            vip_users = sum(1 for u in subs.values() if is_vip(u))
+                            total_users = len(state.subscribers)
+                            vip_users = len(state.subscribers.vip_ids())
                             scan_status = "AKTIF" if state.scanning_enabled else "STANDBY"
                             mode = "PAUSE" if state.paused else "RUNNING"
                             send_message(
@@ -280,11 +367,22 @@ async def telegram_command_loop(state) -> None:
                                 f"• Min Tier  : *{state.min_tier}*\n"
                                 f"• Cooldown  : *{cooldown} detik*\n"
                                 f"• Users     : *{total_users}*\n"
-                                f"• VIP Users : *{vip_users}*\n\n"
+                                f"• VIP Users : *{vip_users}*\n"
+                                f"• Preferensi: *{state.subscribers.prefs_count()}* user\n\n"
                                 f"• Today     : *{stats.get('signals_today_total', 0)}* sinyal\n"
                                 f"• Total     : *{stats.get('total_signals', 0)}* sinyal\n"
                                 f"• Last pair : `{stats.get('last_symbol')}`\n"
-                                f"• Last time : `{stats.get('last_signal_time')}`",
+                                f"• Last time : `{stats.get('last_signal_time')}`\n"
+                                f"• Hasil     : {outcome_summary(stats)}\n"
+                                f"• Watchdog  : {state.watchdog.summary()}\n"
+                                f"• HTTP      : {http_client.summary()}\n"
+                                f"• Weight    : {rate_limit.summary()}"
+                                + (f"\n• Cluster   : {state.coordinator.summary()}" if state.coordinator is not None else "")
+                                + "".join(
+                                    f"\n• Candle {market}: {scanner.engine.summary()}"
+                                    for market, scanner in state.stream_scanners.items()
+                                    if scanner is not None
+                                ),
                                 reply_keyboard=build_admin_keyboard(),
                             )
                         elif text == "⚙️ Mode Tier" or text.startswith("/mode"):
@@ -301,18 +399,58 @@ async def telegram_command_loop(state) -> None:
                                 "Hanya sinyal dengan tier >= ini yang dikirim.",
                                 reply_keyboard=build_admin_keyboard(),
                             )
+                        elif text.startswith("/scanall"):
+                            # jalan di background (thread pool sendiri), hasil dikirim via delivery
+                            send_message(chat_id, "🔎 Scan semua pair dimulai...", reply_keyboard=build_admin_keyboard())
+                            asyncio.create_task(state.on_demand.handle_scanall(chat_id))
+                        elif text.startswith("/scan"):
+                            parts = text.split()
+                            if len(parts) < 2:
+                                send_message(
+                                    chat_id,
+                                    "Format: `/scan BTCUSDT` (futures: `/scan BTCUSDT.P`).",
+                                    reply_keyboard=build_admin_keyboard(),
+                                )
+                            else:
+                                asyncio.create_task(state.on_demand.handle_scan(chat_id, parts[1]))
+                        elif text.startswith("/cooldown") and len(text.split()) == 3:
+                            # /cooldown <tier|SYMBOL> <detik>  (0 = hapus override)
+                            _, target, sec_str = text.split()
+                            try:
+                                sec = int(sec_str)
+                                if sec < 0:
+                                    raise ValueError
+                                kind = "tiers" if target.upper() in ("A+", "A", "B") else "symbols"
+                                set_cooldown_override(kind, target, sec)
+                                label = "Tier" if kind == "tiers" else "Pair"
+                                info = f"*{sec} detik*" if sec > 0 else "ikut default"
+                                send_message(
+                                    chat_id,
+                                    f"⏲️ Cooldown {label} *{target.upper()}*: {info}.",
+                                    reply_keyboard=build_admin_keyboard(),
+                                )
+                            except ValueError:
+                                send_message(
+                                    chat_id,
+                                    "Format: `/cooldown A+ 600` atau `/cooldown BTCUSDT 1800` (0 = hapus).",
+                                    reply_keyboard=build_admin_keyboard(),
+                                )
                         elif text == "⏲️ Cooldown" or text.startswith("/cooldown"):
-                            current = get_cooldown_seconds()
+                            cfg = load_cooldown_config()
+                            overrides = [f"• Tier {k}: {v} detik" for k, v in sorted(cfg["tiers"].items())]
+                            overrides += [f"• {k}: {v} detik" for k, v in sorted(cfg["symbols"].items())]
                             send_message(
                                 chat_id,
-                                f"⏲️ Cooldown saat ini: *{current} detik*.\n"
-                                "Kirim angka baru dalam detik (contoh: `300`).",
+                                f"⏲️ Cooldown saat ini: *{cfg['cooldown_seconds']} detik*.\n"
+                                + ("Override:\n" + "\n".join(overrides) + "\n" if overrides else "")
+                                + "Kirim angka baru dalam detik (contoh: `300`).\n"
+                                "Override: `/cooldown A+ 600` / `/cooldown BTCUSDT 1800`.",
                                 reply_keyboard=build_admin_keyboard(),
                             )
                             state.awaiting_cooldown_input = True
                         elif text == "⭐ VIP Control":
-                            total_users = len(subs)
-                            vip_ids = [cid for cid, u in subs.items() if is_vip(u)]
+                            total_users = len(state.subscribers)
+                            vip_ids = [str(cid) for cid in state.subscribers.vip_ids()]
                             vip_count = len(vip_ids)
                             preview = ", ".join(vip_ids[:5]) if vip_ids else "-"
                             send_message(
@@ -344,6 +482,9 @@ async def telegram_command_loop(state) -> None:
                                 "📊 Status Bot  — lihat status & statistik\n"
                                 "⚙️ Mode Tier   — toggle A / A+\n"
                                 "⏲️ Cooldown    — atur jarak sinyal\n"
+                                "`/cooldown A+ 600` / `/cooldown BTCUSDT 1800` — override tier / pair\n"
+                                "`/scan BTCUSDT` — analisa 1 pair sekarang (checklist + score)\n"
+                                "`/scanall` — scan semua pair, ranking top\n"
                                 "⭐ VIP Control  — kelola VIP\n"
                                 "🔄 Restart Bot — soft restart engine\n",
                                 reply_keyboard=build_admin_keyboard(),
@@ -360,8 +501,9 @@ async def telegram_command_loop(state) -> None:
                                 try:
                                     target = int(parts[1])
                                     days = int(parts[2]) if len(parts) > 2 else 30
-                                    grant_vip_days(subs, target, days)
-                                    save_subscribers_dict(subs)
+                                    state.subscribers.grant_vip(target, days)
+                                    state.subscribers.flush()
+                                    user = state.subscribers.user(chat_id)
                                     send_message(
                                         chat_id,
                                         f"⭐ VIP diaktifkan untuk `{target}` selama {days} hari.",
@@ -389,8 +531,9 @@ async def telegram_command_loop(state) -> None:
                             else:
                                 try:
                                     target = int(parts[1])
-                                    revoke_vip(subs, target)
-                                    save_subscribers_dict(subs)
+                                    state.subscribers.revoke_vip(target)
+                                    state.subscribers.flush()
+                                    user = state.subscribers.user(chat_id)
                                     send_message(
                                         chat_id,
                                         f"VIP user `{target}` dihapus.",
@@ -407,7 +550,7 @@ async def telegram_command_loop(state) -> None:
                                         reply_keyboard=build_admin_keyboard(),
                                     )
 
-                        save_subscribers_dict(subs)
+                        store_user(state, chat_id, user)
                         continue  # admin done, lanjut update berikutnya
 
                     # ========== USER (NON ADMIN) ==========
@@ -416,7 +559,7 @@ async def telegram_command_loop(state) -> None:
                     if text.startswith("/start") or text == "🏠 Home":
                         user["active"] = True
                         clear_pause(user)
-                        save_subscribers_dict(subs)
+                        store_user(state, chat_id, user)
                         pkg = "VIP" if is_vip(user) else "FREE"
                         limit = "Unlimited" if is_vip(user) else "2 sinyal/hari"
                         send_message(
@@ -440,7 +583,7 @@ async def telegram_command_loop(state) -> None:
                         else:
                             user["active"] = True
                             clear_pause(user)
-                            save_subscribers_dict(subs)
+                            store_user(state, chat_id, user)
                             send_message(
                                 chat_id,
                                 "🔔 Sinyal *diaktifkan* untuk akun ini.",
@@ -456,7 +599,7 @@ async def telegram_command_loop(state) -> None:
                         else:
                             user["active"] = False
                             clear_pause(user)
-                            save_subscribers_dict(subs)
+                            store_user(state, chat_id, user)
                             send_message(
                                 chat_id,
                                 "🔕 Sinyal *dinonaktifkan* untuk akun ini.",
@@ -465,7 +608,7 @@ async def telegram_command_loop(state) -> None:
                     elif text == "⏱ Pause 24 Jam":
                         set_pause_24h(user)
                         user["active"] = True
-                        save_subscribers_dict(subs)
+                        store_user(state, chat_id, user)
                         send_message(
                             chat_id,
                             "⏱ Sinyal *dijeda 24 jam*.\n"
@@ -493,9 +636,65 @@ async def telegram_command_loop(state) -> None:
                             f"• Today     : *{signals_today}* sinyal\n"
                             f"• VIP Expiry: `{vip_exp}`\n"
                             f"• Pause     : {pause_info}\n"
-                            f"• User ID   : `{chat_id}`",
+                            f"• User ID   : `{chat_id}`\n\n"
+                            f"{format_prefs(user)}",
+                            reply_keyboard=build_user_keyboard(),
+                        )
+                    elif text.startswith("/prefs"):
+                        send_message(
+                            chat_id,
+                            "⚙️ *PREFERENSI SINYAL*\n\n" + format_prefs(user),
                             reply_keyboard=build_user_keyboard(),
                         )
+                    elif text.startswith("/tier"):
+                        arg = text[len("/tier"):].strip().upper()
+                        if arg in ("B", "A", "A+", "OFF"):
+                            set_min_tier(user, None if arg == "OFF" else arg)
+                            store_user(state, chat_id, user)
+                            reply = f"✅ Min tier kamu: *{user.get('min_tier') or 'ikut bot'}*."
+                        else:
+                            reply = "Format: `/tier A`, `/tier A+` atau `/tier off`."
+                        send_message(chat_id, reply, reply_keyboard=build_user_keyboard())
+                    elif text.startswith("/watch"):
+                        arg = text[len("/watch"):].strip()
+                        if arg:
+                            set_watchlist(user, [] if arg.lower() == "off" else parse_symbols_arg(arg))
+                            store_user(state, chat_id, user)
+                            reply = "✅ Watchlist diperbarui.\n\n" + format_prefs(user)
+                        else:
+                            reply = "Format: `/watch BTC ETH SOL` (hanya pair ini) atau `/watch off`."
+                        send_message(chat_id, reply, reply_keyboard=build_user_keyboard())
+                    elif text.startswith("/mute"):
+                        arg = text[len("/mute"):].strip()
+                        if arg:
+                            mute_symbols(user, parse_symbols_arg(arg))
+                            store_user(state, chat_id, user)
+                            reply = "🔇 Pair di-mute.\n\n" + format_prefs(user)
+                        else:
+                            reply = "Format: `/mute DOGE PEPE`."
+                        send_message(chat_id, reply, reply_keyboard=build_user_keyboard())
+                    elif text.startswith("/unmute"):
+                        arg = text[len("/unmute"):].strip()
+                        unmute_symbols(user, None if arg.lower() in ("", "all") else parse_symbols_arg(arg))
+                        store_user(state, chat_id, user)
+                        send_message(chat_id, "🔈 Mute diperbarui.\n\n" + format_prefs(user), reply_keyboard=build_user_keyboard())
+                    elif text.startswith("/quiet"):
+                        arg = text[len("/quiet"):].strip().lower()
+                        try:
+                            if arg == "off":
+                                set_quiet_hours(user, None)
+                            else:
+                                start, end = (int(h) for h in arg.split("-"))
+                                if not (0 <= start < 24 and 0 <= end < 24):
+                                    raise ValueError
+                                set_quiet_hours(user, start, end)
+                            store_user(state, chat_id, user)
+                            reply = "🌙 Quiet hours diperbarui.\n\n" + format_prefs(user)
+                        except ValueError:
+                            reply = (
+                                f"Format: `/quiet 22-6` (jam, UTC{PREF_TZ_OFFSET_HOURS:+g}) atau `/quiet off`."
+                            )
+                        send_message(chat_id, reply, reply_keyboard=build_user_keyboard())
                     elif text == "⭐ Upgrade VIP":
                         send_message(
                             chat_id,
@@ -515,11 +714,17 @@ async def telegram_command_loop(state) -> None:
                             "🔕 Nonaktifkan Sinyal — matikan sinyal.\n"
                             "⏱ Pause 24 Jam — jeda sinyal sementara.\n"
                             "📊 Status Saya — lihat paket & limit.\n"
-                            "⭐ Upgrade VIP — info upgrade.\n",
+                            "⭐ Upgrade VIP — info upgrade.\n\n"
+                            "*Preferensi:*\n"
+                            "/tier A — hanya sinyal tier A ke atas (`/tier off`)\n"
+                            "/watch BTC ETH — hanya pair ini (`/watch off`)\n"
+                            "/mute DOGE — jangan kirim pair ini (`/unmute all`)\n"
+                            "/quiet 22-6 — tanpa sinyal di jam ini (`/quiet off`)\n"
+                            "/prefs — lihat preferensi.\n",
                             reply_keyboard=build_user_keyboard(),
                         )
 
-                    save_subscribers_dict(subs)
+                    store_user(state, chat_id, user)
 
             await asyncio.sleep(0.5)
 
@@ -1,8 +1,7 @@
 from typing import List
 
-import requests
-
 from config import BINANCE_REST_URL
+from rate_limit import PRIORITY_UNIVERSE, governed_get, governor_for
 
 
 def get_usdt_pairs_with_volume(min_usd: float) -> List[str]:
@@ -13,7 +12,7 @@ def get_usdt_pairs_with_volume(min_usd: float) -> List[str]:
 
     # 1) Ambil exchangeInfo untuk list simbol USDT
     info_url = f"{BINANCE_REST_URL}/api/v3/exchangeInfo"
-    r_info = requests.get(info_url, timeout=10)
+    r_info = governed_get(governor_for("spot"), info_url, weight=20, priority=PRIORITY_UNIVERSE)
     r_info.raise_for_status()
     info = r_info.json()
 
@@ -24,7 +23,7 @@ def get_usdt_pairs_with_volume(min_usd: float) -> List[str]:
 
     # 2) Ambil ticker 24 jam untuk volume
     tick_url = f"{BINANCE_REST_URL}/api/v3/ticker/24hr"
-    r_tick = requests.get(tick_url, timeout=10)
+    r_tick = governed_get(governor_for("spot"), tick_url, weight=80, priority=PRIORITY_UNIVERSE)
     r_tick.raise_for_status()
     tickers = r_tick.json()
 
@@ -0,0 +1,243 @@
+# watchdog.py
+#
+# Supervisor terpisah dari scan_loop (cek heartbeat lama hanya jalan saat
+# ws.recv() kembali → socket yang diam / loop yang terblok tidak ketahuan):
+# - lag event loop (probe sleep kecil, selisih terhadap jadwal)
+# - waktu sejak frame terakhir per shard (1 koneksi WS per market)
+# - waktu sejak candle close terakhir per symbol
+# - kedalaman antrian: analisa in-flight, dispatcher, delivery Telegram
+# Alert ke admin lewat antrian delivery (di-throttle per jenis), koneksi
+# yang macet ditutup paksa → scan_loop reconnect sendiri.
+
+import asyncio
+import time
+from typing import Dict, Iterable, List
+
+from config import (
+    TELEGRAM_ADMIN_ID,
+    WATCHDOG_INTERVAL_SEC,
+    WATCHDOG_LAG_WARN_SEC,
+    WATCHDOG_STALL_SEC,
+    WATCHDOG_CANDLE_STALE_BARS,
+    WATCHDOG_QUEUE_WARN,
+    WATCHDOG_ALERT_COOLDOWN_SEC,
+)
+
+LAG_PROBE_SEC = 0.25
+# batas close handshake koneksi yang di-recycle; lewat → transport diputus
+RECYCLE_CLOSE_SEC = 5.0
+
+
+class ShardHealth:
+    """
+    Detak 1 shard (koneksi WS 1 market). Di-update scan_loop per frame,
+    dibaca Supervisor. bar_sec = durasi candle sumber stream.
+    """
+
+    def __init__(self, market: str, bar_sec: float):
+        self.market = market
+        self.bar_sec = bar_sec
+        self.ws = None
+        self.connected_ts = 0.0
+        self.last_frame = 0.0
+        self.last_close: Dict[str, float] = {}
+        self.recycles = 0
+
+    def attach(self, ws, now: float) -> None:
+        self.ws = ws
+        self.connected_ts = now
+        self.last_frame = now
+
+    def detach(self) -> None:
+        self.ws = None
+
+    def on_frame(self, now: float) -> None:
+        self.last_frame = now
+
+    def on_close(self, symbol: str, now: float) -> None:
+        self.last_close[symbol] = now
+
+    def retain(self, symbols: Iterable[str]) -> None:
+        keep = {s.upper() for s in symbols}
+        for sym in [s for s in self.last_close if s not in keep]:
+            del self.last_close[sym]
+        for sym in keep:
+            self.last_close.setdefault(sym, 0.0)
+
+    def stale_symbols(self, now: float, stale_bars: int) -> List[str]:
+        """
+        Symbol tanpa candle close > stale_bars bar (dihitung sejak connect
+        untuk symbol yang belum pernah close).
+        """
+        limit = self.bar_sec * stale_bars
+        if now - self.connected_ts <= limit:
+            return []
+        return sorted(
+            sym for sym, ts in self.last_close.items()
+            if now - max(ts, self.connected_ts) > limit
+        )
+
+
+class Supervisor:
+    def __init__(
+        self,
+        state,
+        interval_sec: float = WATCHDOG_INTERVAL_SEC,
+        lag_warn_sec: float = WATCHDOG_LAG_WARN_SEC,
+        stall_sec: float = WATCHDOG_STALL_SEC,
+        stale_bars: int = WATCHDOG_CANDLE_STALE_BARS,
+        queue_warn: int = WATCHDOG_QUEUE_WARN,
+        alert_cooldown_sec: float = WATCHDOG_ALERT_COOLDOWN_SEC,
+    ):
+        self.state = state
+        self.interval = interval_sec
+        self.lag_warn = lag_warn_sec
+        self.stall_sec = stall_sec
+        self.stale_bars = stale_bars
+        self.queue_warn = queue_warn
+        self.alert_cooldown = alert_cooldown_sec
+
+        self.shards: Dict[str, ShardHealth] = {}
+        # jenis alert aktif → waktu alert terakhir
+        self._alerted: Dict[str, float] = {}
+        self.window_lag = 0.0
+        self.max_lag = 0.0
+        # task close WS yang di-recycle (referensi disimpan sampai selesai)
+        self._closing: set = set()
+
+    def shard(self, market: str, bar_sec: float) -> ShardHealth:
+        health = self.shards.get(market)
+        if health is None:
+            health = self.shards[market] = ShardHealth(market, bar_sec)
+        return health
+
+    # ---------- metrik ----------
+
+    def queue_depth(self) -> Dict[str, int]:
+        state = self.state
+        analysis = len(state.analysis_tasks)
+        analysis += sum(len(s.in_flight()) for s in state.stream_scanners.values() if s is not None)
+        return {
+            "analisa": analysis,
+            "dispatch": state.dispatcher.pending(),
+            "telegram": state.delivery.pending(),
+        }
+
+    def summary(self) -> str:
+        q = self.queue_depth()
+        recycles = sum(h.recycles for h in self.shards.values())
+        return (
+            f"lag max {self.max_lag:.2f}s, antrian {q['analisa']}/{q['dispatch']}/{q['telegram']}, "
+            f"recycle WS {recycles}"
+        )
+
+    # ---------- alert ----------
+
+    def _alert(self, kind: str, text: str, now: float) -> None:
+        last = self._alerted.get(kind)
+        if last is not None and now - last < self.alert_cooldown:
+            return
+        self._alerted[kind] = now
+        print("[watchdog]", text.replace("\n", " "))
+        if TELEGRAM_ADMIN_ID:
+            self.state.delivery.enqueue(TELEGRAM_ADMIN_ID, text)
+
+    def _resolve(self, kind: str, text: str) -> None:
+        if self._alerted.pop(kind, None) is None:
+            return
+        print("[watchdog]", text.replace("\n", " "))
+        if TELEGRAM_ADMIN_ID:
+            self.state.delivery.enqueue(TELEGRAM_ADMIN_ID, text)
+
+    # ---------- cek ----------
+
+    def recycle(self, health: ShardHealth) -> None:
+        """
+        Tutup paksa koneksi macet; ws.recv() di scan_loop gagal → reconnect.
+        """
+        ws, health.ws = health.ws, None
+        health.recycles += 1
+        health.last_frame = time.time()
+        if ws is not None:
+            task = asyncio.create_task(self._close(ws))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(ws) -> None:
+        try:
+            await asyncio.wait_for(ws.close(), timeout=RECYCLE_CLOSE_SEC)
+        except asyncio.TimeoutError:
+            # socket macet total: close handshake tidak pernah selesai
+            transport = getattr(ws, "transport", None)
+            if transport is not None:
+                transport.abort()
+        except Exception as e:
+            print("[watchdog] Gagal tutup WS:", e)
+
+    def check_shard(self, health: ShardHealth, now: float) -> None:
+        kind = f"stall:{health.market}"
+        if health.ws is None:
+            return
+        silent = now - health.last_frame
+        if silent > self.stall_sec:
+            self._alert(
+                kind,
+                f"⚠ [{health.market}] Tidak ada data market selama {silent:.0f} detik.\n"
+                "Koneksi WebSocket di-recycle otomatis.",
+                now,
+            )
+            self.recycle(health)
+            return
+        self._resolve(kind, f"✅ [{health.market}] Data market kembali diterima. Koneksi normal.")
+
+        kind = f"stale:{health.market}"
+        stale = health.stale_symbols(now, self.stale_bars)
+        if stale:
+            preview = ", ".join(stale[:10]) + (f" (+{len(stale) - 10})" if len(stale) > 10 else "")
+            self._alert(
+                kind,
+                f"⚠ [{health.market}] {len(stale)} pair tanpa candle close > {self.stale_bars} bar:\n{preview}",
+                now,
+            )
+        else:
+            self._resolve(kind, f"✅ [{health.market}] Candle semua pair kembali normal.")
+
+    def check(self, now: float) -> None:
+        lag, self.window_lag = self.window_lag, 0.0
+        if lag > self.lag_warn:
+            self._alert("lag", f"⚠ Event loop terblok {lag:.1f} detik (ada proses blocking di loop).", now)
+        else:
+            self._resolve("lag", "✅ Lag event loop kembali normal.")
+
+        q = self.queue_depth()
+        total = sum(q.values())
+        if total > self.queue_warn:
+            self._alert(
+                "queue",
+                f"⚠ Antrian menumpuk: analisa {q['analisa']}, dispatch {q['dispatch']}, telegram {q['telegram']}.",
+                now,
+            )
+        else:
+            self._resolve("queue", "✅ Antrian kembali normal.")
+
+        if not self.state.scanning_enabled:
+            return
+        for health in list(self.shards.values()):
+            self.check_shard(health, now)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_check = loop.time() + self.interval
+        while True:
+            expected = loop.time() + LAG_PROBE_SEC
+            await asyncio.sleep(LAG_PROBE_SEC)
+            lag = max(0.0, loop.time() - expected)
+            self.window_lag = max(self.window_lag, lag)
+            self.max_lag = max(self.max_lag, lag)
+            if loop.time() >= next_check:
+                next_check = loop.time() + self.interval
+                try:
+                    self.check(time.time())
+                except Exception as e:
+                    print("Error watchdog:", e)